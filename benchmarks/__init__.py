@@ -0,0 +1 @@
+"""Performance benchmarks for CodeAgent. Run modules with `python -m benchmarks.<name>`."""
@@ -0,0 +1,88 @@
+"""Per-round cost of converting history to each provider's wire format.
+
+Simulates an agent session: every round appends an assistant tool call and
+its result, then converts the whole history as a provider would. With
+memoized conversion only the new messages are converted; what is left per
+round is assembling the list of cached dicts (well under a microsecond per
+message), compared with the "cold" column, which converts fresh Message
+objects every time.
+
+    python -m benchmarks.bench_conversion [--rounds 400] [--out results.json]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+from dataclasses import replace
+
+from codeagent.llm.anthropic_provider import _messages_to_anthropic
+from codeagent.llm.ollama_provider import _messages_to_ollama
+from codeagent.llm.openai_provider import _messages_to_openai
+from codeagent.llm.types import Message, ToolCall
+
+CONVERTERS = {
+    "anthropic": lambda msgs: _messages_to_anthropic(msgs),
+    "openai": lambda msgs: _messages_to_openai(msgs, "system"),
+    "ollama": lambda msgs: _messages_to_ollama(msgs, "system"),
+}
+
+
+def _round_messages(i: int) -> list[Message]:
+    call = ToolCall(
+        id=f"call_{i}",
+        name="file_read",
+        arguments={"path": f"src/module_{i}.py", "offset": 1, "limit": 200},
+    )
+    return [
+        Message(role="assistant", content="Let me look at that.", tool_calls=[call]),
+        Message(role="tool", content="x = 1\n" * 200, tool_call_id=call.id, name="file_read"),
+    ]
+
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rounds: int, sample_every: int) -> dict:
+    results: dict = {"rounds": rounds, "providers": {}}
+    for name, convert in CONVERTERS.items():
+        history = [Message(role="user", content="Refactor the modules.")]
+        samples = []
+        for i in range(1, rounds + 1):
+            history.extend(_round_messages(i))
+            convert(history)  # the agent's real call: converts only new messages
+            if i % sample_every == 0:
+                warm = _time(lambda: convert(history))
+                cold = _time(lambda: convert([replace(m) for m in history]), repeat=1)
+                samples.append({
+                    "messages": len(history),
+                    "memoized_us": round(warm * 1e6, 1),
+                    "cold_us": round(cold * 1e6, 1),
+                })
+        results["providers"][name] = samples
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=400)
+    parser.add_argument("--sample-every", type=int, default=50)
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.rounds, args.sample_every)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Resume time of saved sessions as they grow.
+
+Writes sessions of increasing length (each round a tool call plus a tool
+result, every few rounds a large file dump that goes to the blob area),
+then times `load_tail` with a typical history budget against replaying the
+whole session. Resume cost should stay flat: only the index tail and the
+newest records are read.
+
+    python -m benchmarks.bench_sessions [--sizes 100,1000,10000] [--out results.json]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from codeagent.llm.tokens import estimate_message_tokens
+from codeagent.llm.types import Message, ToolCall
+from codeagent.sessions import SessionStore
+
+
+def _round_messages(i: int) -> list[Message]:
+    call = ToolCall(id=f"call_{i}", name="file_read", arguments={"path": f"src/module_{i}.py"})
+    # Every fifth result is large enough to be stored as a blob
+    lines = 400 if i % 5 == 0 else 20
+    body = "".join(f"{n:>6}\tvalue_{i}_{n} = compute({n})\n" for n in range(1, lines + 1))
+    messages = [
+        Message(role="assistant", content="Let me look at that.", tool_calls=[call]),
+        Message(role="tool", content=body, tool_call_id=call.id, name="file_read"),
+    ]
+    if i % 10 == 0:
+        messages.insert(0, Message(role="user", content=f"Next step {i}, please."))
+    return messages
+
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: list[int], budget: int) -> dict:
+    results: dict = {"budget_tokens": budget, "sessions": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(Path(tmp))
+        for rounds in sizes:
+            log = store.create(f"bench-{rounds}", overwrite=True)
+            log.append(Message(role="user", content="Refactor the modules."), 8)
+            start = time.perf_counter()
+            for i in range(1, rounds + 1):
+                for msg in _round_messages(i):
+                    log.append(msg, estimate_message_tokens(msg))
+            write = time.perf_counter() - start
+
+            messages = log.load_tail(budget)
+            log_bytes = (log.dir / "log").stat().st_size
+            blob_bytes = sum(p.stat().st_size for p in store.blob_dir.rglob("*") if p.is_file())
+            results["sessions"].append({
+                "rounds": rounds,
+                "log_kb": round(log_bytes / 1024, 1),
+                "blobs_kb": round(blob_bytes / 1024, 1),
+                "append_us": round(write / rounds / 2 * 1e6, 1),
+                "resumed_messages": len(messages),
+                "resume_ms": round(_time(lambda: log.load_tail(budget)) * 1000, 2),
+                "full_replay_ms": round(_time(lambda: log.load_tail(2**62), repeat=1) * 1000, 2),
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated round counts")
+    parser.add_argument("--budget", type=int, default=150_000, help="history budget in tokens")
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.budget)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
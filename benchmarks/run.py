@@ -0,0 +1,309 @@
+"""Reproducible agent benchmark suite.
+
+Drives the real agent loop with the seeded `ScriptedProvider` against a
+synthetic repository and reports, as JSON:
+
+- loop: time per round spent in the agent itself (history, compaction,
+  usage accounting, rendering, session log), excluding the scripted
+  model, for the headless async agent and the interactive agent with and
+  without streaming
+- conversion: per-round cost of converting history to each wire format
+- tools: throughput of file_read, code_search, directory_list, file_edit
+  and terminal on the synthetic repo
+- fanout: turn latency with injected model latency and several tool calls
+  per round, with parallel tool execution on and off
+
+    python -m benchmarks.run [--only loop,tools] [--files 10000] [--repo DIR] [--out results.json]
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+from codeagent import __version__
+from codeagent.async_agent import AsyncAgent
+from codeagent.config import config
+from codeagent.tools import registry
+from codeagent.tools.context import ToolContext, use_context
+
+from . import bench_conversion
+from .scripted import AsyncScriptedProvider, Distribution, Scenario, ScriptedProvider
+from .synthrepo import RepoSpec, SynthRepo, generate
+
+SUITES = ("loop", "conversion", "tools", "fanout")
+
+
+def _stats(samples: list[float], scale: float = 1e6) -> dict[str, float]:
+    """Summary of `samples` (seconds), in microseconds by default."""
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean": round(statistics.fmean(ordered) * scale, 1),
+        "p50": round(ordered[len(ordered) // 2] * scale, 1),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * scale, 1),
+        "max": round(ordered[-1] * scale, 1),
+    }
+
+
+def _meta(args: argparse.Namespace) -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, cwd=Path(__file__).parent,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "version": __version__,
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "args": {k: v for k, v in vars(args).items() if k != "out"},
+    }
+
+
+class _Muted:
+    """Send the interactive agent's console output to a buffer."""
+
+    def __enter__(self) -> None:
+        from codeagent.ui.console import console
+
+        self._console = console
+        self._file = console.file
+        console.file = io.StringIO()
+
+    def __exit__(self, *exc: object) -> None:
+        self._console.file = self._file
+
+
+def _sync_agent(scenario: Scenario, workdir: Path | None, parallel: bool = True) -> Any:
+    from codeagent.app import Agent
+
+    agent = Agent("demo")
+    agent.provider = ScriptedProvider(scenario)
+    agent.history.set_budget(agent.provider.history_budget())
+    agent.tool_context = ToolContext(workdir=workdir)
+    if not parallel:
+        agent._tool_pool = None
+    return agent
+
+
+def bench_loop(args: argparse.Namespace) -> dict[str, Any]:
+    """Agent overhead per round; the scripted model costs nothing to wait for."""
+    rounds = args.rounds_per_turn + 1  # tool rounds plus the final answer
+
+    def scenario() -> Scenario:
+        return Scenario(seed=args.seed, rounds_per_turn=args.rounds_per_turn)
+
+    def measure(run_turn: Callable[[int], None], provider: Any) -> dict[str, Any]:
+        per_round = []
+        for turn in range(args.turns):
+            model_before = provider.elapsed
+            start = time.perf_counter()
+            run_turn(turn)
+            elapsed = time.perf_counter() - start - (provider.elapsed - model_before)
+            per_round.append(elapsed / rounds)
+        tenth = max(1, args.turns // 10)
+        return {
+            "round_us": _stats(per_round),
+            "first_turns_round_us": round(statistics.fmean(per_round[:tenth]) * 1e6, 1),
+            "last_turns_round_us": round(statistics.fmean(per_round[-tenth:]) * 1e6, 1),
+            "requests": provider.requests,
+        }
+
+    results: dict[str, Any] = {"turns": args.turns, "rounds_per_turn": rounds}
+
+    provider = AsyncScriptedProvider(scenario())
+    agent = AsyncAgent(provider)
+    loop = asyncio.new_event_loop()
+    try:
+        results["async"] = measure(lambda turn: loop.run_until_complete(agent.send(f"Task {turn}")), provider)
+    finally:
+        loop.close()
+
+    stream = config.stream
+    try:
+        for name, streaming in (("interactive_stream", True), ("interactive_chat", False)):
+            config.stream = streaming
+            sync_agent = _sync_agent(scenario(), None)
+            with _Muted():
+                results[name] = measure(lambda turn: sync_agent._process_message(f"Task {turn}"), sync_agent.provider)
+    finally:
+        config.stream = stream
+    return results
+
+
+def bench_conversion_suite(args: argparse.Namespace) -> dict[str, Any]:
+    return bench_conversion.run(args.conversion_rounds, max(1, args.conversion_rounds // 8))
+
+
+def _timed(calls: list[tuple[str, dict[str, Any]]], context: ToolContext) -> tuple[list[float], int]:
+    samples, size = [], 0
+    with use_context(context):
+        for name, arguments in calls:
+            start = time.perf_counter()
+            result = registry.execute(name, arguments)
+            samples.append(time.perf_counter() - start)
+            size += len(result)
+    return samples, size
+
+
+def _throughput(samples: list[float], size: int) -> dict[str, Any]:
+    total = sum(samples)
+    return {
+        "latency_ms": _stats(samples, scale=1e3),
+        "ops_per_s": round(len(samples) / total, 1) if total else None,
+        "output_mb_per_s": round(size / total / 1e6, 2) if total else None,
+    }
+
+
+def bench_tools(args: argparse.Namespace, repo: SynthRepo) -> dict[str, Any]:
+    """Throughput of each tool through the registry, with the result cache off."""
+    rng = random.Random(args.seed)
+    small = repo.files[: len(repo.files) - repo.spec.large_files]
+    sample = rng.sample(small, min(args.tool_ops, len(small)))
+    dirs = sorted({f.rsplit("/", 1)[0] for f in small if "/" in f})
+    results: dict[str, Any] = {"repo_files": len(repo.files), "repo_mb": round(repo.bytes / 1e6, 1)}
+
+    cache, registry.cache = registry.cache, None
+    try:
+        calls = [("file_read", {"path": path}) for path in sample]
+        results["file_read"] = _throughput(*_timed(calls, ToolContext(workdir=repo.root)))
+
+        if repo.large:
+            calls = [("file_read", {"path": path}) for path in repo.large]
+            results["file_read_large"] = _throughput(*_timed(calls, ToolContext(workdir=repo.root)))
+
+        calls = [
+            ("code_search", {"pattern": rf"def func_{rng.randrange(1000)}_", "glob": "*.py"})
+            for _ in range(args.search_ops)
+        ]
+        results["code_search"] = _throughput(*_timed(calls, ToolContext(workdir=repo.root)))
+
+        calls = [("directory_list", {"path": rng.choice(dirs) if dirs else "."}) for _ in range(args.tool_ops)]
+        results["directory_list"] = _throughput(*_timed(calls, ToolContext(workdir=repo.root)))
+        calls = [("directory_list", {"path": ".", "recursive": True}) for _ in range(args.search_ops)]
+        results["directory_list_recursive"] = _throughput(*_timed(calls, ToolContext(workdir=repo.root)))
+
+        # Flip each marker and back again, leaving the repo as it was
+        calls = [
+            ("file_edit", {"path": path, "old_string": f"MARKER = {a}", "new_string": f"MARKER = {b}"})
+            for a, b in (("0", "1"), ("1", "0"))
+            for path in sample
+        ]
+        results["file_edit"] = _throughput(*_timed(calls, ToolContext(workdir=repo.root)))
+
+        calls = [("terminal", {"command": "true"}) for _ in range(args.search_ops)]
+        results["terminal"] = _throughput(*_timed(calls, ToolContext(workdir=repo.root)))
+    finally:
+        registry.cache = cache
+    return results
+
+
+def bench_fanout(args: argparse.Namespace, repo: SynthRepo) -> dict[str, Any]:
+    """Turn latency with injected model latency and multi-tool rounds."""
+    tools = dict(
+        (name, float(weight))
+        for name, _, weight in (item.partition("=") for item in args.tools.split(","))
+    )
+    results: dict[str, Any] = {
+        "latency": args.latency,
+        "token_rate": args.token_rate,
+        "fanout": args.fanout,
+        "tools": tools,
+    }
+    for name, parallel in (("parallel", True), ("serial", False)):
+        scenario = Scenario(
+            seed=args.seed,
+            rounds_per_turn=args.rounds_per_turn,
+            fanout=Distribution.parse(args.fanout),
+            latency=Distribution.parse(args.latency),
+            tokens_per_second=args.token_rate,
+            tools=tools,
+            files=repo.files[: len(repo.files) - repo.spec.large_files],
+        )
+        agent = _sync_agent(scenario, repo.root, parallel=parallel)
+        turns = []
+        with _Muted():
+            for turn in range(args.fanout_turns):
+                start = time.perf_counter()
+                agent._process_message(f"Task {turn}")
+                turns.append(time.perf_counter() - start)
+        results[name] = {"turn_ms": _stats(turns, scale=1e3), "requests": agent.provider.requests}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", default=",".join(SUITES), help=f"comma-separated suites ({', '.join(SUITES)})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repo", type=Path, help="synthetic repo directory to create or reuse (default: temporary)")
+    parser.add_argument("--files", type=int, default=RepoSpec.files, help="files in the synthetic repo")
+    parser.add_argument("--depth", type=int, default=RepoSpec.depth)
+    parser.add_argument("--large-files", type=int, default=RepoSpec.large_files)
+    parser.add_argument("--large-lines", type=int, default=RepoSpec.large_lines)
+    parser.add_argument("--turns", type=int, default=200, help="turns for the loop suite")
+    parser.add_argument("--rounds-per-turn", type=int, default=3, help="tool rounds per scripted turn")
+    parser.add_argument("--conversion-rounds", type=int, default=400)
+    parser.add_argument("--tool-ops", type=int, default=200, help="calls per cheap tool")
+    parser.add_argument("--search-ops", type=int, default=5, help="calls per tree-wide tool")
+    parser.add_argument("--fanout-turns", type=int, default=10)
+    parser.add_argument("--fanout", default="4", help="tool calls per round, e.g. 4 or uniform:1,8")
+    parser.add_argument("--latency", default="lognormal:0.05,0.5", help="model latency in seconds")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="streamed tokens per second (0: instant)")
+    parser.add_argument("--tools", default="file_read=3,directory_list=1", help="tool mix for the fanout suite")
+    parser.add_argument("--out", help="write JSON results to this file")
+    args = parser.parse_args()
+
+    suites = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    results: dict[str, Any] = {"meta": _meta(args), "results": {}}
+    with tempfile.TemporaryDirectory(prefix="codeagent-bench-") as tmp:
+        # Keep session logs of the benchmark agents out of the user's data dir
+        config.data_dir = Path(tmp) / "home"
+        repo = None
+        if {"tools", "fanout"} & set(suites):
+            spec = RepoSpec(
+                files=args.files, depth=args.depth, large_files=args.large_files,
+                large_lines=args.large_lines, seed=args.seed,
+            )
+            start = time.perf_counter()
+            repo = generate(args.repo or Path(tmp) / "repo", spec)
+            results["meta"]["repo_setup_s"] = round(time.perf_counter() - start, 2)
+
+        for suite in suites:
+            if suite == "loop":
+                results["results"]["loop"] = bench_loop(args)
+            elif suite == "conversion":
+                results["results"]["conversion"] = bench_conversion_suite(args)
+            elif suite == "tools":
+                results["results"]["tools"] = bench_tools(args, repo)
+            elif suite == "fanout":
+                results["results"]["fanout"] = bench_fanout(args, repo)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Seeded, scriptable mock provider for driving the agent loop in benchmarks.
+
+Unlike the demo `MockProvider`, every choice comes from a seeded RNG and a
+`Scenario`: how many tool rounds a turn takes, how many tool calls each
+round fans out to and which tools they use, the latency before the first
+token and the streaming token rate. Two runs with the same seed issue the
+same calls in the same order.
+"""
+
+from __future__ import annotations
+import asyncio
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterator
+
+from codeagent.llm.base import AsyncBaseLLMProvider, BaseLLMProvider
+from codeagent.llm.streaming import events_from_response
+from codeagent.llm.tokens import estimate_message_tokens
+from codeagent.llm.types import LLMResponse, Message, StreamEvent, TextDelta, ToolCall, Usage
+
+_WORDS = (
+    "the function reads config values then calls the parser and returns "
+    "a list of tokens which the caller checks before writing results"
+).split()
+
+
+@dataclass(frozen=True)
+class Distribution:
+    """A random quantity: "0.5", "fixed:0.5", "uniform:0.1,0.9" or "lognormal:0.5,0.4".
+
+    For "lognormal" the parameters are the median and the sigma of the
+    underlying normal, which is how latency percentiles are usually quoted.
+    """
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> Distribution:
+        kind, _, params = spec.partition(":")
+        if not params:
+            return cls("fixed", float(kind))
+        values = [float(v) for v in params.split(",")]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown distribution '{kind}'")
+        return cls(kind, values[0], values[1] if len(values) > 1 else 0.0)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        return self.a
+
+
+@dataclass
+class Scenario:
+    """What the scripted model does each round."""
+    seed: int = 0
+    rounds_per_turn: int = 3  # tool rounds before the final answer
+    fanout: Distribution = field(default_factory=lambda: Distribution("fixed", 1))
+    latency: Distribution = field(default_factory=Distribution)  # seconds to first token
+    tokens_per_second: float = 0.0  # streaming rate; 0 = no delay
+    output_tokens: Distribution = field(default_factory=lambda: Distribution("fixed", 40))
+    tools: dict[str, float] = field(default_factory=lambda: {"expand_result": 1.0})  # tool mix weights
+    files: list[str] = field(default_factory=list)  # paths used for file tool arguments
+
+
+class _Script:
+    """The seeded decision logic shared by the sync and async providers."""
+
+    def __init__(self, scenario: Scenario) -> None:
+        self.scenario = scenario
+        self.rng = random.Random(scenario.seed)
+        self.requests = 0
+        self.elapsed = 0.0  # seconds spent building responses, excluding injected delays
+        self._dirs = sorted({f.rsplit("/", 1)[0] for f in scenario.files if "/" in f}) or ["."]
+
+    def respond(self, messages: list[Message]) -> LLMResponse:
+        start = time.perf_counter()
+        try:
+            return self._respond(messages)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    def _respond(self, messages: list[Message]) -> LLMResponse:
+        self.requests += 1
+        scenario, rng = self.scenario, self.rng
+        rounds = 0
+        for msg in reversed(messages):
+            if msg.role == "user":
+                break
+            if msg.role == "assistant":
+                rounds += 1
+
+        words = max(1, int(scenario.output_tokens.sample(rng)))
+        text = " ".join(rng.choice(_WORDS) for _ in range(words))
+        usage = Usage(
+            input_tokens=sum(estimate_message_tokens(m) for m in messages),
+            output_tokens=words,
+        )
+        if rounds >= scenario.rounds_per_turn:
+            return LLMResponse(content=text, stop_reason="end_turn", usage=usage)
+
+        names = list(scenario.tools)
+        weights = list(scenario.tools.values())
+        calls = [
+            ToolCall(id=f"call_{self.requests}_{i}", name=name, arguments=self._arguments(name))
+            for i, name in enumerate(rng.choices(names, weights, k=max(1, int(scenario.fanout.sample(rng)))))
+        ]
+        return LLMResponse(content=text, tool_calls=calls, stop_reason="tool_use", usage=usage)
+
+    def _arguments(self, tool: str) -> dict[str, Any]:
+        rng, files = self.rng, self.scenario.files
+        if tool == "file_read":
+            return {"path": rng.choice(files) if files else "README.md"}
+        if tool == "code_search":
+            return {"pattern": rf"def func_{rng.randrange(1000)}_", "glob": "*.py"}
+        if tool == "directory_list":
+            return {"path": rng.choice(self._dirs)}
+        if tool == "terminal":
+            return {"command": "true"}
+        if tool == "expand_result":
+            return {"id": "benchmark"}  # cheap no-op: the id is never stored
+        return {}
+
+    def delays(self, response: LLMResponse) -> tuple[float, float]:
+        """Seconds to wait before the first token and between tokens."""
+        rate = self.scenario.tokens_per_second
+        return self.scenario.latency.sample(self.rng), (1.0 / rate if rate > 0 else 0.0)
+
+    @staticmethod
+    def deltas(response: LLMResponse) -> Iterator[str]:
+        words = response.content.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+
+
+class ScriptedProvider(BaseLLMProvider):
+    """Synchronous scripted provider (see `Scenario`)."""
+
+    def __init__(self, scenario: Scenario | None = None) -> None:
+        self.model = "scripted"
+        self._script = _Script(scenario or Scenario())
+
+    @property
+    def requests(self) -> int:
+        return self._script.requests
+
+    @property
+    def elapsed(self) -> float:
+        return self._script.elapsed
+
+    def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        response = self._script.respond(messages)
+        first, per_token = self._script.delays(response)
+        time.sleep(first + per_token * (response.usage.output_tokens if response.usage else 0))
+        return response
+
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        response = self._script.respond(messages)
+        first, per_token = self._script.delays(response)
+        if first:
+            time.sleep(first)
+        for delta in self._script.deltas(response):
+            if per_token:
+                time.sleep(per_token)
+            yield TextDelta(delta)
+        yield from events_from_response(
+            LLMResponse(tool_calls=response.tool_calls, stop_reason=response.stop_reason, usage=response.usage)
+        )
+
+    def get_model_name(self) -> str:
+        return "Scripted (benchmark)"
+
+
+class AsyncScriptedProvider(AsyncBaseLLMProvider):
+    """Asyncio scripted provider (see `Scenario`)."""
+
+    def __init__(self, scenario: Scenario | None = None) -> None:
+        self.model = "scripted"
+        self._script = _Script(scenario or Scenario())
+
+    @property
+    def requests(self) -> int:
+        return self._script.requests
+
+    @property
+    def elapsed(self) -> float:
+        return self._script.elapsed
+
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        response = self._script.respond(messages)
+        first, per_token = self._script.delays(response)
+        await asyncio.sleep(first + per_token * (response.usage.output_tokens if response.usage else 0))
+        return response
+
+    async def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> AsyncIterator[StreamEvent]:
+        response = self._script.respond(messages)
+        first, per_token = self._script.delays(response)
+        if first:
+            await asyncio.sleep(first)
+        for delta in self._script.deltas(response):
+            if per_token:
+                await asyncio.sleep(per_token)
+            yield TextDelta(delta)
+        for event in events_from_response(
+            LLMResponse(tool_calls=response.tool_calls, stop_reason=response.stop_reason, usage=response.usage)
+        ):
+            yield event
+
+    def get_model_name(self) -> str:
+        return "Scripted (benchmark)"
@@ -0,0 +1,119 @@
+"""Generate a synthetic source tree for tool and agent benchmarks.
+
+Files are small Python-like modules spread over a randomly grown directory
+tree, plus a few large files. Every module defines `func_<n>` functions
+(for code_search patterns) and a `MARKER = 0` line (for file_edit). The
+layout depends only on the parameters and the seed; a manifest in the
+root lets later runs reuse an existing tree instead of regenerating it.
+
+    python -m benchmarks.synthrepo DIR [--files 10000] [--depth 8] [--large-files 5]
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import random
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+MANIFEST = ".synthrepo.json"
+
+
+@dataclass
+class RepoSpec:
+    files: int = 10_000
+    depth: int = 8  # maximum directory depth
+    fanout: int = 12  # subdirectory names per level
+    files_per_dir: int = 40  # average
+    large_files: int = 5
+    large_lines: int = 50_000
+    seed: int = 0
+
+
+@dataclass
+class SynthRepo:
+    root: Path
+    spec: RepoSpec
+    files: list[str] = field(default_factory=list)  # relative paths, large files last
+    bytes: int = 0
+
+    @property
+    def large(self) -> list[str]:
+        return self.files[len(self.files) - self.spec.large_files:] if self.spec.large_files else []
+
+
+def _module(rng: random.Random, index: int, lines: int) -> str:
+    out = [f'"""Synthetic module {index}."""', "", "MARKER = 0", ""]
+    n = 0
+    while len(out) < lines:
+        name = f"func_{rng.randrange(1000)}"
+        out += [
+            f"def {name}_{index}_{n}(value, scale={rng.randrange(1, 9)}):",
+            f"    total = value * scale + {rng.randrange(1000)}",
+            "    for step in range(scale):",
+            "        total += step",
+            "    return total",
+            "",
+        ]
+        n += 1
+    return "\n".join(out) + "\n"
+
+
+def generate(root: Path, spec: RepoSpec) -> SynthRepo:
+    """Create the tree under `root` (or reuse one made with the same spec)."""
+    root = root.resolve()
+    manifest = root / MANIFEST
+    if manifest.exists():
+        data = json.loads(manifest.read_text(encoding="utf-8"))
+        if data.get("spec") == asdict(spec):
+            return SynthRepo(root, spec, data["files"], data["bytes"])
+
+    rng = random.Random(spec.seed)
+    dirs = [Path(".")]
+    while spec.depth > 0 and len(dirs) * spec.files_per_dir < spec.files:
+        parent = rng.choice(dirs)
+        if len(parent.parts) < spec.depth:
+            dirs.append(parent / f"pkg_{rng.randrange(spec.fanout)}")
+    dirs = sorted(set(dirs))
+    for d in dirs:
+        (root / d).mkdir(parents=True, exist_ok=True)
+
+    repo = SynthRepo(root, spec)
+    small = spec.files - spec.large_files
+    for i in range(spec.files):
+        directory = rng.choice(dirs)
+        large = i >= small
+        name = f"large_{i}.py" if large else f"mod_{i}.py"
+        text = _module(rng, i, spec.large_lines if large else rng.randrange(20, 200))
+        rel = (directory / name).as_posix()
+        (root / rel).write_text(text, encoding="utf-8")
+        repo.files.append(rel)
+        repo.bytes += len(text)
+
+    manifest.write_text(
+        json.dumps({"spec": asdict(spec), "files": repo.files, "bytes": repo.bytes}),
+        encoding="utf-8",
+    )
+    return repo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", type=Path)
+    parser.add_argument("--files", type=int, default=RepoSpec.files)
+    parser.add_argument("--depth", type=int, default=RepoSpec.depth)
+    parser.add_argument("--large-files", type=int, default=RepoSpec.large_files)
+    parser.add_argument("--large-lines", type=int, default=RepoSpec.large_lines)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    spec = RepoSpec(
+        files=args.files, depth=args.depth, large_files=args.large_files,
+        large_lines=args.large_lines, seed=args.seed,
+    )
+    repo = generate(args.root, spec)
+    print(json.dumps({"root": str(repo.root), "files": len(repo.files), "bytes": repo.bytes}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""The IO-free part of the agent loop, shared by `Agent` and `AsyncAgent`.
+
+Both agents run the same turn: add the user message, then every round
+compact stale tool results, ask the model, and record its response and
+the results of its tool calls, until it answers without calling a tool.
+They differ only in how they reach the provider and run tools (threads or
+asyncio) and how they report progress (the console or events).
+"""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Any
+
+from .compaction import Compactor
+from .config import config
+from .constants import MAX_TOOL_ROUNDS
+from .history import History
+from .llm.types import LLMResponse, Message, ToolCall, Usage
+from .loop_guard import LoopGuard
+from .sessions import SessionStore
+from .tools import registry
+from .tools.context import ToolContext
+from .tools.file_read import last_read_number, read_number
+from .tracing import span
+from .usage import UsageTracker
+
+MAX_ROUNDS_MESSAGE = f"Reached maximum tool rounds ({MAX_TOOL_ROUNDS}). Stopping."
+
+# Result recorded for tool calls left unanswered when a turn is interrupted
+INTERRUPTED_RESULT = "Error: the turn was interrupted before this call finished."
+
+
+class AgentCore:
+    """Turn and round bookkeeping on `history`; subclasses do the IO.
+
+    A subclass sets `provider` and `history`, then calls `_init_core`.
+    """
+
+    provider: Any
+    history: History
+
+    def _init_core(self, workdir: Path | None = None, blobs: SessionStore | None = None) -> None:
+        """Set up the per-session state; `blobs` keeps compacted results of a saved session."""
+        self.compactor = Compactor(blobs=blobs)
+        self.last_usage: Usage | None = None
+        self.usage = UsageTracker()
+        self.tool_context = ToolContext(
+            workdir=workdir,
+            reads=last_read_number(self.history.messages),
+            blobs=blobs,
+        )
+        self._trims_seen = self.history.trims
+        self.loop_guard = LoopGuard(registry, config.loop_stop_rounds) if config.loop_guard else None
+
+    def _start_turn(self, user_input: str) -> list[dict[str, Any]]:
+        """Add the user's message; returns the tool schemas for the turn's requests."""
+        self.history.append(Message(role="user", content=user_input))
+        self.usage.start_turn()
+        if self.loop_guard is not None:
+            self.loop_guard.start_turn()
+        if registry.cache is not None:
+            # Files may have been changed outside the agent since the last message
+            registry.cache.invalidate(())
+        return registry.get_schemas()
+
+    def _compact(self) -> None:
+        """Compact stale tool results, keeping file_read diff bases valid."""
+        context = self.tool_context
+        if config.compaction:
+            with span("agent.compact", "agent"):
+                live = context.live_reads()
+                self.compactor.compact(self.history, pinned=lambda msg: read_number(msg.content) in live)
+            if self.compactor.compacted:
+                context.forget_reads({read_number(msg.content) for msg in self.compactor.compacted})
+                if self.loop_guard is not None:
+                    self.loop_guard.forget({msg.tool_call_id or "" for msg in self.compactor.compacted})
+        if self.history.trims != self._trims_seen:
+            self._trims_seen = self.history.trims
+            context.forget_reads()
+            if self.loop_guard is not None:
+                self.loop_guard.forget()
+
+    def _answer(self, call: ToolCall) -> str | None:
+        """The loop guard's reply standing in for `call`, if it need not run."""
+        return self.loop_guard.check(call) if self.loop_guard is not None else None
+
+    def _record_response(self, response: LLMResponse) -> bool:
+        """Add the model's response to the history; True if it ends the turn."""
+        self.last_usage = response.usage
+        self.usage.record(getattr(self.provider, "model", ""), response, self.history)
+        self.history.append(Message(role="assistant", content=response.content, tool_calls=response.tool_calls))
+        return not response.has_tool_calls
+
+    def _record_result(self, call: ToolCall, result: str) -> None:
+        if self.loop_guard is not None:
+            self.loop_guard.record(call, result)
+        self.history.append(Message(role="tool", content=result, tool_call_id=call.id, name=call.name))
+
+    def _record_interrupted(self, calls: list[ToolCall]) -> None:
+        """Give `calls` a result anyway: a call without one makes the history unsendable."""
+        for call in calls:
+            self.history.append(Message(role="tool", content=INTERRUPTED_RESULT, tool_call_id=call.id, name=call.name))
+
+    def _end_round(self) -> str | None:
+        """Close a round of tool calls; why the turn stops here, if it does."""
+        if self.loop_guard is not None and self.loop_guard.end_round():
+            return (
+                f"Stopping: the model repeated the same tool calls for "
+                f"{self.loop_guard.repeat_rounds} rounds with nothing changing."
+            )
+        return None
@@ -1,12 +1,26 @@
 """Main agent loop — the brain of CodeAgent."""
 
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 
+from .agent_core import MAX_ROUNDS_MESSAGE, AgentCore
 from .config import config
-from .constants import SYSTEM_PROMPT, MAX_TOOL_ROUNDS, MAX_HISTORY_MESSAGES
+from .constants import SYSTEM_PROMPT, MAX_TOOL_ROUNDS
+from .history import History
 from .llm import get_provider, Message, ToolCall, ToolResult, LLMResponse
-from .llm.base import BaseLLMProvider
+from .llm.base import BaseLLMProvider, unwrap
+from .llm.hedged import HedgedProvider
+from .llm.endpoints import endpoint_pools
+from .llm.pool import stats as http_stats, warm_up
+from .llm.response_cache import CachingProvider
+from .llm.scheduler import schedulers
+from .llm.streaming import StreamAccumulator
+from .llm.types import TextDelta, ToolCallComplete
+from .sessions import SessionLog, SessionStore
 from .tools import registry
+from .tracing import span, tracer
+from .tools.context import use_context
+from .tools.executor import ToolBatch
 from .ui import (
     console,
     print_tool_call,
@@ -15,17 +29,33 @@ from .ui import (
     print_welcome,
     print_assistant,
     Spinner,
+    StreamingMarkdown,
 )
 from .ui.panels import print_info
 
 
-class Agent:
+class Agent(AgentCore):
     """Interactive coding agent that loops between user input, LLM, and tools."""
 
-    def __init__(self, provider_name: str | None = None) -> None:
+    def __init__(self, provider_name: str | None = None, resume: str | None = None) -> None:
         self.provider_name = provider_name or config.default_provider
         self.provider: BaseLLMProvider = self._init_provider(self.provider_name)
-        self.history: list[Message] = []
+        self.sessions = SessionStore()
+        self.session: SessionLog | None = None
+        self.history = History(budget=self.provider.history_budget(), on_append=self._save)
+        if resume:
+            self._resume(resume)
+        elif config.save_sessions:
+            self.session = self.sessions.create()
+        # A saved session keeps compacted results expandable in its blob area
+        self._init_core(blobs=self.sessions if self.session is not None else None)
+        self._warm_up()
+        self._tool_pool: ThreadPoolExecutor | None = None
+        if config.parallel_tools and config.tool_workers > 1:
+            self._tool_pool = ThreadPoolExecutor(
+                max_workers=config.tool_workers,
+                thread_name_prefix="codeagent-tool",
+            )
 
     def _init_provider(self, name: str) -> BaseLLMProvider:
         error = config.validate_provider(name)
@@ -34,6 +64,29 @@ class Agent:
             raise SystemExit(1)
         return get_provider(name)
 
+    def _resume(self, session_id: str) -> None:
+        try:
+            self.session = self.sessions.open(session_id)
+        except FileNotFoundError as e:
+            print_error(str(e))
+            raise SystemExit(1)
+        messages = self.session.load_tail(self.history.budget)
+        self.history.load(messages)
+        print_info(f"Resumed session {self.session.id} ({len(messages)} recent messages)")
+
+    def _save(self, message: Message, tokens: int) -> None:
+        if self.session is not None:
+            self.session.append(message, tokens)
+
+    def _warm_up(self) -> None:
+        """Load local models and open API connections in the background, as configured."""
+        for provider in getattr(unwrap(self.provider), "members", [self.provider]):
+            preload = getattr(unwrap(provider), "preload", None)
+            if preload is not None and config.ollama_preload:
+                preload()
+            elif config.warmup:
+                warm_up(provider)
+
     def switch_provider(self, name: str) -> None:
         """Switch to a different LLM provider mid-conversation."""
         error = config.validate_provider(name)
@@ -42,6 +95,8 @@ class Agent:
             return
         self.provider_name = name
         self.provider = get_provider(name)
+        self.history.set_budget(self.provider.history_budget())
+        self._warm_up()
         print_info(f"Switched to {self.provider.get_model_name()}")
 
     def run_interactive(self) -> None:
@@ -57,6 +112,7 @@ class Agent:
                 user_input = session.prompt("\n> ").strip()
             except (EOFError, KeyboardInterrupt):
                 console.print("\n[info]Goodbye![/info]")
+                self._print_resume_hint()
                 break
 
             if not user_input:
@@ -82,6 +138,7 @@ class Agent:
 
         if cmd in ("/quit", "/exit", "/q"):
             console.print("[info]Goodbye![/info]")
+            self._print_resume_hint()
             raise SystemExit(0)
         elif cmd == "/help":
             self._print_help()
@@ -93,7 +150,16 @@ class Agent:
                 console.print("[dim]Usage: /model claude  or  /model openai[/dim]")
         elif cmd == "/clear":
             self.history.clear()
+            self.tool_context.forget_reads()
+            if self.session is not None:
+                self.session = self.sessions.create()  # the old one stays resumable
             print_info("Conversation history cleared.")
+        elif cmd == "/sessions":
+            self._print_sessions()
+        elif cmd == "/stats":
+            self._print_stats()
+        elif cmd == "/usage":
+            self._print_usage()
         elif cmd == "/tools":
             names = registry.list_names()
             console.print(f"[info]Available tools ({len(names)}):[/info]")
@@ -111,64 +177,229 @@ class Agent:
                 "  [bold]/model[/bold] <provider>  Switch model (claude, openai)",
                 "  [bold]/clear[/bold]             Clear conversation history",
                 "  [bold]/tools[/bold]             List available tools",
+                "  [bold]/sessions[/bold]          List saved sessions",
+                "  [bold]/stats[/bold]             Show session statistics",
+                "  [bold]/usage[/bold]             Show token usage and cost",
                 "  [bold]/help[/bold]              Show this help",
                 "  [bold]/quit[/bold]              Exit CodeAgent",
             ])
         )
 
+    def _print_stats(self) -> None:
+        history = self.history
+        compactor = self.compactor
+        lines = [
+            "[bold]Session:[/bold]",
+            f"  History: {len(history)} messages, ~{history.total_tokens:,} of {history.budget:,} tokens",
+            f"  Compaction: {compactor.results_compacted} tool results, ~{compactor.tokens_saved:,} tokens saved",
+        ]
+        cache = registry.cache
+        if cache is not None:
+            lines.append(
+                f"  Tool cache: {cache.hits} hits, {cache.misses} misses, "
+                f"{len(cache)} entries ({cache.size_bytes / 1024:,.0f} KB)"
+            )
+        if http_stats.requests:
+            lines.append(
+                f"  HTTP: {http_stats.requests} requests over {http_stats.connections} connections "
+                f"({http_stats.tls_handshakes} TLS handshakes, {http_stats.setup_seconds * 1000:,.0f} ms connecting)"
+            )
+        for scheduler in schedulers():
+            counts = scheduler.stats
+            if counts.requests:
+                lines.append(
+                    f"  {scheduler.name} requests: {counts.requests} sent, {counts.retries} retried, "
+                    f"{counts.throttled} throttled, {counts.failures} failed, {counts.waited:.1f}s waiting, "
+                    f"concurrency {int(scheduler.limit)}/{scheduler.max_concurrency}"
+                )
+        for pool in endpoint_pools():
+            if len(pool) > 1:
+                servers = ", ".join(
+                    f"{e.url} {e.requests} ({e.outstanding} in flight{', ejected' if e.ejected else ''})"
+                    for e in pool.endpoints
+                )
+                lines.append(f"  Servers: {servers}; {pool.affinity_hits} kept on their conversation's server")
+        llm_cache = self.provider
+        while not isinstance(llm_cache, CachingProvider) and hasattr(llm_cache, "inner"):
+            llm_cache = llm_cache.inner
+        if isinstance(llm_cache, CachingProvider):
+            counts = llm_cache.stats
+            store = llm_cache.store
+            lines.append(
+                f"  LLM cache: {counts.hits} hits, {counts.shared} shared, {counts.misses} misses "
+                f"({counts.hit_rate:.0%} hit rate), {len(store)} entries ({store.size_bytes / 2**20:,.1f} MB)"
+            )
+        hedged = unwrap(self.provider)
+        if isinstance(hedged, HedgedProvider):
+            counts = hedged.stats
+            p = hedged.percentile
+            latencies = ", ".join(
+                f"{name} {window.percentile(p) or 0:.2f}s"
+                for name, window in zip(hedged.names, hedged.latencies["first_event"])
+                if len(window)
+            )
+            lines.append(
+                f"  Hedging: {counts.requests} requests, {counts.hedges} hedged, {counts.failovers} failed over, "
+                f"{counts.secondary_wins} answered by a secondary"
+                + (f"; p{p:g} first event: {latencies}" if latencies else "")
+            )
+        guard = self.loop_guard
+        if guard is not None:
+            lines.append(
+                f"  Loop guard: {guard.calls_answered} repeated calls answered, "
+                f"{guard.turns_stopped} turns stopped, {guard.rounds_saved} rounds saved"
+            )
+        usage = self.last_usage
+        if usage is not None:
+            lines.append(
+                f"  Last request: {usage.input_tokens:,} in, {usage.output_tokens:,} out, "
+                f"{usage.cache_read_tokens:,} cache read, {usage.cache_write_tokens:,} cache write"
+            )
+        if tracer.enabled:
+            lines.append("[bold]Time by span[/bold] (count, total, mean, max, KB in/out, tokens):")
+            for row in tracer.summary()[:15]:
+                lines.append(
+                    f"  {row['name']:<24} {row['count']:>5}  {row['total_ms']:>9,.1f} ms"
+                    f"  {row['mean_ms']:>8,.1f}  {row['max_ms']:>8,.1f}"
+                    f"  {row['bytes_in'] / 1024:>7,.1f}/{row['bytes_out'] / 1024:<7,.1f}  {row['tokens']:,}"
+                )
+        else:
+            lines.append("[dim]  Start with --trace FILE for a per-span timing breakdown.[/dim]")
+        console.print("\n".join(lines), highlight=False)
+
+    def _print_usage(self) -> None:
+        tracker = self.usage
+        lines = ["[bold]Usage:[/bold]"]
+        for label, totals in (("Session", tracker.session), ("Last turn", tracker.turn)):
+            usage = totals.usage
+            if totals.unpriced_requests == totals.requests:
+                price = "cost n/a"
+            else:
+                price = f"${totals.cost:,.4f}" + (" (some requests unpriced)" if totals.unpriced_requests else "")
+            mean = totals.latency / totals.requests if totals.requests else 0.0
+            lines.append(
+                f"  {label}: {totals.requests} requests, {usage.input_tokens:,} in, "
+                f"{usage.output_tokens:,} out, {usage.cache_read_tokens:,} cache read, "
+                f"{usage.cache_write_tokens:,} cache write, {price}, {mean:.2f}s mean latency"
+            )
+        sent = sum(tracker.context_by_role.values())
+        if sent:
+            lines.append(f"  Context sent, by role (estimated, {sent:,} tokens over all requests):")
+            for role, tokens in sorted(tracker.context_by_role.items(), key=lambda item: -item[1]):
+                lines.append(f"    {role:<16} {tokens:>10,}  {tokens / sent:>6.1%}")
+            if tracker.context_by_tool:
+                lines.append("  Tool output in context, by tool:")
+                for name, tokens in sorted(tracker.context_by_tool.items(), key=lambda item: -item[1]):
+                    lines.append(f"    {name:<16} {tokens:>10,}  {tokens / sent:>6.1%}")
+        console.print("\n".join(lines), highlight=False)
+
+    def _print_sessions(self, limit: int = 20) -> None:
+        infos = self.sessions.list()
+        if not infos:
+            print_info("No saved sessions.")
+            return
+        console.print(f"[info]Saved sessions ({len(infos)}), newest first:[/info]")
+        for info in infos[:limit]:
+            marker = "*" if self.session is not None and info.id == self.session.id else " "
+            console.print(
+                f" {marker}[bold]{info.id}[/bold]  [dim]{info.messages} messages, "
+                f"{info.size_bytes / 1024:,.0f} KB[/dim]  {info.preview}",
+                highlight=False,
+            )
+        if self.session is not None and self.session.error:
+            console.print(f"[warning]Current session is not being saved: {self.session.error}[/warning]")
+        console.print("[dim]Resume one with: codeagent --resume <id>[/dim]")
+
+    def _print_resume_hint(self) -> None:
+        if self.session is not None and self.sessions.exists(self.session.id):
+            console.print(f"[dim]Session saved; resume with: codeagent --resume {self.session.id}[/dim]")
+
     def _process_message(self, user_input: str) -> None:
         """Send a user message through the agent loop."""
-        self.history.append(Message(role="user", content=user_input))
-        self._trim_history()
+        with use_context(self.tool_context), span("agent.turn", "agent", bytes_in=len(user_input)):
+            self._run_turn(user_input)
 
-        tool_schemas = registry.get_schemas()
+    def _run_turn(self, user_input: str) -> None:
+        tool_schemas = self._start_turn(user_input)
 
         for _ in range(MAX_TOOL_ROUNDS):
-            with Spinner("Thinking..."):
-                response = self.provider.chat(
-                    messages=self.history,
-                    tools=tool_schemas,
-                    system=SYSTEM_PROMPT,
-                )
+            self._compact()
 
-            # Show any text content
-            if response.content:
-                print_assistant(response.content)
+            if config.stream:
+                response, batch = self._stream_round(tool_schemas)
+            else:
+                response, batch = self._chat_round(tool_schemas)
+            if self._record_response(response):
+                break
+
+            # Collect tool results; read-only calls overlap, output stays in order
+            answered = 0
+            try:
+                with span("agent.tool_results", "agent", calls=len(response.tool_calls)):
+                    for i, tc in enumerate(response.tool_calls):
+                        print_tool_call(tc.name, tc.arguments)
+                        result = batch.result(i)
+                        print_tool_result(tc.name, result)
+                        self._record_result(tc, result)
+                        answered += 1
+            except BaseException:
+                # E.g. Ctrl-C while a tool runs
+                batch.cancel()
+                self._record_interrupted(response.tool_calls[answered:])
+                raise
 
-            # If no tool calls, we're done
-            if not response.has_tool_calls:
-                self.history.append(Message(role="assistant", content=response.content))
+            stop = self._end_round()
+            if stop is not None:
+                print_error(stop)
                 break
+        else:
+            print_error(MAX_ROUNDS_MESSAGE)
 
-            # Record assistant message with tool calls
-            self.history.append(
-                Message(
-                    role="assistant",
-                    content=response.content,
-                    tool_calls=response.tool_calls,
-                )
+    def _chat_round(self, tool_schemas: list[dict]) -> tuple[LLMResponse, ToolBatch]:
+        """One LLM call without streaming: wait for the full response."""
+        with Spinner("Thinking..."):
+            response = self.provider.chat(
+                messages=self.history.messages,
+                tools=tool_schemas,
+                system=SYSTEM_PROMPT,
             )
 
-            # Execute each tool call
-            for tc in response.tool_calls:
-                print_tool_call(tc.name, tc.arguments)
-                result = registry.execute(tc.name, tc.arguments)
-                print_tool_result(tc.name, result)
-
-                # Add tool result to history
-                self.history.append(
-                    Message(
-                        role="tool",
-                        content=result,
-                        tool_call_id=tc.id,
-                        name=tc.name,
-                    )
-                )
-        else:
-            print_error(f"Reached maximum tool rounds ({MAX_TOOL_ROUNDS}). Stopping.")
+        # Show any text content
+        if response.content:
+            print_assistant(response.content)
+
+        batch = ToolBatch(registry, self._tool_pool)
+        for tc in response.tool_calls:
+            self._submit(batch, tc)
+        return response, batch
+
+    def _stream_round(self, tool_schemas: list[dict]) -> tuple[LLMResponse, ToolBatch]:
+        """One streamed LLM call.
+
+        Text is rendered as it arrives, and each tool call is handed to the
+        batch as soon as its arguments are complete, so read-only tools run
+        while the model is still writing the rest of the response.
+        """
+        accumulator = StreamAccumulator()
+        batch = ToolBatch(registry, self._tool_pool)
+        with StreamingMarkdown("Thinking...") as output:
+            try:
+                for event in self.provider.stream_chat(
+                    messages=self.history.messages,
+                    tools=tool_schemas,
+                    system=SYSTEM_PROMPT,
+                ):
+                    accumulator.feed(event)
+                    if isinstance(event, TextDelta):
+                        output.append(event.text)
+                    elif isinstance(event, ToolCallComplete):
+                        self._submit(batch, event.tool_call)
+            except BaseException:
+                # Nothing of this round reaches the history; don't leave its tools running
+                batch.cancel()
+                raise
+        return accumulator.response(), batch
 
-    def _trim_history(self) -> None:
-        """Keep conversation history under the limit."""
-        if len(self.history) > MAX_HISTORY_MESSAGES:
-            # Keep the most recent messages, preserving pairs
-            self.history = self.history[-MAX_HISTORY_MESSAGES:]
+    def _submit(self, batch: ToolBatch, call: ToolCall) -> None:
+        """Queue a tool call, answering repeats from the loop guard instead of running them."""
+        batch.submit(call, self._answer(call))
@@ -0,0 +1,122 @@
+"""Asyncio agent loop for running many sessions in one process."""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable
+
+from .agent_core import MAX_ROUNDS_MESSAGE, AgentCore
+from .constants import SYSTEM_PROMPT, MAX_TOOL_ROUNDS
+from .history import History
+from .llm import get_async_provider
+from .llm.base import AsyncBaseLLMProvider
+from .llm.streaming import StreamAccumulator
+from .llm.types import TextDelta, ToolCallComplete, Usage
+from .sessions import SessionLog
+from .tools import registry
+from .tools.context import use_context
+from .tools.executor import AsyncToolBatch
+from .tracing import span
+
+# Receives progress events as plain dicts, e.g. {"type": "text", "text": "..."}
+EventHandler = Callable[[dict[str, Any]], None]
+
+
+class AsyncAgent(AgentCore):
+    """Headless counterpart of `codeagent.app.Agent`.
+
+    Nothing is printed; progress is reported through the optional `on_event`
+    callback as "text", "tool_call", "tool_result" and "error" events. Each
+    instance is one session, and any number of them can share an event loop.
+    Tools resolve relative paths and run commands in `workdir` (default: the
+    process working directory). With a `session` log, the recent messages
+    already in it are loaded and new ones are appended as they happen.
+    """
+
+    def __init__(
+        self,
+        provider: AsyncBaseLLMProvider | str = "demo",
+        on_event: EventHandler | None = None,
+        workdir: str | Path | None = None,
+        session: SessionLog | None = None,
+    ) -> None:
+        if isinstance(provider, str):
+            provider = get_async_provider(provider)
+        self.provider: AsyncBaseLLMProvider = provider
+        self.on_event = on_event
+        self.session = session
+        self.history = History(budget=self.provider.history_budget())
+        if session is not None:
+            self.history.load(session.load_tail(self.history.budget))
+            self.history.on_append = session.append
+        self._init_core(
+            workdir=Path(workdir).resolve() if workdir else None,
+            blobs=session.store if session is not None else None,
+        )
+
+    @property
+    def total_usage(self) -> Usage:
+        """Token counts summed over every request of the session."""
+        return self.usage.session.usage
+
+    async def send(self, user_input: str) -> str:
+        """Run one user message through the agent loop; return the final text."""
+        with use_context(self.tool_context), span("agent.turn", "agent", bytes_in=len(user_input)):
+            return await self._send(user_input)
+
+    async def _send(self, user_input: str) -> str:
+        tool_schemas = self._start_turn(user_input)
+
+        for _ in range(MAX_TOOL_ROUNDS):
+            self._compact()
+
+            accumulator = StreamAccumulator()
+            batch = AsyncToolBatch(registry)
+            try:
+                async for event in self.provider.stream_chat(
+                    messages=self.history.messages,
+                    tools=tool_schemas,
+                    system=SYSTEM_PROMPT,
+                ):
+                    accumulator.feed(event)
+                    if isinstance(event, TextDelta):
+                        self._emit({"type": "text", "text": event.text})
+                    elif isinstance(event, ToolCallComplete):
+                        batch.submit(event.tool_call, self._answer(event.tool_call))
+            except BaseException:
+                batch.cancel()
+                raise
+
+            response = accumulator.response()
+            if self._record_response(response):
+                return response.content
+
+            answered = 0
+            try:
+                for i, tc in enumerate(response.tool_calls):
+                    self._emit({"type": "tool_call", "name": tc.name, "arguments": tc.arguments})
+                    result = await batch.result(i)
+                    self._emit({
+                        "type": "tool_result",
+                        "name": tc.name,
+                        "content": result,
+                        "duration_ms": round(batch.durations.get(i, 0.0) * 1000, 1),
+                    })
+                    self._record_result(tc, result)
+                    answered += 1
+            except BaseException:
+                # Cancelled, e.g. the client went away
+                batch.cancel()
+                self._record_interrupted(response.tool_calls[answered:])
+                raise
+
+            stop = self._end_round()
+            if stop is not None:
+                self._emit({"type": "error", "message": stop})
+                return ""
+
+        self._emit({"type": "error", "message": MAX_ROUNDS_MESSAGE})
+        return ""
+
+    def _emit(self, event: dict[str, Any]) -> None:
+        if self.on_event is not None:
+            self.on_event(event)
@@ -0,0 +1,239 @@
+"""Headless batch mode: run many prompts from a JSONL file concurrently.
+
+Each input line is a task::
+
+    {"id": "fix-123", "prompt": "Make test_parser pass", "provider": "claude", "cwd": "repos/parser"}
+
+Only "prompt" is required. Tasks run on a pool of asyncio workers, each
+with its own `AsyncAgent`, and every result is appended to the output file
+as soon as the task finishes. Tasks with an "ok" result in the output are
+skipped, so an interrupted run can be resumed by running it again; failed
+and timed-out ones run again and get a new record (the last one for an id
+is current). Each run ends with a record ``{"summary": {...}}`` holding its
+counts and, when the LLM response cache is on, the cache's hit rate. Each
+task's conversation is saved as session ``batch-<id>``, so it can be
+inspected or continued with ``codeagent --resume``.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+import click
+
+from .async_agent import AsyncAgent
+from .config import config
+from .llm import get_async_provider
+from .llm.base import AsyncBaseLLMProvider, unwrap
+from .llm.pool import release_loop
+from .llm.response_cache import AsyncCachingProvider, CacheStats
+from .sessions import SessionStore
+from .ui import console, print_error
+
+
+def _read_tasks(path: Path) -> Iterator[dict[str, Any]]:
+    """Yield tasks from a JSONL file, giving id-less tasks their line number."""
+    with path.open(encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                task = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {"id": f"line-{line_no}", "error": f"Invalid JSON: {e}"}
+                continue
+            if not isinstance(task, dict):
+                yield {"id": f"line-{line_no}", "error": "Task must be a JSON object"}
+                continue
+            task["id"] = str(task.get("id") or f"line-{line_no}")
+            yield task
+
+
+def _completed_ids(path: Path) -> set[str]:
+    """Ids of tasks with an "ok" result in the output file (a torn last line is ignored)."""
+    done: set[str] = set()
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and "id" in record and record.get("status") == "ok":
+                done.add(str(record["id"]))
+    return done
+
+
+class BatchRunner:
+    """Runs tasks under a global concurrency limit and streams results to disk."""
+
+    def __init__(
+        self,
+        out_path: Path,
+        workers: int = 4,
+        timeout: float | None = None,
+        default_provider: str | None = None,
+    ) -> None:
+        self.out_path = out_path
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.default_provider = default_provider or config.default_provider
+        self._providers: dict[str, AsyncBaseLLMProvider] = {}
+        self._preloads: list[asyncio.Task[None]] = []
+        self._sessions = SessionStore() if config.save_sessions else None
+        self.counts = {"ok": 0, "error": 0, "timeout": 0, "skipped": 0}
+
+    async def run(self, tasks: Iterator[dict[str, Any]]) -> dict[str, int]:
+        done = _completed_ids(self.out_path)
+        self.out_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.out_path.open("a", encoding="utf-8") as out:
+            async def worker() -> None:
+                # Tasks are pulled lazily, so huge inputs are never all in memory
+                for task in tasks:
+                    if task["id"] in done:
+                        self.counts["skipped"] += 1
+                        continue
+                    done.add(task["id"])
+                    record = await self._run_task(task)
+                    self.counts[record["status"]] += 1
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+                    self._report(record)
+
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.workers)))
+            except BaseException:
+                for preload in self._preloads:
+                    preload.cancel()
+                raise
+            finally:
+                # Model loads still running must not outlive the loop's HTTP client
+                await asyncio.gather(*self._preloads, return_exceptions=True)
+            summary: dict[str, Any] = dict(self.counts)
+            cache = self.cache_stats()
+            if cache is not None:
+                summary["llm_cache"] = cache.as_dict()
+            out.write(json.dumps({"summary": summary}) + "\n")
+        return self.counts
+
+    def cache_stats(self) -> CacheStats | None:
+        """Counts of the LLM response cache the tasks' providers used, if any."""
+        for provider in self._providers.values():
+            while not isinstance(provider, AsyncCachingProvider) and hasattr(provider, "inner"):
+                provider = provider.inner
+            if isinstance(provider, AsyncCachingProvider):
+                return provider.stats
+        return None
+
+    def _provider(self, name: str) -> AsyncBaseLLMProvider:
+        # Providers are shared across tasks so their HTTP connections are reused
+        if name not in self._providers:
+            provider = self._providers[name] = get_async_provider(name)
+            for member in getattr(unwrap(provider), "members", [provider]):
+                preload = getattr(unwrap(member), "preload", None)
+                if preload is not None and config.ollama_preload:
+                    self._preloads.append(asyncio.ensure_future(preload()))
+        return self._providers[name]
+
+    async def _run_task(self, task: dict[str, Any]) -> dict[str, Any]:
+        record: dict[str, Any] = {"id": task["id"], "status": "error"}
+        if "error" in task:
+            record["error"] = task["error"]
+            return record
+        prompt = task.get("prompt")
+        if not isinstance(prompt, str) or not prompt:
+            record["error"] = "Task has no prompt"
+            return record
+        provider_name = task.get("provider") or self.default_provider
+        error = config.validate_provider(provider_name)
+        if error:
+            record["error"] = error
+            return record
+        cwd = task.get("cwd")
+        if cwd and not Path(cwd).is_dir():
+            record["error"] = f"Working directory not found: {cwd}"
+            return record
+
+        trace: list[dict[str, Any]] = []
+        pending: dict[str, Any] = {}
+
+        def on_event(event: dict[str, Any]) -> None:
+            if event["type"] == "tool_call":
+                pending.update(name=event["name"], arguments=event["arguments"])
+            elif event["type"] == "tool_result":
+                trace.append({
+                    **pending,
+                    "duration_ms": event["duration_ms"],
+                    "result_chars": len(event["content"]),
+                })
+                pending.clear()
+
+        # A rerun task starts over rather than continuing its previous attempt
+        session = self._sessions.create(f"batch-{task['id']}", overwrite=True) if self._sessions else None
+        agent = AsyncAgent(self._provider(provider_name), on_event=on_event, workdir=cwd, session=session)
+        start = time.perf_counter()
+        record["provider"] = provider_name
+        try:
+            record["final_text"] = await asyncio.wait_for(agent.send(prompt), self.timeout)
+            record["status"] = "ok"
+        except asyncio.TimeoutError:
+            record["status"] = "timeout"
+            record["error"] = f"Timed out after {self.timeout}s"
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        record["tool_trace"] = trace
+        record["usage"] = agent.usage.as_dict()
+        if agent.loop_guard is not None:
+            record["loop_guard"] = agent.loop_guard.as_dict()
+        return record
+
+    def _report(self, record: dict[str, Any]) -> None:
+        finished = self.counts["ok"] + self.counts["error"] + self.counts["timeout"]
+        style = "success" if record["status"] == "ok" else "error"
+        seconds = record.get("duration_ms", 0) / 1000
+        console.print(
+            f"[dim]{finished:>5}[/dim] [{style}]{record['status']:<7}[/{style}] "
+            f"{record['id']} [dim]({seconds:.1f}s)[/dim]",
+            highlight=False,
+        )
+
+
+@click.command()
+@click.argument("tasks", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--out", "-o", required=True, type=click.Path(dir_okay=False, path_type=Path),
+              help="JSONL file results are appended to (also used to resume; failed tasks run again).")
+@click.option("--workers", "-w", default=4, show_default=True, help="Tasks run concurrently.")
+@click.option("--timeout", "-t", type=float, default=None, help="Per-task timeout in seconds.")
+@click.option("--provider", "-p", default=None,
+              help="Provider for tasks that do not name one (default: CODEAGENT_DEFAULT_PROVIDER).")
+def batch_command(tasks: Path, out: Path, workers: int, timeout: float | None, provider: str | None) -> None:
+    """Run every prompt in TASKS (JSONL) and write results to --out."""
+    runner = BatchRunner(out, workers=workers, timeout=timeout, default_provider=provider)
+
+    async def run() -> dict[str, int]:
+        try:
+            return await runner.run(_read_tasks(tasks))
+        finally:
+            await release_loop()
+
+    try:
+        counts = asyncio.run(run())
+    except KeyboardInterrupt:
+        print_error("Interrupted; rerun the same command to resume.")
+        raise SystemExit(130)
+    console.print(
+        f"[info]Done: {counts['ok']} ok, {counts['error']} failed, "
+        f"{counts['timeout']} timed out, {counts['skipped']} already done.[/info]"
+    )
+    cache = runner.cache_stats()
+    if cache is not None:
+        console.print(
+            f"[info]LLM cache: {cache.hits} hits, {cache.shared} shared, {cache.misses} misses "
+            f"({cache.hit_rate:.0%} hit rate).[/info]"
+        )
@@ -1,20 +1,94 @@
 """CLI entry point using Click."""
 
 from __future__ import annotations
+import importlib
+from pathlib import Path
+from typing import Any, Callable
+
 import click
 from . import __version__
 
+# Subcommands imported only when used: (module, attribute)
+_LAZY_COMMANDS = {
+    "batch": ("batch", "batch_command"),
+    "serve": ("server", "serve_command"),
+}
 
-@click.command()
-@click.version_option(__version__, prog_name="CodeAgent")
-@click.option(
-    "--model", "-m",
-    type=click.Choice(["claude", "openai", "ollama", "demo"], case_sensitive=False),
-    default=None,
-    help="LLM provider: claude, openai, ollama (free local), or demo.",
+_OPTIONS = [
+    click.option(
+        "--model", "-m",
+        type=click.Choice(["claude", "openai", "ollama", "demo", "replay", "hedged"], case_sensitive=False),
+        default=None,
+        help="LLM provider: claude, openai, ollama (free local), demo, replay (see --replay), "
+        "or hedged (see CODEAGENT_HEDGE).",
+    ),
+    click.option(
+        "--attach", is_flag=True,
+        help="Run through a `codeagent serve` daemon instead of starting a new agent.",
+    ),
+    click.option(
+        "--session", default=None,
+        help="With --attach: daemon session id to continue (default: a new session).",
+    ),
+    click.option(
+        "--resume", "resume", default=None, metavar="ID",
+        help="Continue a saved session (list them with /sessions).",
+    ),
+    click.option(
+        "--trace", "trace_path", type=click.Path(dir_okay=False, path_type=Path), default=None,
+        help="Record timing spans and write them to this Chrome trace-event JSON file on exit.",
+    ),
+    click.option(
+        "--record", "record_path", type=click.Path(dir_okay=False, path_type=Path), default=None,
+        help="Append every LLM response, with its stream timing, to this cassette file.",
+    ),
+    click.option(
+        "--replay", "replay_path", type=click.Path(exists=True, dir_okay=False, path_type=Path), default=None,
+        help="Answer from a recorded cassette instead of calling a model (implies --model replay).",
+    ),
+    click.option(
+        "--replay-speed", type=float, default=None,
+        help="Replay pace: 1 = as recorded, 0 = instant (default: CODEAGENT_REPLAY_SPEED or 0).",
+    ),
+]
+
+
+def _agent_options(func: Callable[..., Any]) -> Callable[..., Any]:
+    for option in reversed(_OPTIONS):
+        func = option(func)
+    return func
+
+
+class _MainGroup(click.Group):
+    """Subcommands, with any other first word starting a one-shot message."""
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted([*self.commands, *_LAZY_COMMANDS])
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        name = cmd_name.lower()
+        if name in _LAZY_COMMANDS:
+            module, attr = _LAZY_COMMANDS[name]
+            return getattr(importlib.import_module(f".{module}", __package__), attr)
+        return self.commands.get(name)
+
+    def resolve_command(
+        self, ctx: click.Context, args: list[str]
+    ) -> tuple[str | None, click.Command | None, list[str]]:
+        if args and not args[0].startswith("-") and self.get_command(ctx, args[0]) is None:
+            return "message", _oneshot, args
+        return super().resolve_command(ctx, args)
+
+
+@click.group(
+    cls=_MainGroup,
+    invoke_without_command=True,
+    subcommand_metavar="[MESSAGE]... | COMMAND [ARGS]...",
 )
-@click.argument("message", nargs=-1)
-def main(model: str | None, message: tuple[str, ...]) -> None:
+@click.version_option(__version__, prog_name="CodeAgent")
+@_agent_options
+@click.pass_context
+def main(ctx: click.Context, **options: Any) -> None:
     """CodeAgent - AI coding assistant in your terminal.
 
     Start an interactive session, or pass a MESSAGE for one-shot mode.
@@ -24,17 +98,75 @@ def main(model: str | None, message: tuple[str, ...]) -> None:
         codeagent                        # interactive session
         codeagent --model openai         # use OpenAI
         codeagent "explain this code"    # one-shot
+        codeagent --resume <id>          # continue a saved session
+        codeagent --trace trace.json     # record a timing trace
+        codeagent --record run.jsonl     # record LLM responses
+        codeagent --replay run.jsonl     # rerun them offline
         codeagent demo                   # run client demo
+        codeagent batch tasks.jsonl --out results.jsonl --workers 8
+        codeagent serve                  # start the background daemon
+        codeagent --attach "fix the test" # one-shot through the daemon
     """
-    # Check for demo command first (no API key needed)
-    if message and message[0].lower() == "demo":
-        from .demo import run_demo
-        run_demo()
-        return
+    ctx.obj = options
+    if options["model"]:
+        # --model before `batch` names the default provider of its tasks
+        ctx.default_map = {"batch": {"provider": options["model"]}}
+    if ctx.invoked_subcommand is None:
+        _start(options, ())
+
+
+# Not registered on the group: `resolve_command` routes messages here. It
+# takes the same options, so they may also follow the message.
+@click.command("message", hidden=True)
+@_agent_options
+@click.argument("message", nargs=-1, required=True)
+@click.pass_context
+def _oneshot(ctx: click.Context, message: tuple[str, ...], **options: Any) -> None:
+    given = {name: value for name, value in options.items() if value is not None and value is not False}
+    _start({**ctx.obj, **given}, message)
+
+
+@main.command()
+def demo() -> None:
+    """Run the client demo (no API key needed)."""
+    from .demo import run_demo
+    run_demo()
+
+
+def _start(options: dict[str, Any], message: tuple[str, ...]) -> None:
+    model = options["model"]
+    if options["attach"]:
+        from .client import attach as attach_to_daemon
+        text = " ".join(message) if message else None
+        raise SystemExit(attach_to_daemon(text, session=options["session"], provider=model))
+
+    record_path, replay_path = options["record_path"], options["replay_path"]
+    replay_speed, trace_path = options["replay_speed"], options["trace_path"]
+    if record_path is not None or replay_path is not None or replay_speed is not None:
+        from .config import config
+        if record_path is not None:
+            config.record_path = record_path
+        if replay_path is not None:
+            config.replay_path = replay_path
+            model = model or "replay"
+        if replay_speed is not None:
+            config.replay_speed = max(0.0, replay_speed)
+
+    if trace_path is not None:
+        from .tracing import tracer
+        tracer.enable()
+    try:
+        _run(model, options["resume"], message)
+    finally:
+        if trace_path is not None:
+            count = tracer.export_chrome(trace_path)
+            click.echo(f"Wrote {count} trace spans to {trace_path}", err=True)
+
 
+def _run(model: str | None, resume: str | None, message: tuple[str, ...]) -> None:
     from .app import Agent
 
-    agent = Agent(provider_name=model)
+    agent = Agent(provider_name=model, resume=resume)
 
     if message:
         agent.run_oneshot(" ".join(message))
@@ -0,0 +1,105 @@
+"""`codeagent --attach`: thin client for the `codeagent serve` daemon.
+
+Deliberately imports nothing beyond the standard library (no Rich, no
+SDKs), so a one-shot request costs little more than the round trip to the
+daemon and the LLM.
+"""
+
+from __future__ import annotations
+import os
+import socket
+import sys
+import uuid
+from pathlib import Path
+from typing import Any
+
+from .protocol import ProtocolError, default_socket_path, recv_frame, send_frame
+
+_MAX_RESULT_DISPLAY = 2000
+
+
+def _connect(socket_path: Path) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        raise SystemExit(
+            f"Error: no CodeAgent daemon at {socket_path}. Start one with `codeagent serve`."
+        )
+    return sock
+
+
+def _print_event(event: dict[str, Any]) -> None:
+    out = sys.stdout
+    kind = event.get("event")
+    if kind == "text":
+        out.write(event.get("text", ""))
+    elif kind == "tool_call":
+        args = ", ".join(f"{k}={v!s:.60}" for k, v in event.get("arguments", {}).items())
+        out.write(f"\n  Tool: {event.get('name')}({args})\n")
+    elif kind == "tool_result":
+        content = event.get("content", "")
+        if len(content) > _MAX_RESULT_DISPLAY:
+            content = content[:_MAX_RESULT_DISPLAY] + "\n... (truncated)"
+        out.write(content + "\n")
+    out.flush()
+
+
+def _request(sock: socket.socket, request: dict[str, Any]) -> dict[str, Any]:
+    """Send one request, print streamed events, and return the final frame."""
+    send_frame(sock, request)
+    while True:
+        event = recv_frame(sock)
+        if event is None:
+            raise ProtocolError("Daemon closed the connection")
+        if event.get("event") in ("done", "error"):
+            return event
+        _print_event(event)
+
+
+def attach(
+    message: str | None,
+    session: str | None = None,
+    provider: str | None = None,
+    socket_path: Path | None = None,
+) -> int:
+    """Send `message` (or run a prompt loop) through the daemon. Returns an exit code."""
+    sock = _connect(socket_path or default_socket_path())
+    # Without a name the session is ephemeral: the daemon forgets it when
+    # this connection ends, however it ends
+    base = {
+        "op": "send",
+        "session": session or f"attach-{uuid.uuid4().hex[:12]}",
+        "ephemeral": session is None,
+        "provider": provider,
+        "cwd": os.getcwd(),
+    }
+    try:
+        if message is not None:
+            return _finish(_request(sock, {**base, "message": message}))
+
+        while True:
+            try:
+                text = input("\n> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                return 0
+            if text in ("/quit", "/exit", "/q"):
+                return 0
+            if text:
+                _finish(_request(sock, {**base, "message": text}))
+    except ProtocolError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        sock.close()
+
+
+def _finish(final: dict[str, Any]) -> int:
+    if final.get("event") == "error":
+        print(f"\nError: {final.get('message')}", file=sys.stderr)
+        return 1
+    sys.stdout.write("\n")
+    sys.stdout.flush()
+    return 0
@@ -0,0 +1,179 @@
+"""Compaction of stale tool results in conversation history.
+
+Old tool output (file dumps, long diffs, test logs) is re-sent with every
+request until it is trimmed away. Before each LLM call the compactor swaps
+results that are several rounds old, or very large and already seen by the
+model, for a short stub. The full text goes to a content-addressed side
+store so the model can get it back with the `expand_result` tool. That
+store is memory-only and bounded; for a saved session the text is also
+written to the session store's blob area, whose digests share the ids.
+"""
+
+from __future__ import annotations
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from typing import TYPE_CHECKING, Callable
+
+from .constants import (
+    COMPACT_ABOVE_CHARS,
+    COMPACT_AFTER_ROUNDS,
+    COMPACT_MIN_SAVINGS_TOKENS,
+    RESULT_STORE_BYTES,
+)
+from .history import History
+from .llm.tokens import estimate_message_tokens
+from .llm.types import Message, ToolCall
+
+if TYPE_CHECKING:
+    from .sessions import SessionStore
+
+STUB_PREFIX = "[compacted "
+
+
+class ResultStore:
+    """Content-addressed store for compacted tool output, LRU-bounded by size."""
+
+    def __init__(self, max_bytes: int = RESULT_STORE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, text: str) -> str:
+        """Store `text` and return its id."""
+        # The same digest as SessionStore.put_blob, so ids find persisted copies
+        key = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()[:12]
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return key
+            self._items[key] = text
+            self._bytes += len(text)
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+        return key
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            text = self._items.get(key)
+            if text is not None:
+                self._items.move_to_end(key)
+            return text
+
+
+# Shared by all sessions in the process; ids are content hashes
+result_store = ResultStore()
+
+
+class Compactor:
+    """Replaces stale tool results in a `History` with stubs.
+
+    Results from the latest round are never touched. Older ones are
+    compacted once they are `max_age_rounds` rounds old or longer than
+    `max_chars`. Compaction is applied in batches of at least `min_savings`
+    tokens so the request prefix (and any provider-side prompt cache) does not
+    change on every round. The originals replaced by the last `compact` call
+    are kept in `compacted`. With `blobs`, originals are also persisted there.
+    """
+
+    def __init__(
+        self,
+        store: ResultStore = result_store,
+        max_age_rounds: int = COMPACT_AFTER_ROUNDS,
+        max_chars: int = COMPACT_ABOVE_CHARS,
+        min_savings: int = COMPACT_MIN_SAVINGS_TOKENS,
+        blobs: SessionStore | None = None,
+    ) -> None:
+        self.store = store
+        self.blobs = blobs
+        self.max_age_rounds = max_age_rounds
+        self.max_chars = max_chars
+        self.min_savings = min_savings
+        self.tokens_saved = 0
+        self.results_compacted = 0
+        self.compacted: list[Message] = []
+
+    def compact(self, history: History, pinned: Callable[[Message], bool] | None = None) -> int:
+        """Compact stale results in place. Returns the tokens saved.
+
+        Results for which `pinned` returns True are exempt from the size rule
+        and only compacted once they are `max_age_rounds` old.
+        """
+        self.compacted = []
+        messages = history.messages
+        calls: dict[str, ToolCall] = {}
+        for msg in messages:
+            for tc in msg.tool_calls:
+                calls[tc.id] = tc
+
+        candidates: list[tuple[int, Message, int]] = []
+        savings = 0
+        age = 0  # assistant rounds after the current position
+        for index in range(len(messages) - 1, -1, -1):
+            msg = messages[index]
+            if msg.role == "assistant":
+                age += 1
+                continue
+            if msg.role != "tool" or age == 0 or msg.content.startswith(STUB_PREFIX):
+                continue
+            if age < self.max_age_rounds and (
+                len(msg.content) <= self.max_chars or (pinned is not None and pinned(msg))
+            ):
+                continue
+            stub = replace(msg, content=self._stub(msg, calls.get(msg.tool_call_id or "")))
+            saved = history.tokens_at(index) - estimate_message_tokens(stub)
+            if saved > 0:
+                candidates.append((index, stub, saved))
+                savings += saved
+
+        if not candidates or savings < self.min_savings:
+            return 0
+        for index, stub, _ in candidates:
+            original = messages[index]
+            if self.blobs is not None:
+                try:
+                    self.blobs.put_blob(original.content)  # a no-op for contents the log put there
+                except OSError:
+                    pass  # still expandable while the in-memory copy lasts
+            self.compacted.append(original)
+            history.replace(index, stub)
+        self.tokens_saved += savings
+        self.results_compacted += len(candidates)
+        return savings
+
+    def _stub(self, msg: Message, call: ToolCall | None) -> str:
+        key = self.store.put(msg.content)
+        lines = msg.content.splitlines()
+        summary = next((line.strip() for line in lines if line.strip()), "")
+        if len(summary) > 120:
+            summary = summary[:117] + "..."
+        parts = [f"{STUB_PREFIX}{msg.name or 'tool'} result, id {key}, {len(lines)} lines, {len(msg.content)} chars]"]
+        if call is not None:
+            args = ", ".join(f"{k}={_short(v)}" for k, v in call.arguments.items())
+            parts.append(f"Call: {call.name}({args})")
+            line_range = _line_range(msg, call)
+            if line_range:
+                parts.append(f"Lines: {line_range}")
+        if summary:
+            parts.append(f"Summary: {summary}")
+        parts.append(f'Use expand_result with id "{key}" to see the full output.')
+        return "\n".join(parts)
+
+
+def _line_range(msg: Message, call: ToolCall) -> str:
+    """The file line range shown by a file_read result, e.g. "10-60"."""
+    if call.name != "file_read":
+        return ""
+    numbered = [line.split("\t", 1)[0].strip() for line in msg.content.splitlines()[1:]]
+    numbered = [n for n in numbered if n.isdigit()]
+    if not numbered:
+        return ""
+    return f"{numbered[0]}-{numbered[-1]}"
+
+
+def _short(value: object, max_len: int = 60) -> str:
+    text = str(value)
+    return text if len(text) <= max_len else text[: max_len - 3] + "..."
@@ -4,6 +4,25 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .constants import (
+    DAEMON_MAX_SESSIONS,
+    DAEMON_SESSION_IDLE,
+    HEDGE_DELAY,
+    HEDGE_PERCENTILE,
+    HTTP_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    LLM_CACHE_BYTES,
+    LLM_CACHE_TTL,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LOOP_STOP_ROUNDS,
+    MAX_TOOL_WORKERS,
+    OLLAMA_BASE_URL,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_MODEL,
+)
+
 
 def _find_env_file() -> Path | None:
     """Walk up from cwd looking for .env."""
@@ -15,6 +34,48 @@ def _find_env_file() -> Path | None:
     return None
 
 
+def _env_flag(name: str, default: bool) -> bool:
+    """Read a boolean environment variable ("1"/"true"/"yes"/"on")."""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer environment variable, falling back on bad values."""
+    try:
+        return int(os.getenv(name, ""))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float environment variable, falling back on bad values."""
+    try:
+        return float(os.getenv(name, ""))
+    except ValueError:
+        return default
+
+
+def _ollama_host(value: str) -> str:
+    """A base URL from Ollama's own OLLAMA_HOST ("host", "host:port" or a URL)."""
+    value = value.strip().rstrip("/")
+    if not value:
+        return ""
+    if "://" not in value:
+        value = "http://" + value
+    if value.count(":") < 2:
+        value += ":11434"
+    return value
+
+
+def _env_path(name: str) -> Path | None:
+    """Read a path environment variable (None when unset)."""
+    value = os.getenv(name, "").strip()
+    return Path(value).expanduser() if value else None
+
+
 class Config:
     """Application configuration loaded from environment."""
 
@@ -27,6 +88,89 @@ class Config:
         self.openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
         self.default_provider: str = os.getenv("CODEAGENT_DEFAULT_PROVIDER", "claude")
 
+        # Ollama servers (several, comma-separated, are load-balanced) and model; keep_alive
+        # keeps the model loaded between turns, num_ctx and num_predict cap the context and
+        # response (0 = the model's limits), and the model is loaded at startup
+        self.ollama_urls: list[str] = [
+            url for url in (_ollama_host(u) for u in os.getenv("CODEAGENT_OLLAMA_URL", "").split(",")) if url
+        ] or [_ollama_host(os.getenv("OLLAMA_HOST", "")) or OLLAMA_BASE_URL]
+        self.ollama_model: str = os.getenv("CODEAGENT_OLLAMA_MODEL", "").strip() or OLLAMA_MODEL
+        self.ollama_keep_alive: str = os.getenv("CODEAGENT_OLLAMA_KEEP_ALIVE", "").strip() or OLLAMA_KEEP_ALIVE
+        self.ollama_num_ctx: int = max(0, _env_int("CODEAGENT_OLLAMA_NUM_CTX", 0))
+        self.ollama_num_predict: int = max(0, _env_int("CODEAGENT_OLLAMA_NUM_PREDICT", 0))
+        self.ollama_preload: bool = _env_flag("CODEAGENT_OLLAMA_PRELOAD", True)
+
+        # Anthropic prompt caching of the system prompt, tools and history prefix
+        self.prompt_cache: bool = _env_flag("CODEAGENT_PROMPT_CACHE", True)
+
+        # Stream responses token by token instead of waiting behind a spinner
+        self.stream: bool = _env_flag("CODEAGENT_STREAM", True)
+
+        # Cap on history tokens sent per request (0 = fit the model's context)
+        self.history_tokens: int = max(0, _env_int("CODEAGENT_HISTORY_TOKENS", 0))
+
+        # Replace stale tool results in history with short stubs
+        self.compaction: bool = _env_flag("CODEAGENT_COMPACTION", True)
+
+        # Run read-only tool calls from the same round concurrently
+        self.parallel_tools: bool = _env_flag("CODEAGENT_PARALLEL_TOOLS", True)
+        self.tool_workers: int = max(1, _env_int("CODEAGENT_TOOL_WORKERS", MAX_TOOL_WORKERS))
+
+        # Answer repeated tool calls with a note and stop turns stuck repeating them
+        # (0 rounds = only answer repeats, never stop)
+        self.loop_guard: bool = _env_flag("CODEAGENT_LOOP_GUARD", True)
+        self.loop_stop_rounds: int = max(0, _env_int("CODEAGENT_LOOP_STOP_ROUNDS", LOOP_STOP_ROUNDS))
+
+        # Reuse results of repeated read-only tool calls while their inputs are unchanged
+        self.tool_cache: bool = _env_flag("CODEAGENT_TOOL_CACHE", True)
+
+        # Where sessions and other state are kept, and whether to save sessions
+        self.data_dir: Path = Path(os.getenv("CODEAGENT_HOME") or Path.home() / ".codeagent").expanduser()
+        self.save_sessions: bool = _env_flag("CODEAGENT_SAVE_SESSIONS", True)
+
+        # Answer repeated LLM requests from an on-disk cache (opt-in); size limit in MB,
+        # TTL in seconds (0 = never expire), file (default: llm-cache.sqlite3 in data_dir)
+        self.llm_cache: bool = _env_flag("CODEAGENT_LLM_CACHE", False)
+        self.llm_cache_bytes: int = max(1, _env_int("CODEAGENT_LLM_CACHE_MB", LLM_CACHE_BYTES // 2**20)) * 2**20
+        self.llm_cache_ttl: float = max(0.0, _env_float("CODEAGENT_LLM_CACHE_TTL", LLM_CACHE_TTL))
+        self.llm_cache_path: Path | None = _env_path("CODEAGENT_LLM_CACHE_PATH")
+
+        # Request scheduling per API: rate limits (0 = none), retries, concurrency ceiling
+        self.requests_per_minute: int = max(0, _env_int("CODEAGENT_RPM", 0))
+        self.tokens_per_minute: int = max(0, _env_int("CODEAGENT_TPM", 0))
+        self.llm_retries: int = max(0, _env_int("CODEAGENT_LLM_RETRIES", LLM_MAX_RETRIES))
+        self.llm_concurrency: int = max(1, _env_int("CODEAGENT_LLM_CONCURRENCY", LLM_MAX_CONCURRENCY))
+
+        # Connection pool shared by all providers; HTTP/2 needs the h2 package
+        self.http_max_connections: int = max(1, _env_int("CODEAGENT_HTTP_MAX_CONNECTIONS", HTTP_MAX_CONNECTIONS))
+        self.http_keepalive_connections: int = max(
+            0, _env_int("CODEAGENT_HTTP_KEEPALIVE_CONNECTIONS", HTTP_KEEPALIVE_CONNECTIONS)
+        )
+        self.http_keepalive_expiry: float = max(0.0, _env_float("CODEAGENT_HTTP_KEEPALIVE_EXPIRY", HTTP_KEEPALIVE_EXPIRY))
+        self.http2: bool = _env_flag("CODEAGENT_HTTP2", True)
+        # Connect to the provider's API in the background at startup
+        self.warmup: bool = _env_flag("CODEAGENT_WARMUP", False)
+
+        # Record LLM responses to a cassette, or answer from one with the "replay" provider
+        self.record_path: Path | None = _env_path("CODEAGENT_RECORD")
+        self.replay_path: Path | None = _env_path("CODEAGENT_REPLAY")
+        # Replay pace: 1 = as recorded, 2 = twice as fast, 0 = instant
+        self.replay_speed: float = max(0.0, _env_float("CODEAGENT_REPLAY_SPEED", 0.0))
+
+        # Members of the "hedged" provider, primary first ("name" or "name:model"),
+        # and when a slow member gets a hedged request to the next one
+        self.hedge_providers: list[str] = [
+            name.strip() for name in os.getenv("CODEAGENT_HEDGE", "").split(",") if name.strip()
+        ]
+        self.hedge_percentile: float = min(100.0, max(0.0, _env_float("CODEAGENT_HEDGE_PERCENTILE", HEDGE_PERCENTILE)))
+        self.hedge_delay: float = max(0.0, _env_float("CODEAGENT_HEDGE_DELAY", HEDGE_DELAY))
+
+        # Daemon: named sessions kept in memory (the least recently used beyond this are
+        # dropped) and seconds of inactivity after which one is dropped (0 = never);
+        # a dropped session that was saved is reloaded from disk by its next message
+        self.daemon_sessions: int = max(1, _env_int("CODEAGENT_DAEMON_SESSIONS", DAEMON_MAX_SESSIONS))
+        self.daemon_idle: float = max(0.0, _env_float("CODEAGENT_DAEMON_IDLE", DAEMON_SESSION_IDLE))
+
     def has_anthropic(self) -> bool:
         return bool(self.anthropic_api_key and self.anthropic_api_key != "sk-ant-xxxxx")
 
@@ -37,12 +181,27 @@ class Config:
         """Return an error message if the provider can't be used, else None."""
         if provider in ("demo", "ollama"):
             return None  # No API key needed
+        if provider == "replay":
+            if self.replay_path is None:
+                return "No cassette to replay. Pass --replay FILE or set CODEAGENT_REPLAY."
+            if not self.replay_path.is_file():
+                return f"Cassette not found: {self.replay_path}"
+            return None
+        if provider == "hedged":
+            if len(self.hedge_providers) < 2:
+                return "Hedging needs two or more providers. Set CODEAGENT_HEDGE, e.g. CODEAGENT_HEDGE=claude,openai."
+            for member in self.hedge_providers:
+                name = member.partition(":")[0]
+                error = "Providers can't be hedged twice." if name == "hedged" else self.validate_provider(name)
+                if error:
+                    return f"Hedged provider '{member}': {error}"
+            return None
         if provider == "claude" and not self.has_anthropic():
             return "ANTHROPIC_API_KEY not set. Add it to your .env file."
         if provider == "openai" and not self.has_openai():
             return "OPENAI_API_KEY not set. Add it to your .env file."
-        if provider not in ("claude", "openai", "ollama", "demo"):
-            return f"Unknown provider '{provider}'. Use 'claude', 'openai', 'ollama', or 'demo'."
+        if provider not in ("claude", "openai", "ollama", "demo", "replay"):
+            return f"Unknown provider '{provider}'. Use 'claude', 'openai', 'ollama', 'demo', 'replay', or 'hedged'."
         return None
 
 
@@ -24,7 +24,43 @@ Use them as needed to accomplish the user's request.
 # Model identifiers
 CLAUDE_MODEL = "claude-sonnet-4-20250514"
 OPENAI_MODEL = "gpt-4o"
+OLLAMA_MODEL = "qwen2.5:0.5b"
+OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_KEEP_ALIVE = "30m"  # how long Ollama keeps the model loaded after a request
 
 # Limits
 MAX_TOOL_ROUNDS = 25
-MAX_HISTORY_MESSAGES = 100
+LOOP_STOP_ROUNDS = 3  # rounds of only repeated tool calls that end a turn
+PROMPT_RESERVE_TOKENS = 4000  # system prompt + tool schemas, kept out of the history budget
+HISTORY_TRIM_RATIO = 0.8  # when over budget, trim down to this fraction of it
+TRUNCATED_RESULT_CHARS = 4000  # tool output kept when a single turn overflows
+COMPACT_AFTER_ROUNDS = 3  # tool results this many rounds old get compacted
+COMPACT_ABOVE_CHARS = 8000  # ...or sooner when larger than this, once seen
+COMPACT_MIN_SAVINGS_TOKENS = 2000  # batch compactions so the prompt prefix stays stable
+RESULT_STORE_BYTES = 64 * 1024 * 1024  # side store for compacted tool output
+MAX_TOOL_WORKERS = 8  # concurrent read-only tool calls per round
+TOOL_CACHE_BYTES = 32 * 1024 * 1024  # cached output of read-only tool calls
+LLM_CACHE_BYTES = 512 * 1024 * 1024  # on-disk LLM response cache, when enabled
+LLM_CACHE_TTL = 7 * 24 * 3600.0  # seconds a cached response stays valid
+TRACE_MAX_EVENTS = 1_000_000  # spans kept in memory while tracing
+LLM_MAX_CONCURRENCY = 16  # requests in flight per API, before throttling lowers it
+LLM_MAX_RETRIES = 6  # retries of throttled, failed or unreachable requests
+RETRY_BASE_DELAY = 0.5  # seconds; backoff doubles per attempt, with full jitter
+RETRY_MAX_DELAY = 30.0  # cap on one backoff
+HTTP_MAX_CONNECTIONS = 100  # shared HTTP client: open connections, all hosts
+HTTP_KEEPALIVE_CONNECTIONS = 20  # ...of which kept idle for reuse
+HTTP_KEEPALIVE_EXPIRY = 120.0  # seconds an idle connection is kept
+OLLAMA_MIN_CTX = 8192  # smallest num_ctx sent; it doubles as prompts grow
+OLLAMA_OUTPUT_RESERVE = 2048  # response tokens budgeted when no num_predict is set
+OLLAMA_TIMEOUT = 600.0  # seconds; local models can be slow to load and to answer
+ENDPOINT_AFFINITY_SLACK = 2  # requests a conversation's endpoint may be busier than the least busy
+ENDPOINT_AFFINITY_KEYS = 4096  # conversations remembered for affinity
+ENDPOINT_EJECT_AFTER = 2  # failures in a row that take an endpoint out of service
+ENDPOINT_EJECT_SECONDS = 2.0  # first wait before health-checking it; doubles per failed check
+ENDPOINT_EJECT_MAX_SECONDS = 60.0
+HEDGE_PERCENTILE = 95.0  # hedged provider: ask the next member after this latency percentile
+HEDGE_DELAY = 2.0  # seconds, ...or after this while fewer than HEDGE_MIN_SAMPLES are known
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 256  # latencies remembered per member
+DAEMON_MAX_SESSIONS = 64  # named sessions a daemon keeps in memory
+DAEMON_SESSION_IDLE = 1800.0  # seconds before the daemon drops an idle named session
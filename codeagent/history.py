@@ -0,0 +1,146 @@
+"""Conversation history kept within a token budget."""
+
+from __future__ import annotations
+from collections import defaultdict, deque
+from dataclasses import replace
+from typing import Callable, Iterator
+
+from .constants import HISTORY_TRIM_RATIO, TRUNCATED_RESULT_CHARS
+from .llm.tokens import estimate_message_tokens
+from .llm.types import Message
+
+
+class History:
+    """The messages of one session, trimmed to fit the model's context.
+
+    Trimming works on whole turns, a user message plus everything up to the
+    next one, so an assistant tool call is never separated from its tool
+    results. When the budget is exceeded the oldest turns are dropped until
+    the history is back under `HISTORY_TRIM_RATIO` of the budget. That slack
+    means the list is only re-sliced once in a while, keeping appends
+    amortized O(1). If the current turn alone is too big, its oldest tool
+    results are truncated instead.
+
+    `tokens_by_role` and `tokens_by_tool` (tool results by tool name) are
+    running totals of the estimates of the messages currently held.
+
+    `messages` is the plain list handed to providers. `on_append`, if set,
+    is called with each appended message and its token estimate (used to
+    persist the session); rewrites through `replace` are not reported.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        on_append: Callable[[Message, int], None] | None = None,
+    ) -> None:
+        self.budget = budget
+        self.on_append = on_append
+        self.messages: list[Message] = []
+        self._tokens: list[int] = []
+        self.total_tokens = 0
+        self.tokens_by_role: defaultdict[str, int] = defaultdict(int)
+        self.tokens_by_tool: defaultdict[str, int] = defaultdict(int)
+        # Absolute positions (counting dropped messages) where turns begin
+        self._turn_starts: deque[int] = deque()
+        self._dropped = 0
+        self.trims = 0  # times older content was dropped or truncated
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self.messages)
+
+    def append(self, message: Message) -> None:
+        """Add a message, trimming older turns if the budget is exceeded."""
+        tokens = estimate_message_tokens(message)
+        if self.on_append is not None:
+            self.on_append(message, tokens)
+        self._add(message, tokens)
+
+    def load(self, messages: list[Message]) -> None:
+        """Add previously saved messages without reporting them to `on_append`."""
+        for message in messages:
+            self._add(message, estimate_message_tokens(message))
+
+    def _add(self, message: Message, tokens: int) -> None:
+        if message.role == "user":
+            self._turn_starts.append(self._dropped + len(self.messages))
+        self.messages.append(message)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+        self._count(message, tokens)
+        if self.total_tokens > self.budget:
+            self._trim()
+
+    def replace(self, index: int, message: Message) -> None:
+        """Swap the message at `index` for a rewritten version of it."""
+        tokens = estimate_message_tokens(message)
+        self.total_tokens += tokens - self._tokens[index]
+        self._count(self.messages[index], -self._tokens[index])
+        self._count(message, tokens)
+        self.messages[index] = message
+        self._tokens[index] = tokens
+
+    def _count(self, message: Message, tokens: int) -> None:
+        """Add `tokens` (negative to remove) to the per-role and per-tool totals."""
+        self.tokens_by_role[message.role] += tokens
+        if message.role == "tool":
+            self.tokens_by_tool[message.name or "unknown"] += tokens
+
+    def tokens_at(self, index: int) -> int:
+        """Estimated tokens of the message at `index`."""
+        return self._tokens[index]
+
+    def clear(self) -> None:
+        self.messages.clear()
+        self._tokens.clear()
+        self._turn_starts.clear()
+        self._dropped = 0
+        self.total_tokens = 0
+        self.tokens_by_role.clear()
+        self.tokens_by_tool.clear()
+
+    def set_budget(self, budget: int) -> None:
+        """Change the budget (e.g. after switching models) and re-trim."""
+        self.budget = budget
+        if self.total_tokens > self.budget:
+            self._trim()
+
+    def _trim(self) -> None:
+        self.trims += 1
+        target = int(self.budget * HISTORY_TRIM_RATIO)
+
+        # Drop whole turns from the front, always keeping the latest one
+        cut = 0
+        total = self.total_tokens
+        while total > target and len(self._turn_starts) > 1:
+            self._turn_starts.popleft()
+            next_cut = self._turn_starts[0] - self._dropped
+            total -= sum(self._tokens[cut:next_cut])
+            cut = next_cut
+        if cut:
+            for message, tokens in zip(self.messages[:cut], self._tokens[:cut]):
+                self._count(message, -tokens)
+            del self.messages[:cut]
+            del self._tokens[:cut]
+            self._dropped += cut
+            self.total_tokens = total
+
+        # A single turn can still overflow: shrink its oldest tool results,
+        # harder on the second pass
+        for keep in (TRUNCATED_RESULT_CHARS, TRUNCATED_RESULT_CHARS // 8):
+            for index, message in enumerate(self.messages):
+                if self.total_tokens <= target:
+                    return
+                if message.role == "tool" and len(message.content) > keep + 200:
+                    shrunk = _truncate_middle(message.content, keep)
+                    self.replace(index, replace(message, content=shrunk))
+
+
+def _truncate_middle(text: str, keep: int) -> str:
+    """Keep the head and tail of `text`, noting how much was cut."""
+    half = keep // 2
+    removed = len(text) - 2 * half
+    return f"{text[:half]}\n... [{removed} characters trimmed to fit the context window] ...\n{text[-half:]}"
@@ -1,6 +1,6 @@
 """LLM provider layer."""
 
-from .factory import get_provider
+from .factory import get_async_provider, get_provider
 from .types import Message, ToolCall, ToolResult, LLMResponse
 
-__all__ = ["get_provider", "Message", "ToolCall", "ToolResult", "LLMResponse"]
+__all__ = ["get_provider", "get_async_provider", "Message", "ToolCall", "ToolResult", "LLMResponse"]
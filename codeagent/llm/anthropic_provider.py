@@ -2,46 +2,72 @@
 
 from __future__ import annotations
 import json
-from typing import Any, AsyncIterator
+import time
+from typing import Any, AsyncIterator, Iterator
 
 import anthropic
 
 from ..config import config
 from ..constants import CLAUDE_MODEL
-from .base import BaseLLMProvider
-from .types import LLMResponse, Message, ToolCall
+from ..tracing import traced, traced_llm
+from .base import AsyncBaseLLMProvider, BaseLLMProvider, ToolPayloadCache
+from .pool import async_http_client, http_client
+from .scheduler import get_scheduler, request_tokens
+from .streaming import ToolCallAssembler
+from .types import (
+    LLMResponse,
+    Message,
+    StopEvent,
+    StreamEvent,
+    TextDelta,
+    ToolCall,
+    Usage,
+    UsageEvent,
+)
+
+
+def _message_to_anthropic(msg: Message) -> dict | None:
+    """Convert one internal message to Anthropic API format."""
+    if msg.role == "tool":
+        return {
+            "role": "user",
+            "content": [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": msg.tool_call_id,
+                    "content": msg.content,
+                    "is_error": False,
+                }
+            ],
+        }
+    elif msg.role == "assistant" and msg.tool_calls:
+        content: list[dict] = []
+        if msg.content:
+            content.append({"type": "text", "text": msg.content})
+        for tc in msg.tool_calls:
+            content.append({
+                "type": "tool_use",
+                "id": tc.id,
+                "name": tc.name,
+                "input": tc.arguments,
+            })
+        return {"role": "assistant", "content": content}
+    elif msg.role in ("user", "assistant"):
+        return {"role": msg.role, "content": msg.content}
+    return None
 
 
 def _messages_to_anthropic(messages: list[Message]) -> list[dict]:
-    """Convert internal messages to Anthropic API format."""
+    """Convert internal messages to Anthropic API format.
+
+    Each message is converted once and memoized on the Message, so a round
+    only pays for the messages added since the previous one.
+    """
     result = []
     for msg in messages:
-        if msg.role == "tool":
-            result.append({
-                "role": "user",
-                "content": [
-                    {
-                        "type": "tool_result",
-                        "tool_use_id": msg.tool_call_id,
-                        "content": msg.content,
-                        "is_error": False,
-                    }
-                ],
-            })
-        elif msg.role == "assistant" and msg.tool_calls:
-            content: list[dict] = []
-            if msg.content:
-                content.append({"type": "text", "text": msg.content})
-            for tc in msg.tool_calls:
-                content.append({
-                    "type": "tool_use",
-                    "id": tc.id,
-                    "name": tc.name,
-                    "input": tc.arguments,
-                })
-            result.append({"role": "assistant", "content": content})
-        elif msg.role in ("user", "assistant"):
-            result.append({"role": msg.role, "content": msg.content})
+        converted = msg.wire("anthropic", _message_to_anthropic)
+        if converted is not None:
+            result.append(converted)
     return result
 
 
@@ -57,71 +83,241 @@ def _tools_to_anthropic(tools: list[dict[str, Any]]) -> list[dict]:
     return result
 
 
+class _EventTranslator:
+    """Translate Anthropic server-sent events into stream events."""
+
+    def __init__(self) -> None:
+        self._tools = ToolCallAssembler()
+        self._tool_index: dict[int, int] = {}  # content block index -> tool call index
+        self._usage = Usage()
+        self._stop_reason: str | None = None
+
+    def feed(self, event: Any) -> Iterator[StreamEvent]:
+        tools = self._tools
+        tool_index = self._tool_index
+        if event.type == "message_start":
+            self._usage = _parse_usage(event.message.usage)
+        elif event.type == "content_block_start":
+            block = event.content_block
+            if block.type == "tool_use":
+                tool_index[event.index] = len(tool_index)
+                yield tools.start(tool_index[event.index], block.id, block.name)
+            elif block.type == "text" and block.text:
+                yield TextDelta(block.text)
+        elif event.type == "content_block_delta":
+            delta = event.delta
+            if delta.type == "text_delta":
+                yield TextDelta(delta.text)
+            elif delta.type == "input_json_delta" and event.index in tool_index:
+                yield tools.add(tool_index[event.index], delta.partial_json)
+        elif event.type == "content_block_stop":
+            if event.index in tool_index:
+                yield tools.finish(tool_index[event.index])
+        elif event.type == "message_delta":
+            self._stop_reason = event.delta.stop_reason or self._stop_reason
+            if event.usage is not None:
+                self._usage.output_tokens = event.usage.output_tokens or self._usage.output_tokens
+
+    def finish(self) -> Iterator[StreamEvent]:
+        yield from self._tools.finish_all()
+        yield UsageEvent(self._usage)
+        yield StopEvent(self._stop_reason)
+
+
+# Marks the end of a cacheable prefix for Anthropic prompt caching
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+
+
+def _tools_to_anthropic_cached(tools: list[dict[str, Any]]) -> list[dict]:
+    """Tool definitions with a prompt-cache breakpoint after the last one."""
+    result = _tools_to_anthropic(tools)
+    if result:
+        result[-1] = {**result[-1], "cache_control": CACHE_BREAKPOINT}
+    return result
+
+
+def _with_cache_breakpoints(system: str, messages: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Add prompt-cache breakpoints after the system prompt and the newest message.
+
+    Together with the breakpoint on the tool definitions this caches the
+    whole request. The request is rendered identically every round, so the
+    next round's prefix matches what this one wrote to the cache. Only a
+    copy of the final message is modified.
+    """
+    system_blocks = [{"type": "text", "text": system, "cache_control": CACHE_BREAKPOINT}] if system else []
+    if messages:
+        last = messages[-1]
+        content = last["content"]
+        if isinstance(content, str):
+            if content:
+                content = [{"type": "text", "text": content, "cache_control": CACHE_BREAKPOINT}]
+        elif content:
+            content = content[:-1] + [{**content[-1], "cache_control": CACHE_BREAKPOINT}]
+        messages = messages[:-1] + [{**last, "content": content}]
+    return system_blocks, messages
+
+
+@traced("llm.build_request", "llm", measure_result=True)
+def _build_request(
+    model: str,
+    messages: list[Message],
+    wire_tools: list[dict],
+    system: str,
+    prompt_cache: bool = False,
+) -> dict[str, Any]:
+    """Keyword arguments for `messages.create`; `wire_tools` are already converted."""
+    wire_messages = _messages_to_anthropic(messages)
+    kwargs: dict[str, Any] = {
+        "model": model,
+        "max_tokens": 8192,
+    }
+    if prompt_cache:
+        system_blocks, wire_messages = _with_cache_breakpoints(system, wire_messages)
+        if system_blocks:
+            kwargs["system"] = system_blocks
+    elif system:
+        kwargs["system"] = system
+    if wire_tools:
+        kwargs["tools"] = wire_tools
+    kwargs["messages"] = wire_messages
+    return kwargs
+
+
+def _parse_usage(usage: Any) -> Usage:
+    """Read an Anthropic usage block, including prompt-cache counters."""
+    return Usage(
+        input_tokens=getattr(usage, "input_tokens", 0) or 0,
+        output_tokens=getattr(usage, "output_tokens", 0) or 0,
+        cache_read_tokens=getattr(usage, "cache_read_input_tokens", 0) or 0,
+        cache_write_tokens=getattr(usage, "cache_creation_input_tokens", 0) or 0,
+    )
+
+
+def _parse_response(response: Any, started: float | None = None) -> LLMResponse:
+    """Convert an Anthropic `Message` into an LLMResponse."""
+    text_parts: list[str] = []
+    tool_calls: list[ToolCall] = []
+
+    for block in response.content:
+        if block.type == "text":
+            text_parts.append(block.text)
+        elif block.type == "tool_use":
+            tool_calls.append(
+                ToolCall(
+                    id=block.id,
+                    name=block.name,
+                    arguments=block.input if isinstance(block.input, dict) else {},
+                )
+            )
+
+    return LLMResponse(
+        content="\n".join(text_parts),
+        tool_calls=tool_calls,
+        stop_reason=response.stop_reason,
+        usage=_parse_usage(response.usage) if getattr(response, "usage", None) else None,
+        latency=None if started is None else time.perf_counter() - started,
+    )
+
+
 class AnthropicProvider(BaseLLMProvider):
     """Claude API provider."""
 
-    def __init__(self, model: str = CLAUDE_MODEL) -> None:
+    def __init__(self, model: str = CLAUDE_MODEL, prompt_cache: bool | None = None) -> None:
         self.model = model
-        self.client = anthropic.Anthropic(api_key=config.anthropic_api_key)
+        self.prompt_cache = config.prompt_cache if prompt_cache is None else prompt_cache
+        self._tool_payload = ToolPayloadCache(
+            _tools_to_anthropic_cached if self.prompt_cache else _tools_to_anthropic
+        )
+        self.client = anthropic.Anthropic(
+            api_key=config.anthropic_api_key, http_client=http_client(), max_retries=0
+        )
+        self._scheduler = get_scheduler("anthropic")
 
+    @traced_llm("llm.chat")
     def chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
     ) -> LLMResponse:
-        kwargs: dict[str, Any] = {
-            "model": self.model,
-            "max_tokens": 8192,
-            "messages": _messages_to_anthropic(messages),
-        }
-        if system:
-            kwargs["system"] = system
-        if tools:
-            kwargs["tools"] = _tools_to_anthropic(tools)
-
-        response = self.client.messages.create(**kwargs)
-
-        text_parts: list[str] = []
-        tool_calls: list[ToolCall] = []
-
-        for block in response.content:
-            if block.type == "text":
-                text_parts.append(block.text)
-            elif block.type == "tool_use":
-                tool_calls.append(
-                    ToolCall(
-                        id=block.id,
-                        name=block.name,
-                        arguments=block.input if isinstance(block.input, dict) else {},
-                    )
-                )
+        kwargs = _build_request(
+            self.model, messages, self._tool_payload.get(tools), system, self.prompt_cache
+        )
+        started = time.perf_counter()
+        response = self._scheduler.call(
+            lambda: self.client.messages.create(**kwargs), request_tokens(messages, system)
+        )
+        return _parse_response(response, started)
+
+    @traced_llm("llm.stream")
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        kwargs = _build_request(
+            self.model, messages, self._tool_payload.get(tools), system, self.prompt_cache
+        )
+        translator = _EventTranslator()
+        for event in self._scheduler.stream(
+            lambda: self.client.messages.create(**kwargs, stream=True), request_tokens(messages, system)
+        ):
+            yield from translator.feed(event)
+        yield from translator.finish()
+
+    def get_model_name(self) -> str:
+        return f"Claude ({self.model})"
 
-        return LLMResponse(
-            content="\n".join(text_parts),
-            tool_calls=tool_calls,
-            stop_reason=response.stop_reason,
+
+class AsyncAnthropicProvider(AsyncBaseLLMProvider):
+    """Claude API provider on the SDK's asyncio client."""
+
+    def __init__(self, model: str = CLAUDE_MODEL, prompt_cache: bool | None = None) -> None:
+        self.model = model
+        self.prompt_cache = config.prompt_cache if prompt_cache is None else prompt_cache
+        self._tool_payload = ToolPayloadCache(
+            _tools_to_anthropic_cached if self.prompt_cache else _tools_to_anthropic
+        )
+        self.client = anthropic.AsyncAnthropic(
+            api_key=config.anthropic_api_key, http_client=async_http_client(), max_retries=0
+        )
+        self._scheduler = get_scheduler("anthropic")
+
+    @traced_llm("llm.chat")
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        kwargs = _build_request(
+            self.model, messages, self._tool_payload.get(tools), system, self.prompt_cache
         )
+        started = time.perf_counter()
+        response = await self._scheduler.acall(
+            lambda: self.client.messages.create(**kwargs), request_tokens(messages, system)
+        )
+        return _parse_response(response, started)
 
+    @traced_llm("llm.stream")
     async def stream_chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
-    ) -> AsyncIterator[str]:
-        kwargs: dict[str, Any] = {
-            "model": self.model,
-            "max_tokens": 8192,
-            "messages": _messages_to_anthropic(messages),
-        }
-        if system:
-            kwargs["system"] = system
-        if tools:
-            kwargs["tools"] = _tools_to_anthropic(tools)
-
-        with self.client.messages.stream(**kwargs) as stream:
-            for text in stream.text_stream:
-                yield text
+    ) -> AsyncIterator[StreamEvent]:
+        kwargs = _build_request(
+            self.model, messages, self._tool_payload.get(tools), system, self.prompt_cache
+        )
+        translator = _EventTranslator()
+        async for event in self._scheduler.astream(
+            lambda: self.client.messages.create(**kwargs, stream=True), request_tokens(messages, system)
+        ):
+            for item in translator.feed(event):
+                yield item
+        for item in translator.finish():
+            yield item
 
     def get_model_name(self) -> str:
         return f"Claude ({self.model})"
@@ -2,9 +2,43 @@
 
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Any, AsyncIterator
+from typing import Any, AsyncIterator, Callable, Iterator, Sequence
 
-from .types import LLMResponse, Message
+from .models import history_budget
+from .streaming import events_from_response
+from .types import LLMResponse, Message, StreamEvent
+
+
+class ToolPayloadCache:
+    """A provider's converted tool definitions, reused across requests.
+
+    Tool lists from `ToolRegistry.get_schemas()` carry a `version`; while it
+    is unchanged the previously converted payload (same objects, so the same
+    serialized bytes) is returned. Plain lists are converted every time.
+    """
+
+    def __init__(self, convert: Callable[[Sequence[dict[str, Any]]], list[dict]]) -> None:
+        self._convert = convert
+        self._version: int | None = None
+        self._payload: list[dict] = []
+
+    def get(self, tools: Sequence[dict[str, Any]] | None) -> list[dict]:
+        if not tools:
+            return []
+        version = getattr(tools, "version", None)
+        if version is None:
+            return self._convert(tools)
+        if version != self._version:
+            self._payload = self._convert(tools)
+            self._version = version
+        return self._payload
+
+
+def unwrap(provider: Any) -> Any:
+    """The provider under any caching or recording wrappers."""
+    while hasattr(provider, "inner"):
+        provider = provider.inner
+    return provider
 
 
 class BaseLLMProvider(ABC):
@@ -20,19 +54,62 @@ class BaseLLMProvider(ABC):
         """Send messages and return a complete response."""
         ...
 
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        """Stream the response as typed events.
+
+        Yields text deltas, tool-call start/argument/complete events, usage and
+        a final StopEvent. The default implementation wraps `chat`; providers
+        with a streaming API override it.
+        """
+        yield from events_from_response(self.chat(messages, tools, system))
+
     @abstractmethod
-    async def stream_chat(
+    def get_model_name(self) -> str:
+        """Return the display name of the current model."""
+        ...
+
+    def history_budget(self) -> int:
+        """Tokens of conversation history this provider's model can take."""
+        return history_budget(getattr(self, "model", ""))
+
+
+class AsyncBaseLLMProvider(ABC):
+    """Asyncio counterpart of `BaseLLMProvider`.
+
+    Built on the SDKs' async clients so one event loop can drive many
+    concurrent sessions without a thread per session.
+    """
+
+    @abstractmethod
+    async def chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
-    ) -> AsyncIterator[str]:
-        """Stream text chunks from the LLM. Yields text deltas."""
+    ) -> LLMResponse:
+        """Send messages and return a complete response."""
         ...
-        # Make it a valid async generator
-        yield ""  # pragma: no cover
+
+    async def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> AsyncIterator[StreamEvent]:
+        """Stream the response as typed events (see `BaseLLMProvider.stream_chat`)."""
+        for event in events_from_response(await self.chat(messages, tools, system)):
+            yield event
 
     @abstractmethod
     def get_model_name(self) -> str:
         """Return the display name of the current model."""
         ...
+
+    def history_budget(self) -> int:
+        """Tokens of conversation history this provider's model can take."""
+        return history_budget(getattr(self, "model", ""))
@@ -0,0 +1,167 @@
+"""Routing requests over several servers of the same API.
+
+Used for Ollama, where one instance per CPU socket or container serves the
+same models. An `EndpointPool`:
+
+- sends each request to the endpoint with the fewest requests in flight;
+- keeps a conversation on the endpoint that served it before (by a key
+  the caller derives from the conversation's first messages), since that
+  instance holds its KV cache, unless that endpoint is more than
+  `affinity_slack` requests busier than the least loaded one;
+- ejects an endpoint after `eject_after` failures in a row (connection
+  errors, 5xx replies) and probes it in the background until it answers
+  its health check, backing off between probes.
+
+When every endpoint is ejected, requests go to the one due back soonest
+rather than failing outright.
+"""
+
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Sequence
+
+import httpx
+
+from ..constants import (
+    ENDPOINT_AFFINITY_KEYS,
+    ENDPOINT_AFFINITY_SLACK,
+    ENDPOINT_EJECT_AFTER,
+    ENDPOINT_EJECT_MAX_SECONDS,
+    ENDPOINT_EJECT_SECONDS,
+)
+from ..tracing import span
+from .pool import http_client
+
+
+@dataclass(eq=False)  # compared by identity: two endpoints may hold equal values
+class Endpoint:
+    url: str
+    outstanding: int = 0  # requests in flight
+    requests: int = 0
+    failures: int = 0  # in a row
+    ejections: int = 0
+    ejected_until: float = 0.0  # monotonic time; 0 = in service
+    eject_seconds: float = 0.0  # current probe backoff
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until > 0
+
+
+class EndpointPool:
+    """Least-outstanding routing with affinity and ejection (see module docstring)."""
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        health_path: str = "/",
+        affinity_slack: int = ENDPOINT_AFFINITY_SLACK,
+        eject_after: int = ENDPOINT_EJECT_AFTER,
+        eject_seconds: float = ENDPOINT_EJECT_SECONDS,
+        max_eject_seconds: float = ENDPOINT_EJECT_MAX_SECONDS,
+    ) -> None:
+        if not urls:
+            raise ValueError("An endpoint pool needs at least one URL.")
+        self.endpoints = [Endpoint(url.rstrip("/")) for url in urls]
+        self.health_path = health_path
+        self.affinity_slack = affinity_slack
+        self.eject_after = max(1, eject_after)
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.affinity_hits = 0
+        self._affinity: OrderedDict[str, Endpoint] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self, key: str | None = None, exclude: Sequence[Endpoint] = ()) -> Endpoint:
+        """Pick an endpoint for one request and count it as in flight.
+
+        `key` identifies the conversation for affinity; endpoints in
+        `exclude` (already tried for this request) are used only when
+        nothing else is left.
+        """
+        with self._lock:
+            candidates = [e for e in self.endpoints if not e.ejected and e not in exclude]
+            if not candidates:
+                candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+                candidates = [min(candidates, key=lambda e: e.ejected_until)]
+            least = min(candidates, key=lambda e: (e.outstanding, e.requests))
+            chosen = least
+            if key is not None:
+                previous = self._affinity.get(key)
+                if previous in candidates and previous.outstanding <= least.outstanding + self.affinity_slack:
+                    chosen = previous
+                    self.affinity_hits += 1
+                self._affinity[key] = chosen
+                self._affinity.move_to_end(key)
+                if len(self._affinity) > ENDPOINT_AFFINITY_KEYS:
+                    self._affinity.popitem(last=False)
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, endpoint: Endpoint, failed: bool = False) -> None:
+        """A request to `endpoint` finished; `failed` if the endpoint was at fault."""
+        probe = False
+        with self._lock:
+            endpoint.outstanding -= 1
+            if not failed:
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            if endpoint.failures >= self.eject_after and not endpoint.ejected:
+                endpoint.ejections += 1
+                endpoint.eject_seconds = self.eject_seconds
+                endpoint.ejected_until = time.monotonic() + endpoint.eject_seconds
+                probe = True
+        if probe:
+            threading.Thread(
+                target=self._probe, args=(endpoint,), name="codeagent-endpoint-probe", daemon=True
+            ).start()
+
+    def healthy(self) -> list[Endpoint]:
+        with self._lock:
+            return [e for e in self.endpoints if not e.ejected]
+
+    def _probe(self, endpoint: Endpoint) -> None:
+        """Wait out the ejection, then health-check until the endpoint answers."""
+        while True:
+            time.sleep(max(0.0, endpoint.ejected_until - time.monotonic()))
+            try:
+                with span("http.health", "http", endpoint=endpoint.url):
+                    response = http_client().get(endpoint.url + self.health_path, timeout=5.0)
+                ok = response.status_code < 500
+            except httpx.HTTPError:
+                ok = False
+            with self._lock:
+                if ok:
+                    endpoint.failures = 0
+                    endpoint.ejected_until = 0.0
+                    return
+                endpoint.eject_seconds = min(self.max_eject_seconds, endpoint.eject_seconds * 2)
+                endpoint.ejected_until = time.monotonic() + endpoint.eject_seconds
+
+
+_pools: dict[tuple[str, ...], EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_endpoint_pool(urls: Sequence[str], health_path: str = "/") -> EndpointPool:
+    """The process-wide pool for a list of URLs, shared by sync and asyncio providers."""
+    key = tuple(url.rstrip("/") for url in urls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = EndpointPool(key, health_path)
+        return pool
+
+
+def endpoint_pools() -> list[EndpointPool]:
+    """Pools created so far."""
+    with _pools_lock:
+        return list(_pools.values())
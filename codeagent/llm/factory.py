@@ -1,30 +1,182 @@
 """Factory to create LLM providers by name."""
 
 from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Any
 
-from .base import BaseLLMProvider
+from ..config import config
+from .base import AsyncBaseLLMProvider, BaseLLMProvider
+from .pool import async_providers, providers
+from .response_cache import AsyncCachingProvider, CachingProvider, ResponseStore
 
 
-def get_provider(name: str) -> BaseLLMProvider:
+def get_provider(name: str, model: str | None = None) -> BaseLLMProvider:
     """Return an LLM provider instance by name.
 
+    Instances are pooled per (provider, model, base URL), so asking for the
+    same provider again returns the one already connected. With
+    `config.llm_cache` on, repeated requests are answered from the on-disk
+    response cache; with `config.record_path` set, the provider is wrapped
+    so its responses are recorded to that cassette.
+
     Args:
-        name: "claude", "openai", or "demo"
+        name: "claude", "openai", "ollama", "demo", "replay", or "hedged"
+        model: model to use instead of the provider's default
 
     Raises:
         ValueError: If provider name is unknown.
     """
+    provider = _pooled(name, model)
+    if config.llm_cache and name not in ("demo", "replay"):
+        provider = CachingProvider(provider, _response_store())
+    if config.record_path is not None and name != "replay":
+        from .recording import RecordingProvider
+        provider = RecordingProvider(provider, config.record_path)
+    return provider
+
+
+def _create_provider(name: str, model: str | None) -> BaseLLMProvider:
+    kwargs = _model_kwargs(model)
     if name == "claude":
         from .anthropic_provider import AnthropicProvider
-        return AnthropicProvider()
+        return AnthropicProvider(**kwargs)
     elif name == "openai":
         from .openai_provider import OpenAIProvider
-        return OpenAIProvider()
+        return OpenAIProvider(**kwargs)
     elif name == "ollama":
         from .ollama_provider import OllamaProvider
-        return OllamaProvider()
+        return OllamaProvider(**kwargs)
     elif name == "demo":
         from .mock_provider import MockProvider
         return MockProvider()
+    elif name == "replay":
+        from .recording import ReplayProvider
+        return ReplayProvider(_replay_path(), config.replay_speed)
+    elif name == "hedged":
+        from .hedged import HedgedProvider
+        members = _hedge_members(model)
+        return HedgedProvider(
+            [_pooled(*member) for member in members],
+            names=config.hedge_providers,
+            percentile=config.hedge_percentile,
+            delay=config.hedge_delay,
+        )
+    else:
+        raise ValueError(
+            f"Unknown provider: '{name}'. Use 'claude', 'openai', 'ollama', 'demo', 'replay', or 'hedged'."
+        )
+
+
+def _pooled(name: str, model: str | None) -> BaseLLMProvider:
+    return providers.get((name, model, _base_url(name)), lambda: _create_provider(name, model))
+
+
+def get_async_provider(name: str, model: str | None = None) -> AsyncBaseLLMProvider:
+    """Return an asyncio LLM provider instance by name.
+
+    Pooling, caching and recording apply as in `get_provider`; pooled instances are
+    per event loop, since their connections belong to it, and a provider
+    created outside a running loop is not pooled.
+
+    Args:
+        name: "claude", "openai", "ollama", "demo", "replay", or "hedged"
+        model: model to use instead of the provider's default
+
+    Raises:
+        ValueError: If provider name is unknown.
+    """
+    provider = _async_pooled(name, model)
+    if config.llm_cache and name not in ("demo", "replay"):
+        provider = AsyncCachingProvider(provider, _response_store())
+    if config.record_path is not None and name != "replay":
+        from .recording import AsyncRecordingProvider
+        provider = AsyncRecordingProvider(provider, config.record_path)
+    return provider
+
+
+def _create_async_provider(name: str, model: str | None) -> AsyncBaseLLMProvider:
+    kwargs = _model_kwargs(model)
+    if name == "claude":
+        from .anthropic_provider import AsyncAnthropicProvider
+        return AsyncAnthropicProvider(**kwargs)
+    elif name == "openai":
+        from .openai_provider import AsyncOpenAIProvider
+        return AsyncOpenAIProvider(**kwargs)
+    elif name == "ollama":
+        from .ollama_provider import AsyncOllamaProvider
+        return AsyncOllamaProvider(**kwargs)
+    elif name == "demo":
+        from .mock_provider import AsyncMockProvider
+        return AsyncMockProvider()
+    elif name == "replay":
+        from .recording import AsyncReplayProvider
+        return AsyncReplayProvider(_replay_path(), config.replay_speed)
+    elif name == "hedged":
+        from .hedged import AsyncHedgedProvider
+        members = _hedge_members(model)
+        return AsyncHedgedProvider(
+            [_async_pooled(*member) for member in members],
+            names=config.hedge_providers,
+            percentile=config.hedge_percentile,
+            delay=config.hedge_delay,
+        )
     else:
-        raise ValueError(f"Unknown provider: '{name}'. Use 'claude', 'openai', 'ollama', or 'demo'.")
+        raise ValueError(
+            f"Unknown provider: '{name}'. Use 'claude', 'openai', 'ollama', 'demo', 'replay', or 'hedged'."
+        )
+
+
+def _async_pooled(name: str, model: str | None) -> AsyncBaseLLMProvider:
+    return async_providers().get(
+        ("async", name, model, _base_url(name)),
+        lambda: _create_async_provider(name, model),
+    )
+
+
+def _model_kwargs(model: str | None) -> dict[str, Any]:
+    return {"model": model} if model else {}
+
+
+def _base_url(name: str) -> str:
+    """Where a provider sends requests, as far as it matters for pooling."""
+    if name == "claude":
+        return os.getenv("ANTHROPIC_BASE_URL", "")
+    if name == "openai":
+        return os.getenv("OPENAI_BASE_URL", "")
+    if name == "ollama":
+        return ",".join(config.ollama_urls)
+    if name == "replay":
+        return str(config.replay_path)
+    if name == "hedged":
+        return ",".join(config.hedge_providers)
+    return ""
+
+
+def _hedge_members(model: str | None) -> list[tuple[str, str | None]]:
+    """(name, model) of each hedged member; `model` overrides the primary's."""
+    members: list[tuple[str, str | None]] = []
+    for entry in config.hedge_providers:
+        name, _, member_model = entry.partition(":")
+        if name == "hedged":
+            raise ValueError("Providers can't be hedged twice.")
+        members.append((name, member_model or None))
+    if len(members) < 2:
+        raise ValueError("Hedging needs two or more providers. Set CODEAGENT_HEDGE, e.g. CODEAGENT_HEDGE=claude,openai.")
+    if model:
+        members[0] = (members[0][0], model)
+    return members
+
+
+def _response_store() -> ResponseStore:
+    return ResponseStore.for_path(
+        config.llm_cache_path or config.data_dir / "llm-cache.sqlite3",
+        max_bytes=config.llm_cache_bytes,
+        ttl=config.llm_cache_ttl,
+    )
+
+
+def _replay_path() -> Path:
+    if config.replay_path is None:
+        raise ValueError("No cassette to replay. Pass --replay FILE or set CODEAGENT_REPLAY.")
+    return config.replay_path
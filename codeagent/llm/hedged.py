@@ -0,0 +1,363 @@
+"""Hedged requests across providers, with failover.
+
+A hedged provider sends each request to its primary member and keeps a
+window of recent latencies per member: time to the first stream event
+(`chat` streams from the members too, so a losing member stops as soon as
+it starts answering). If the primary has not produced anything by the
+`percentile`-th percentile of its own recent latencies (`delay` until it
+has `min_samples` of them), the same request also goes to the next member,
+and so on down the list. Whichever member produces something first is
+used; the others are cancelled. A member failing with a connection error
+or a retryable status hands over to the next member at once: members run
+under `fail_fast()`, so their schedulers don't retry first. The last member
+has nothing to fail over to and retries as usual.
+
+Configure the members with `CODEAGENT_HEDGE=claude,openai` (entries are
+"name" or "name:model") and select the "hedged" provider. Usage is priced
+as the primary's model, whichever member answered.
+"""
+
+from __future__ import annotations
+import asyncio
+import math
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Callable, Iterator, Sequence, TypeVar
+
+from ..constants import HEDGE_DELAY, HEDGE_MIN_SAMPLES, HEDGE_PERCENTILE, HEDGE_WINDOW
+from ..tracing import span
+from .base import AsyncBaseLLMProvider, BaseLLMProvider
+from .scheduler import RETRY_STATUSES, fail_fast, is_connection_error, status_of
+from .streaming import StreamAccumulator
+from .types import LLMResponse, Message, StreamEvent
+
+T = TypeVar("T")
+
+_EVENT, _END, _ERROR = "event", "end", "error"
+
+
+def fails_over(exc: BaseException) -> bool:
+    """Whether a member's error should hand the request to the next member."""
+    status = status_of(exc)
+    return status in RETRY_STATUSES or (status is None and is_connection_error(exc))
+
+
+class LatencyWindow:
+    """The most recent latencies of one member, in seconds."""
+
+    def __init__(self, size: int = HEDGE_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        """Nearest-rank percentile (0-100), or None without samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = math.ceil(p / 100 * len(samples)) - 1
+        return samples[min(len(samples) - 1, max(0, rank))]
+
+
+@dataclass
+class HedgeStats:
+    requests: int = 0
+    hedges: int = 0  # extra requests sent because a member was slow
+    failovers: int = 0  # extra requests sent because a member failed
+    secondary_wins: int = 0  # requests answered by a member other than the primary
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class _Hedging:
+    """Members, latency windows and counters shared by both hedged providers."""
+
+    def __init__(
+        self,
+        members: Sequence[Any],
+        names: Sequence[str] | None,
+        percentile: float,
+        delay: float,
+        min_samples: int,
+    ) -> None:
+        if len(members) < 2:
+            raise ValueError("Hedging needs a primary and at least one secondary provider.")
+        self.members = list(members)
+        self.names = list(names) if names else [m.get_model_name() for m in self.members]
+        self.model = getattr(self.members[0], "model", "")
+        self.percentile = percentile
+        self.delay = delay
+        self.min_samples = min_samples
+        self.latencies = [LatencyWindow() for _ in self.members]
+        self.stats = HedgeStats()
+        self._lock = threading.Lock()
+
+    def deadline(self, index: int) -> float:
+        """Seconds to give member `index` before also asking the next one."""
+        window = self.latencies[index]
+        if len(window) < self.min_samples:
+            return self.delay
+        return window.percentile(self.percentile) or 0.0
+
+    def fail_fast(self, index: int) -> bool:
+        """Whether member `index` should give up on retryable errors: another one can take over."""
+        return index < len(self.members) - 1
+
+    def get_model_name(self) -> str:
+        return "Hedged: " + " → ".join(m.get_model_name() for m in self.members)
+
+    def history_budget(self) -> int:
+        # Every member may have to take the same history
+        return min(m.history_budget() for m in self.members)
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self.stats, field, getattr(self.stats, field) + 1)
+
+
+class _Race:
+    """Bookkeeping for one hedged request: when each member was asked, and why."""
+
+    def __init__(self, hedging: _Hedging) -> None:
+        self.hedging = hedging
+        self.started: list[float] = []
+        self.running: set[int] = set()
+        self.errors: list[BaseException] = []
+        hedging._count("requests")
+
+    def next_index(self) -> int | None:
+        index = len(self.started)
+        return index if index < len(self.hedging.members) else None
+
+    def timeout(self) -> float | None:
+        """Seconds until the next member should be asked, or None when none is left."""
+        if self.next_index() is None:
+            return None
+        last = len(self.started) - 1
+        return max(0.0, self.started[last] + self.hedging.deadline(last) - time.monotonic())
+
+    def launch(self, reason: str | None = None) -> int:
+        index = len(self.started)
+        self.started.append(time.monotonic())
+        self.running.add(index)
+        if reason is not None:
+            self.hedging._count(reason)
+        return index
+
+    def failed(self, index: int, exc: BaseException) -> bool:
+        """Note a member's error; True if the next member was asked instead."""
+        self.running.discard(index)
+        self.errors.append(exc)
+        if fails_over(exc) and self.next_index() is not None:
+            return True
+        if not self.running:
+            raise self.errors[0]
+        return False
+
+    def won(self, index: int) -> list[int]:
+        """Record the winner's latency; return the members to cancel."""
+        now = time.monotonic()
+        windows = self.hedging.latencies
+        windows[index].add(now - self.started[index])
+        if index > 0:
+            self.hedging._count("secondary_wins")
+        losers = sorted(self.running - {index})
+        for loser in losers:
+            # A lower bound on its latency; leaving it out would only ever
+            # remember the fast requests and make hedging ever more eager
+            windows[loser].add(now - self.started[loser])
+        self.running = {index}
+        return losers
+
+
+class HedgedProvider(_Hedging, BaseLLMProvider):
+    """Sends requests to a primary provider, hedging to secondaries (see module docstring).
+
+    Members run in threads. A thread blocked reading a response can't be
+    interrupted, so a cancelled member stops at its next stream event and
+    closes its stream there; that is also why `chat` streams from the
+    members rather than waiting for whole responses.
+    """
+
+    def __init__(
+        self,
+        members: Sequence[BaseLLMProvider],
+        names: Sequence[str] | None = None,
+        percentile: float = HEDGE_PERCENTILE,
+        delay: float = HEDGE_DELAY,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+    ) -> None:
+        super().__init__(members, names, percentile, delay, min_samples)
+
+    def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        accumulator = StreamAccumulator()
+        for event in self.stream_chat(messages, tools, system):
+            accumulator.feed(event)
+        return accumulator.response()
+
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        yield from self._race(lambda member: member.stream_chat(messages, tools, system))
+
+    def _race(self, open_member: Callable[[BaseLLMProvider], Iterator[T]]) -> Iterator[T]:
+        race = _Race(self)
+        results: queue.Queue[tuple[int, str, Any]] = queue.Queue()
+        cancelled = [threading.Event() for _ in self.members]
+
+        def pump(index: int) -> None:
+            events: Iterator[T] | None = None
+            try:
+                with fail_fast(self.fail_fast(index)):
+                    events = open_member(self.members[index])
+                    for event in events:
+                        if cancelled[index].is_set():
+                            break
+                        results.put((index, _EVENT, event))
+                    results.put((index, _END, None))
+            except Exception as exc:
+                results.put((index, _ERROR, exc))
+            finally:
+                close = getattr(events, "close", None)
+                if close is not None:
+                    close()
+
+        def launch(reason: str | None = None) -> None:
+            index = race.launch(reason)
+            threading.Thread(target=pump, args=(index,), name=f"codeagent-hedge-{index}", daemon=True).start()
+
+        try:
+            launch()
+            while True:
+                try:
+                    index, what, payload = results.get(timeout=race.timeout())
+                except queue.Empty:
+                    with span("llm.hedge", "llm", member=self.names[len(race.started)]):
+                        launch("hedges")
+                    continue
+                if what == _ERROR:
+                    if race.failed(index, payload):
+                        launch("failovers")
+                    continue
+                winner = index
+                for loser in race.won(winner):
+                    cancelled[loser].set()
+                break
+            while True:
+                if index == winner:
+                    if what == _EVENT:
+                        yield payload
+                    elif what == _ERROR:
+                        raise payload
+                    else:
+                        return
+                index, what, payload = results.get()
+        finally:
+            for event in cancelled:
+                event.set()
+
+
+class AsyncHedgedProvider(_Hedging, AsyncBaseLLMProvider):
+    """Asyncio counterpart of `HedgedProvider`; losers are cancelled outright."""
+
+    def __init__(
+        self,
+        members: Sequence[AsyncBaseLLMProvider],
+        names: Sequence[str] | None = None,
+        percentile: float = HEDGE_PERCENTILE,
+        delay: float = HEDGE_DELAY,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+    ) -> None:
+        super().__init__(members, names, percentile, delay, min_samples)
+
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        accumulator = StreamAccumulator()
+        async for event in self.stream_chat(messages, tools, system):
+            accumulator.feed(event)
+        return accumulator.response()
+
+    async def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> AsyncIterator[StreamEvent]:
+        async for event in self._race(lambda member: member.stream_chat(messages, tools, system)):
+            yield event
+
+    async def _race(self, open_member: Callable[[AsyncBaseLLMProvider], AsyncIterator[T]]) -> AsyncIterator[T]:
+        race = _Race(self)
+        results: asyncio.Queue[tuple[int, str, Any]] = asyncio.Queue()
+        tasks: dict[int, asyncio.Task[None]] = {}
+
+        async def pump(index: int) -> None:
+            events = open_member(self.members[index])
+            try:
+                with fail_fast(self.fail_fast(index)):
+                    async for event in events:
+                        results.put_nowait((index, _EVENT, event))
+                    results.put_nowait((index, _END, None))
+            except Exception as exc:
+                results.put_nowait((index, _ERROR, exc))
+            finally:
+                aclose = getattr(events, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+        def launch(reason: str | None = None) -> None:
+            index = race.launch(reason)
+            tasks[index] = asyncio.ensure_future(pump(index))
+
+        try:
+            launch()
+            while True:
+                try:
+                    index, what, payload = await asyncio.wait_for(results.get(), race.timeout())
+                except asyncio.TimeoutError:
+                    with span("llm.hedge", "llm", member=self.names[len(race.started)]):
+                        launch("hedges")
+                    continue
+                if what == _ERROR:
+                    if race.failed(index, payload):
+                        launch("failovers")
+                    continue
+                winner = index
+                for loser in race.won(winner):
+                    tasks[loser].cancel()
+                break
+            while True:
+                if index == winner:
+                    if what == _EVENT:
+                        yield payload
+                    elif what == _ERROR:
+                        raise payload
+                    else:
+                        return
+                index, what, payload = await results.get()
+        finally:
+            for task in tasks.values():
+                task.cancel()
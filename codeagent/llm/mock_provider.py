@@ -1,12 +1,16 @@
 """Mock LLM provider for testing without API keys."""
 
 from __future__ import annotations
+import asyncio
 import json
 import random
-from typing import Any, AsyncIterator
+import re
+from typing import Any, AsyncIterator, Iterator
 
-from .base import BaseLLMProvider
-from .types import LLMResponse, Message, ToolCall
+from ..tracing import traced_llm
+from .base import AsyncBaseLLMProvider, BaseLLMProvider
+from .streaming import events_from_response
+from .types import LLMResponse, Message, StreamEvent, TextDelta, ToolCall
 
 
 # Patterns: if user message contains keyword, use a tool
@@ -79,12 +83,34 @@ class MockProvider(BaseLLMProvider):
     def __init__(self) -> None:
         self._call_count = 0
 
+    @traced_llm("llm.chat")
     def chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
     ) -> LLMResponse:
+        return self._respond(messages)
+
+    @traced_llm("llm.stream")
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        yield from self._stream(messages)
+
+    def _stream(self, messages: list[Message]) -> Iterator[StreamEvent]:
+        response = self._respond(messages)
+        # Word-sized deltas, like a real model would stream them
+        for word in re.findall(r"\s*\S+", response.content):
+            yield TextDelta(word)
+        yield from events_from_response(
+            LLMResponse(tool_calls=response.tool_calls, stop_reason=response.stop_reason)
+        )
+
+    def _respond(self, messages: list[Message]) -> LLMResponse:
         self._call_count += 1
 
         # Check if last message was a tool result — return followup text
@@ -128,15 +154,42 @@ class MockProvider(BaseLLMProvider):
             stop_reason="end_turn",
         )
 
+    def get_model_name(self) -> str:
+        return "Mock (Demo Mode - No API Key)"
+
+
+class AsyncMockProvider(AsyncBaseLLMProvider):
+    """Asyncio variant of `MockProvider` for offline load tests.
+
+    `latency` seconds are awaited before each response to stand in for the
+    network round trip without blocking the event loop.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self._mock = MockProvider()
+
+    @traced_llm("llm.chat")
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        await asyncio.sleep(self.latency)
+        return self._mock._respond(messages)
+
+    @traced_llm("llm.stream")
     async def stream_chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
-    ) -> AsyncIterator[str]:
-        response = self.chat(messages, tools, system)
-        for word in response.content.split(" "):
-            yield word + " "
+    ) -> AsyncIterator[StreamEvent]:
+        await asyncio.sleep(self.latency)
+        for event in self._mock._stream(messages):
+            yield event
+            await asyncio.sleep(0)
 
     def get_model_name(self) -> str:
-        return "Mock (Demo Mode - No API Key)"
+        return self._mock.get_model_name()
@@ -0,0 +1,116 @@
+"""Model metadata: context window sizes, output limits and prices."""
+
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import TypeVar
+
+from ..config import config
+from ..constants import PROMPT_RESERVE_TOKENS
+from .types import Usage
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ModelInfo:
+    """Static facts about a model that the agent plans around."""
+    context_window: int  # total tokens the model accepts (prompt + output)
+    max_output: int  # tokens reserved for the response
+
+
+# Keyed by model id; lookups also match on the longest known prefix, so
+# dated snapshots ("claude-sonnet-4-20250514") resolve to their family.
+MODELS: dict[str, ModelInfo] = {
+    "claude-opus-4": ModelInfo(200_000, 8192),
+    "claude-sonnet-4": ModelInfo(200_000, 8192),
+    "claude-3-7-sonnet": ModelInfo(200_000, 8192),
+    "claude-3-5-sonnet": ModelInfo(200_000, 8192),
+    "claude-3-5-haiku": ModelInfo(200_000, 8192),
+    "gpt-4o-mini": ModelInfo(128_000, 16_384),
+    "gpt-4o": ModelInfo(128_000, 16_384),
+    "gpt-4.1": ModelInfo(1_047_576, 32_768),
+    "o3": ModelInfo(200_000, 100_000),
+    "o4-mini": ModelInfo(200_000, 100_000),
+    "qwen2.5": ModelInfo(32_768, 4096),
+    "llama3.1": ModelInfo(131_072, 4096),
+    "llama3.2": ModelInfo(131_072, 4096),
+}
+
+# Used for unknown models (and the demo provider): conservative but usable
+DEFAULT_MODEL_INFO = ModelInfo(32_768, 4096)
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """List prices in USD per million tokens."""
+    input: float
+    output: float
+    cache_read: float  # prompt tokens served from the provider's cache
+    cache_write: float  # prompt tokens written to the cache (Anthropic)
+
+
+# Public list prices at the time of writing; update when providers change them.
+# Unknown models are not priced rather than guessed.
+PRICES: dict[str, ModelPrice] = {
+    "claude-opus-4": ModelPrice(15.00, 75.00, 1.50, 18.75),
+    "claude-sonnet-4": ModelPrice(3.00, 15.00, 0.30, 3.75),
+    "claude-3-7-sonnet": ModelPrice(3.00, 15.00, 0.30, 3.75),
+    "claude-3-5-sonnet": ModelPrice(3.00, 15.00, 0.30, 3.75),
+    "claude-3-5-haiku": ModelPrice(0.80, 4.00, 0.08, 1.00),
+    "gpt-4o-mini": ModelPrice(0.15, 0.60, 0.075, 0.15),
+    "gpt-4o": ModelPrice(2.50, 10.00, 1.25, 2.50),
+    "gpt-4.1": ModelPrice(2.00, 8.00, 0.50, 2.00),
+    "o3": ModelPrice(2.00, 8.00, 0.50, 2.00),
+    "o4-mini": ModelPrice(1.10, 4.40, 0.275, 1.10),
+    # Local models served by Ollama
+    "qwen2.5": ModelPrice(0.0, 0.0, 0.0, 0.0),
+    "llama3.1": ModelPrice(0.0, 0.0, 0.0, 0.0),
+    "llama3.2": ModelPrice(0.0, 0.0, 0.0, 0.0),
+}
+
+
+def _lookup(table: dict[str, T], model: str) -> T | None:
+    """Exact match, else the entry with the longest prefix of `model`."""
+    if model in table:
+        return table[model]
+    best = ""
+    for known in table:
+        if model.startswith(known) and len(known) > len(best):
+            best = known
+    return table[best] if best else None
+
+
+def get_model_info(model: str) -> ModelInfo:
+    """Return metadata for `model`, falling back to the longest matching prefix."""
+    return _lookup(MODELS, model) or DEFAULT_MODEL_INFO
+
+
+def get_price(model: str) -> ModelPrice | None:
+    """Prices for `model` (longest matching prefix), or None if unknown."""
+    return _lookup(PRICES, model)
+
+
+def cost(model: str, usage: Usage) -> float | None:
+    """USD cost of `usage` on `model`, or None if the model is not priced."""
+    price = get_price(model)
+    if price is None:
+        return None
+    return (
+        usage.input_tokens * price.input
+        + usage.output_tokens * price.output
+        + usage.cache_read_tokens * price.cache_read
+        + usage.cache_write_tokens * price.cache_write
+    ) / 1_000_000
+
+
+def history_budget(model: str) -> int:
+    """Tokens available for conversation history with `model`.
+
+    The context window minus the response reservation and room for the
+    system prompt and tool schemas, further capped by CODEAGENT_HISTORY_TOKENS.
+    """
+    info = get_model_info(model)
+    budget = max(info.context_window - info.max_output - PROMPT_RESERVE_TOKENS, 1024)
+    if config.history_tokens:
+        budget = min(budget, config.history_tokens)
+    return budget
@@ -1,53 +1,108 @@
-"""Ollama local LLM provider — free, no API key needed."""
+"""Ollama local LLM provider — free, no API key needed.
+
+Talks to Ollama's native `/api/chat` endpoint (not its OpenAI-compatible
+shim, which cannot pass model options) so that requests:
+
+- keep the model loaded between turns (`keep_alive`), instead of paying a
+  cold reload of several seconds after Ollama's default five minutes;
+- size the context (`num_ctx`) to the prompt, so long histories are not
+  silently cut to Ollama's small default. The size grows in powers of two
+  and shrinks back only once a prompt needs a quarter of it or less (after
+  compaction or trimming): a different `num_ctx` makes Ollama reload the
+  model and throw away its KV cache;
+- leave the response length (`num_predict`) to Ollama unless one is
+  configured, budgeting a modest `OLLAMA_OUTPUT_RESERVE` for it instead of
+  the model's whole output limit;
+- render the system prompt, tools, earlier messages and options the same
+  way every round, so Ollama can reuse the KV cache of the common prefix
+  and only evaluate the new messages.
+
+`preload()` loads the model with the same options in the background, so
+the first real request does not wait for it.
+
+Several Ollama servers (one per CPU socket or container) can serve as one
+provider: requests are then routed by an `EndpointPool` (see `endpoints`).
+"""
 
 from __future__ import annotations
+import asyncio
+import hashlib
 import json
-from typing import Any, AsyncIterator
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Iterator, Sequence
+
+import httpx
+
+from ..config import config
+from ..constants import OLLAMA_MIN_CTX, OLLAMA_OUTPUT_RESERVE, OLLAMA_TIMEOUT, PROMPT_RESERVE_TOKENS
+from ..tracing import span, traced, traced_llm
+from .base import AsyncBaseLLMProvider, BaseLLMProvider, ToolPayloadCache
+from .endpoints import Endpoint, get_endpoint_pool
+from .models import get_model_info
+from .pool import async_http_client, http_client
+from .scheduler import get_scheduler, request_tokens
+from .streaming import parse_arguments
+from .types import (
+    LLMResponse,
+    Message,
+    StopEvent,
+    StreamEvent,
+    TextDelta,
+    ToolCall,
+    ToolCallComplete,
+    ToolCallStart,
+    Usage,
+    UsageEvent,
+)
 
-import openai
 
-from .base import BaseLLMProvider
-from .types import LLMResponse, Message, ToolCall
+class OllamaError(RuntimeError):
+    """An error reply from Ollama; `status_code` lets the scheduler retry it or not."""
+
+    def __init__(self, message: str, status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _message_to_ollama(msg: Message) -> dict | None:
+    """Convert one internal message to Ollama's native chat format."""
+    if msg.role == "tool":
+        return {"role": "tool", "content": msg.content, "tool_name": msg.name or ""}
+    elif msg.role == "assistant" and msg.tool_calls:
+        return {
+            "role": "assistant",
+            "content": msg.content,
+            "tool_calls": [
+                {"function": {"name": tc.name, "arguments": tc.arguments}}
+                for tc in msg.tool_calls
+            ],
+        }
+    elif msg.role in ("user", "assistant"):
+        return {"role": msg.role, "content": msg.content}
+    return None
 
 
 def _messages_to_ollama(messages: list[Message], system: str = "") -> list[dict]:
-    """Convert internal messages to OpenAI-compatible format for Ollama."""
+    """Convert internal messages to Ollama's native chat format.
+
+    Each message is converted once and memoized on the Message, so a round
+    only pays for the messages added since the previous one.
+    """
     result: list[dict] = []
     if system:
         result.append({"role": "system", "content": system})
 
     for msg in messages:
-        if msg.role == "tool":
-            result.append({
-                "role": "tool",
-                "tool_call_id": msg.tool_call_id,
-                "content": msg.content,
-            })
-        elif msg.role == "assistant" and msg.tool_calls:
-            entry: dict[str, Any] = {"role": "assistant"}
-            if msg.content:
-                entry["content"] = msg.content
-            else:
-                entry["content"] = None
-            entry["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": "function",
-                    "function": {
-                        "name": tc.name,
-                        "arguments": json.dumps(tc.arguments),
-                    },
-                }
-                for tc in msg.tool_calls
-            ]
-            result.append(entry)
-        elif msg.role in ("user", "assistant"):
-            result.append({"role": msg.role, "content": msg.content})
+        converted = msg.wire("ollama", _message_to_ollama)
+        if converted is not None:
+            result.append(converted)
     return result
 
 
 def _tools_to_ollama(tools: list[dict[str, Any]]) -> list[dict]:
-    """Convert tool schemas to OpenAI function calling format."""
+    """Convert tool schemas to the function format Ollama accepts."""
     result = []
     for tool in tools:
         result.append({
@@ -61,67 +116,413 @@ def _tools_to_ollama(tools: list[dict[str, Any]]) -> list[dict]:
     return result
 
 
-class OllamaProvider(BaseLLMProvider):
-    """Ollama local LLM provider — uses OpenAI-compatible API."""
+def _keep_alive(value: str) -> str | int:
+    """Ollama takes durations ("30m") or seconds (-1 = forever)."""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class _ContextSize:
+    """`num_ctx` for a model's requests: fits the prompt, with hysteresis.
+
+    `num_predict` is only sent when configured (0: Ollama's default, which
+    stops at the context size); `reserve` is what the response is budgeted.
+    """
+
+    def __init__(self, model: str) -> None:
+        info = get_model_info(model)
+        self.limit = config.ollama_num_ctx or info.context_window
+        self.num_predict = config.ollama_num_predict
+        self.reserve = self.num_predict or min(info.max_output, OLLAMA_OUTPUT_RESERVE)
+        self.floor = min(self.limit, OLLAMA_MIN_CTX)
+        self.current = self.floor
+        self._lock = threading.Lock()
+
+    def _size(self, needed: int) -> int:
+        """The smallest size in the doubling series from `floor` that holds `needed`."""
+        size = self.floor
+        while size < needed and size < self.limit:
+            size = min(self.limit, size * 2)
+        return size
+
+    def fit(self, prompt_tokens: int) -> int:
+        needed = prompt_tokens + self.reserve
+        with self._lock:
+            if needed > self.current:
+                self.current = self._size(needed)
+            elif needed * 4 <= self.current:
+                # Shrink, leaving room for the prompt to double before it grows again
+                self.current = self._size(needed * 2)
+            return self.current
+
+    def options(self, num_ctx: int) -> dict[str, Any]:
+        options: dict[str, Any] = {"num_ctx": num_ctx}
+        if self.num_predict:
+            options["num_predict"] = self.num_predict
+        return options
+
+    def history_budget(self) -> int:
+        budget = max(self.limit - self.reserve - PROMPT_RESERVE_TOKENS, 1024)
+        return min(budget, config.history_tokens) if config.history_tokens else budget
+
+
+@traced("llm.build_request", "llm", measure_result=True)
+def _build_request(
+    model: str,
+    messages: list[Message],
+    wire_tools: list[dict],
+    system: str,
+    options: dict[str, Any],
+    keep_alive: str | int,
+    stream: bool,
+) -> dict[str, Any]:
+    """JSON body for `/api/chat`; `wire_tools` are already converted."""
+    body: dict[str, Any] = {
+        "model": model,
+        "messages": _messages_to_ollama(messages, system),
+        "stream": stream,
+        "keep_alive": keep_alive,
+        "options": options,
+    }
+    if wire_tools:
+        body["tools"] = wire_tools
+    return body
+
 
-    def __init__(self, model: str = "qwen2.5:0.5b") -> None:
-        self.model = model
-        self.client = openai.OpenAI(
-            base_url="http://localhost:11434/v1",
-            api_key="ollama",  # Ollama doesn't need a real key
-        )
+def _parse_usage(data: dict[str, Any]) -> Usage:
+    # `prompt_eval_count` only counts prompt tokens not served from the KV cache
+    return Usage(
+        input_tokens=data.get("prompt_eval_count", 0) or 0,
+        output_tokens=data.get("eval_count", 0) or 0,
+    )
 
+
+def _parse_tool_call(call: dict[str, Any]) -> ToolCall:
+    function = call.get("function") or {}
+    arguments = function.get("arguments")
+    if isinstance(arguments, str):
+        arguments = parse_arguments(arguments)
+    return ToolCall(
+        # Ollama does not always give calls an id; the agent needs one to pair results
+        id=call.get("id") or f"call_{uuid.uuid4().hex[:24]}",
+        name=function.get("name", ""),
+        arguments=arguments if isinstance(arguments, dict) else {},
+    )
+
+
+def _parse_response(data: dict[str, Any], started: float | None = None) -> LLMResponse:
+    """Convert a complete `/api/chat` reply into an LLMResponse."""
+    message = data.get("message") or {}
+    return LLMResponse(
+        content=message.get("content") or "",
+        tool_calls=[_parse_tool_call(call) for call in message.get("tool_calls") or []],
+        stop_reason=data.get("done_reason"),
+        usage=_parse_usage(data),
+        latency=None if started is None else time.perf_counter() - started,
+    )
+
+
+def _error(response: httpx.Response) -> OllamaError:
+    """The error for a failed reply; its body must have been read."""
+    try:
+        message = response.json().get("error") or response.text
+    except ValueError:
+        message = response.text
+    return OllamaError(f"Ollama returned {response.status_code}: {message}", response.status_code)
+
+
+class _ChunkTranslator:
+    """Translate streamed `/api/chat` chunks into stream events.
+
+    Ollama sends each tool call whole, in one chunk, so a call starts and
+    completes at once.
+    """
+
+    def __init__(self) -> None:
+        self._calls = 0
+        self._usage: Usage | None = None
+        self._stop_reason: str | None = None
+
+    def feed(self, chunk: dict[str, Any]) -> Iterator[StreamEvent]:
+        if "error" in chunk:
+            raise OllamaError(f"Ollama stream failed: {chunk['error']}")
+        message = chunk.get("message") or {}
+        if message.get("content"):
+            yield TextDelta(message["content"])
+        for raw in message.get("tool_calls") or []:
+            call = _parse_tool_call(raw)
+            index = self._calls
+            self._calls += 1
+            yield ToolCallStart(index=index, id=call.id, name=call.name)
+            yield ToolCallComplete(index=index, tool_call=call)
+        if chunk.get("done"):
+            self._usage = _parse_usage(chunk)
+            self._stop_reason = chunk.get("done_reason")
+
+    def finish(self) -> Iterator[StreamEvent]:
+        if self._usage is not None:
+            yield UsageEvent(self._usage)
+        yield StopEvent(self._stop_reason)
+
+
+def _iter_chunks(response: httpx.Response, release: Callable[[bool], None]) -> Iterator[dict[str, Any]]:
+    failed = False
+    try:
+        for line in response.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+    except httpx.TransportError:
+        failed = True
+        raise
+    finally:
+        response.close()
+        release(failed)
+
+
+async def _aiter_chunks(response: httpx.Response, release: Callable[[bool], None]) -> AsyncIterator[dict[str, Any]]:
+    failed = False
+    try:
+        async for line in response.aiter_lines():
+            if line.strip():
+                yield json.loads(line)
+    except httpx.TransportError:
+        failed = True
+        raise
+    finally:
+        await response.aclose()
+        release(failed)
+
+
+def _first_message_hash(msg: Message) -> str:
+    return hashlib.sha1(msg.content.encode("utf-8", "replace")).hexdigest()
+
+
+class _OllamaRequests:
+    """Request building and endpoint choice shared by the sync and asyncio providers."""
+
+    def __init__(self, model: str | None, endpoints: Sequence[str] | None) -> None:
+        self.model = model or config.ollama_model
+        self.endpoints = get_endpoint_pool(endpoints or config.ollama_urls, health_path="/api/version")
+        self.keep_alive = _keep_alive(config.ollama_keep_alive)
+        self._context = _ContextSize(self.model)
+        self._scheduler = get_scheduler("ollama")
+        self._tool_payload = ToolPayloadCache(_tools_to_ollama)
+
+    def _request(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None,
+        system: str,
+        stream: bool,
+    ) -> tuple[dict[str, Any], int, str]:
+        """The request body, its estimated prompt tokens and its affinity key."""
+        wire_tools = self._tool_payload.get(tools)
+        tokens = request_tokens(messages, system)
+        num_ctx = self._context.fit(tokens + (PROMPT_RESERVE_TOKENS if wire_tools else 0))
+        options = self._context.options(num_ctx)
+        body = _build_request(self.model, messages, wire_tools, system, options, self.keep_alive, stream)
+        return body, tokens, self._affinity_key(messages, system)
+
+    def _affinity_key(self, messages: list[Message], system: str) -> str:
+        # A conversation is recognized by its start, which every round resends
+        # unchanged (the system prompt's hash is cached by the str itself)
+        first = messages[0].wire("affinity", _first_message_hash) if messages else ""
+        return f"{self.model}:{hash(system):x}:{first}"
+
+    def _preload_body(self) -> dict[str, Any]:
+        # A chat without messages only loads the model; the options must match
+        # the first real request's, or that one reloads it
+        return {
+            "model": self.model,
+            "messages": [],
+            "keep_alive": self.keep_alive,
+            "options": self._context.options(self._context.current),
+        }
+
+    def _failed_over(self, endpoint: Endpoint, tried: list[Endpoint]) -> bool:
+        """`endpoint` could not be reached; True if another one is left to try."""
+        self.endpoints.release(endpoint, failed=True)
+        tried.append(endpoint)
+        return len(tried) < len(self.endpoints)
+
+    def get_model_name(self) -> str:
+        if len(self.endpoints) > 1:
+            return f"Ollama ({self.model} on {len(self.endpoints)} servers) — Local & Free"
+        return f"Ollama ({self.model}) — Local & Free"
+
+    def history_budget(self) -> int:
+        # Not models.history_budget: that reserves the model's whole output limit
+        return self._context.history_budget()
+
+
+class OllamaProvider(_OllamaRequests, BaseLLMProvider):
+    """Ollama local LLM provider on the native `/api/chat` API (see module docstring).
+
+    With several endpoints configured, requests are spread over them by an
+    `EndpointPool`, and a request that cannot reach one goes to the next.
+    """
+
+    def __init__(self, model: str | None = None, endpoints: Sequence[str] | None = None) -> None:
+        super().__init__(model, endpoints)
+        self._http = http_client()
+
+    @traced_llm("llm.chat")
     def chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
     ) -> LLMResponse:
-        kwargs: dict[str, Any] = {
-            "model": self.model,
-            "messages": _messages_to_ollama(messages, system),
-        }
-        if tools:
-            kwargs["tools"] = _tools_to_ollama(tools)
-
-        response = self.client.chat.completions.create(**kwargs)
-        choice = response.choices[0]
-        message = choice.message
-
-        tool_calls: list[ToolCall] = []
-        if message.tool_calls:
-            for tc in message.tool_calls:
-                try:
-                    args = json.loads(tc.function.arguments)
-                except json.JSONDecodeError:
-                    args = {}
-                tool_calls.append(
-                    ToolCall(id=tc.id, name=tc.function.name, arguments=args)
-                )
-
-        return LLMResponse(
-            content=message.content or "",
-            tool_calls=tool_calls,
-            stop_reason=choice.finish_reason,
-        )
+        body, tokens, key = self._request(messages, tools, system, stream=False)
+        started = time.perf_counter()
+        data = self._scheduler.call(lambda: self._post(body, key), tokens)
+        return _parse_response(data, started)
+
+    @traced_llm("llm.stream")
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        body, tokens, key = self._request(messages, tools, system, stream=True)
+        translator = _ChunkTranslator()
+        for chunk in self._scheduler.stream(lambda: self._open_stream(body, key), tokens):
+            yield from translator.feed(chunk)
+        yield from translator.finish()
+
+    def preload(self) -> list[threading.Thread]:
+        """Load the model on every endpoint in the background; failures are left to the first request."""
+        body = self._preload_body()
+
+        def run(url: str) -> None:
+            try:
+                with span("llm.preload", "llm", model=self.model, endpoint=url):
+                    response = self._http.post(f"{url}/api/chat", json=body, timeout=OLLAMA_TIMEOUT)
+                    response.raise_for_status()
+            except httpx.HTTPError:
+                pass
 
+        threads = [
+            threading.Thread(target=run, args=(endpoint.url,), name="codeagent-preload", daemon=True)
+            for endpoint in self.endpoints.endpoints
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _send(self, body: dict[str, Any], key: str, stream: bool) -> tuple[httpx.Response, Endpoint]:
+        """Send to the pool's choice of endpoint, moving on while endpoints are unreachable.
+
+        The returned endpoint is still counted as in flight; error replies are raised.
+        """
+        tried: list[Endpoint] = []
+        while True:
+            endpoint = self.endpoints.acquire(key, tried)
+            request = self._http.build_request("POST", f"{endpoint.url}/api/chat", json=body, timeout=OLLAMA_TIMEOUT)
+            try:
+                response = self._http.send(request, stream=stream)
+            except httpx.TransportError:
+                if self._failed_over(endpoint, tried):
+                    continue
+                raise
+            except BaseException:
+                self.endpoints.release(endpoint)
+                raise
+            if response.is_error:
+                response.read()
+                response.close()
+                self.endpoints.release(endpoint, failed=response.status_code >= 500)
+                raise _error(response)
+            return response, endpoint
+
+    def _post(self, body: dict[str, Any], key: str) -> dict[str, Any]:
+        response, endpoint = self._send(body, key, stream=False)
+        self.endpoints.release(endpoint)
+        return response.json()
+
+    def _open_stream(self, body: dict[str, Any], key: str) -> Iterator[dict[str, Any]]:
+        response, endpoint = self._send(body, key, stream=True)
+        return _iter_chunks(response, lambda failed: self.endpoints.release(endpoint, failed))
+
+
+class AsyncOllamaProvider(_OllamaRequests, AsyncBaseLLMProvider):
+    """Asyncio counterpart of `OllamaProvider`."""
+
+    def __init__(self, model: str | None = None, endpoints: Sequence[str] | None = None) -> None:
+        super().__init__(model, endpoints)
+        self._http = async_http_client()
+
+    @traced_llm("llm.chat")
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        body, tokens, key = self._request(messages, tools, system, stream=False)
+        started = time.perf_counter()
+        data = await self._scheduler.acall(lambda: self._post(body, key), tokens)
+        return _parse_response(data, started)
+
+    @traced_llm("llm.stream")
     async def stream_chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
-    ) -> AsyncIterator[str]:
-        kwargs: dict[str, Any] = {
-            "model": self.model,
-            "messages": _messages_to_ollama(messages, system),
-            "stream": True,
-        }
-        # Don't pass tools in streaming mode for compatibility
-        stream = self.client.chat.completions.create(**kwargs)
-        for chunk in stream:
-            delta = chunk.choices[0].delta if chunk.choices else None
-            if delta and delta.content:
-                yield delta.content
+    ) -> AsyncIterator[StreamEvent]:
+        body, tokens, key = self._request(messages, tools, system, stream=True)
+        translator = _ChunkTranslator()
+        async for chunk in self._scheduler.astream(lambda: self._open_stream(body, key), tokens):
+            for event in translator.feed(chunk):
+                yield event
+        for event in translator.finish():
+            yield event
 
-    def get_model_name(self) -> str:
-        return f"Ollama ({self.model}) — Local & Free"
+    async def preload(self) -> None:
+        """Load the model on every endpoint; failures are left to the first request."""
+        body = self._preload_body()
+
+        async def run(url: str) -> None:
+            try:
+                with span("llm.preload", "llm", model=self.model, endpoint=url):
+                    response = await self._http.post(f"{url}/api/chat", json=body, timeout=OLLAMA_TIMEOUT)
+                    response.raise_for_status()
+            except httpx.HTTPError:
+                pass
+
+        await asyncio.gather(*(run(endpoint.url) for endpoint in self.endpoints.endpoints))
+
+    async def _send(self, body: dict[str, Any], key: str, stream: bool) -> tuple[httpx.Response, Endpoint]:
+        """Asyncio counterpart of `OllamaProvider._send`."""
+        tried: list[Endpoint] = []
+        while True:
+            endpoint = self.endpoints.acquire(key, tried)
+            request = self._http.build_request("POST", f"{endpoint.url}/api/chat", json=body, timeout=OLLAMA_TIMEOUT)
+            try:
+                response = await self._http.send(request, stream=stream)
+            except httpx.TransportError:
+                if self._failed_over(endpoint, tried):
+                    continue
+                raise
+            except BaseException:
+                self.endpoints.release(endpoint)
+                raise
+            if response.is_error:
+                await response.aread()
+                await response.aclose()
+                self.endpoints.release(endpoint, failed=response.status_code >= 500)
+                raise _error(response)
+            return response, endpoint
+
+    async def _post(self, body: dict[str, Any], key: str) -> dict[str, Any]:
+        response, endpoint = await self._send(body, key, stream=False)
+        self.endpoints.release(endpoint)
+        return response.json()
+
+    async def _open_stream(self, body: dict[str, Any], key: str) -> AsyncIterator[dict[str, Any]]:
+        response, endpoint = await self._send(body, key, stream=True)
+        return _aiter_chunks(response, lambda failed: self.endpoints.release(endpoint, failed))
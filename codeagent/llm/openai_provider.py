@@ -2,49 +2,67 @@
 
 from __future__ import annotations
 import json
-from typing import Any, AsyncIterator
+import time
+from typing import Any, AsyncIterator, Iterator
 
 import openai
 
 from ..config import config
 from ..constants import OPENAI_MODEL
-from .base import BaseLLMProvider
-from .types import LLMResponse, Message, ToolCall
+from ..tracing import traced, traced_llm
+from .base import AsyncBaseLLMProvider, BaseLLMProvider, ToolPayloadCache
+from .pool import async_http_client, http_client
+from .scheduler import get_scheduler, request_tokens
+from .streaming import aiter_openai_events, iter_openai_events, parse_openai_usage
+from .types import LLMResponse, Message, StreamEvent, ToolCall
+
+
+def _message_to_openai(msg: Message) -> dict | None:
+    """Convert one internal message to OpenAI API format."""
+    if msg.role == "tool":
+        return {
+            "role": "tool",
+            "tool_call_id": msg.tool_call_id,
+            "content": msg.content,
+        }
+    elif msg.role == "assistant" and msg.tool_calls:
+        entry: dict[str, Any] = {"role": "assistant"}
+        if msg.content:
+            entry["content"] = msg.content
+        else:
+            entry["content"] = None
+        entry["tool_calls"] = [
+            {
+                "id": tc.id,
+                "type": "function",
+                "function": {
+                    "name": tc.name,
+                    "arguments": json.dumps(tc.arguments),
+                },
+            }
+            for tc in msg.tool_calls
+        ]
+        return entry
+    elif msg.role in ("user", "assistant"):
+        return {"role": msg.role, "content": msg.content}
+    return None
 
 
 def _messages_to_openai(messages: list[Message], system: str = "") -> list[dict]:
-    """Convert internal messages to OpenAI API format."""
+    """Convert internal messages to OpenAI API format.
+
+    Each message is converted once (including the `json.dumps` of its tool
+    arguments) and memoized on the Message, so a round only pays for the
+    messages added since the previous one.
+    """
     result: list[dict] = []
     if system:
         result.append({"role": "system", "content": system})
 
     for msg in messages:
-        if msg.role == "tool":
-            result.append({
-                "role": "tool",
-                "tool_call_id": msg.tool_call_id,
-                "content": msg.content,
-            })
-        elif msg.role == "assistant" and msg.tool_calls:
-            entry: dict[str, Any] = {"role": "assistant"}
-            if msg.content:
-                entry["content"] = msg.content
-            else:
-                entry["content"] = None
-            entry["tool_calls"] = [
-                {
-                    "id": tc.id,
-                    "type": "function",
-                    "function": {
-                        "name": tc.name,
-                        "arguments": json.dumps(tc.arguments),
-                    },
-                }
-                for tc in msg.tool_calls
-            ]
-            result.append(entry)
-        elif msg.role in ("user", "assistant"):
-            result.append({"role": msg.role, "content": msg.content})
+        converted = msg.wire("openai", _message_to_openai)
+        if converted is not None:
+            result.append(converted)
     return result
 
 
@@ -63,66 +81,129 @@ def _tools_to_openai(tools: list[dict[str, Any]]) -> list[dict]:
     return result
 
 
+@traced("llm.build_request", "llm", measure_result=True)
+def _build_request(
+    model: str,
+    messages: list[Message],
+    wire_tools: list[dict],
+    system: str,
+) -> dict[str, Any]:
+    """Keyword arguments for `chat.completions.create`; `wire_tools` are already converted."""
+    kwargs: dict[str, Any] = {
+        "model": model,
+        "messages": _messages_to_openai(messages, system),
+    }
+    if wire_tools:
+        kwargs["tools"] = wire_tools
+    return kwargs
+
+
+def _parse_response(response: Any, started: float | None = None) -> LLMResponse:
+    """Convert a chat completion into an LLMResponse."""
+    choice = response.choices[0]
+    message = choice.message
+
+    tool_calls: list[ToolCall] = []
+    if message.tool_calls:
+        for tc in message.tool_calls:
+            try:
+                args = json.loads(tc.function.arguments)
+            except json.JSONDecodeError:
+                args = {}
+            tool_calls.append(
+                ToolCall(id=tc.id, name=tc.function.name, arguments=args)
+            )
+
+    return LLMResponse(
+        content=message.content or "",
+        tool_calls=tool_calls,
+        stop_reason=choice.finish_reason,
+        usage=parse_openai_usage(response.usage) if getattr(response, "usage", None) else None,
+        latency=None if started is None else time.perf_counter() - started,
+    )
+
+
 class OpenAIProvider(BaseLLMProvider):
     """OpenAI API provider."""
 
     def __init__(self, model: str = OPENAI_MODEL) -> None:
         self.model = model
-        self.client = openai.OpenAI(api_key=config.openai_api_key)
+        self.client = openai.OpenAI(api_key=config.openai_api_key, http_client=http_client(), max_retries=0)
+        self._scheduler = get_scheduler("openai")
+        self._tool_payload = ToolPayloadCache(_tools_to_openai)
 
+    @traced_llm("llm.chat")
     def chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
     ) -> LLMResponse:
-        kwargs: dict[str, Any] = {
-            "model": self.model,
-            "messages": _messages_to_openai(messages, system),
-        }
-        if tools:
-            kwargs["tools"] = _tools_to_openai(tools)
-
-        response = self.client.chat.completions.create(**kwargs)
-        choice = response.choices[0]
-        message = choice.message
-
-        tool_calls: list[ToolCall] = []
-        if message.tool_calls:
-            for tc in message.tool_calls:
-                try:
-                    args = json.loads(tc.function.arguments)
-                except json.JSONDecodeError:
-                    args = {}
-                tool_calls.append(
-                    ToolCall(id=tc.id, name=tc.function.name, arguments=args)
-                )
-
-        return LLMResponse(
-            content=message.content or "",
-            tool_calls=tool_calls,
-            stop_reason=choice.finish_reason,
+        kwargs = _build_request(self.model, messages, self._tool_payload.get(tools), system)
+        started = time.perf_counter()
+        response = self._scheduler.call(
+            lambda: self.client.chat.completions.create(**kwargs), request_tokens(messages, system)
+        )
+        return _parse_response(response, started)
+
+    @traced_llm("llm.stream")
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        kwargs = _build_request(self.model, messages, self._tool_payload.get(tools), system)
+        kwargs["stream"] = True
+        kwargs["stream_options"] = {"include_usage": True}
+        yield from iter_openai_events(self._scheduler.stream(
+            lambda: self.client.chat.completions.create(**kwargs), request_tokens(messages, system)
+        ))
+
+    def get_model_name(self) -> str:
+        return f"OpenAI ({self.model})"
+
+
+class AsyncOpenAIProvider(AsyncBaseLLMProvider):
+    """OpenAI API provider on the SDK's asyncio client."""
+
+    def __init__(self, model: str = OPENAI_MODEL) -> None:
+        self.model = model
+        self.client = openai.AsyncOpenAI(
+            api_key=config.openai_api_key, http_client=async_http_client(), max_retries=0
+        )
+        self._scheduler = get_scheduler("openai")
+        self._tool_payload = ToolPayloadCache(_tools_to_openai)
+
+    @traced_llm("llm.chat")
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        kwargs = _build_request(self.model, messages, self._tool_payload.get(tools), system)
+        started = time.perf_counter()
+        response = await self._scheduler.acall(
+            lambda: self.client.chat.completions.create(**kwargs), request_tokens(messages, system)
         )
+        return _parse_response(response, started)
 
+    @traced_llm("llm.stream")
     async def stream_chat(
         self,
         messages: list[Message],
         tools: list[dict[str, Any]] | None = None,
         system: str = "",
-    ) -> AsyncIterator[str]:
-        kwargs: dict[str, Any] = {
-            "model": self.model,
-            "messages": _messages_to_openai(messages, system),
-            "stream": True,
-        }
-        if tools:
-            kwargs["tools"] = _tools_to_openai(tools)
-
-        stream = self.client.chat.completions.create(**kwargs)
-        for chunk in stream:
-            delta = chunk.choices[0].delta if chunk.choices else None
-            if delta and delta.content:
-                yield delta.content
+    ) -> AsyncIterator[StreamEvent]:
+        kwargs = _build_request(self.model, messages, self._tool_payload.get(tools), system)
+        kwargs["stream"] = True
+        kwargs["stream_options"] = {"include_usage": True}
+        stream = self._scheduler.astream(
+            lambda: self.client.chat.completions.create(**kwargs), request_tokens(messages, system)
+        )
+        async for event in aiter_openai_events(stream):
+            yield event
 
     def get_model_name(self) -> str:
         return f"OpenAI ({self.model})"
@@ -0,0 +1,255 @@
+"""Process-wide reuse of providers and their HTTP connections.
+
+Providers are created once per (provider, model, base URL) and kept, so
+switching `/model claude` → `/model openai` → `/model claude` reuses the
+first provider and its warm connections. All synchronous SDK clients send
+through one shared keep-alive `httpx` client, with pool limits from
+`config` and HTTP/2 when the `h2` package is installed.
+
+An asyncio client is bound to the event loop it is used on, so asyncio
+providers and their client are kept per loop, in a table keyed weakly by
+the loop object: a finished loop's entry goes away with it and is never
+handed to a later loop. Code that runs a loop awaits `release_loop()`
+before the loop ends, to close the client's connections while that is
+still possible. Asyncio providers created outside a running loop get a
+client of their own and are not pooled.
+
+TCP connects and TLS handshakes are counted in `stats` and, while tracing,
+recorded as their own "http.connect" / "http.tls" spans, so connection
+setup shows up separately from request time.
+"""
+
+from __future__ import annotations
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, TypeVar
+
+import httpx
+
+from ..config import config
+from ..tracing import Span, tracer
+from .base import unwrap
+
+P = TypeVar("P")
+
+_PHASES = {"connection.connect_tcp": "http.connect", "connection.start_tls": "http.tls"}
+
+
+@dataclass
+class ConnectionStats:
+    """Requests sent through the shared clients and the connections they opened."""
+    requests: int = 0
+    connections: int = 0
+    tls_handshakes: int = 0
+    setup_seconds: float = 0.0  # spent in TCP connects and TLS handshakes
+
+
+stats = ConnectionStats()
+_stats_lock = threading.Lock()
+
+
+class _ConnectionTrace:
+    """httpcore `trace` extension for one request: times connection setup."""
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self._started: dict[str, tuple[float, Span | None]] = {}
+
+    def __call__(self, event: str, info: dict[str, Any]) -> None:
+        phase, _, state = event.rpartition(".")
+        name = _PHASES.get(phase)
+        if name is None:
+            return
+        if state == "started":
+            s = tracer.span(name, "http", host=self.host) if tracer.enabled else None
+            if s is not None:
+                s.__enter__()
+            self._started[phase] = (time.perf_counter(), s)
+            return
+        start, s = self._started.pop(phase, (None, None))
+        if start is None:
+            return
+        if s is not None:
+            s.__exit__(None if state == "complete" else ConnectionError)
+        if state == "complete":
+            with _stats_lock:
+                stats.setup_seconds += time.perf_counter() - start
+                if name == "http.connect":
+                    stats.connections += 1
+                else:
+                    stats.tls_handshakes += 1
+
+
+class _AsyncConnectionTrace(_ConnectionTrace):
+    async def __call__(self, event: str, info: dict[str, Any]) -> None:  # type: ignore[override]
+        super().__call__(event, info)
+
+
+def _on_request(request: httpx.Request) -> None:
+    with _stats_lock:
+        stats.requests += 1
+    request.extensions["trace"] = _ConnectionTrace(request.url.host)
+
+
+async def _aon_request(request: httpx.Request) -> None:
+    with _stats_lock:
+        stats.requests += 1
+    request.extensions["trace"] = _AsyncConnectionTrace(request.url.host)
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _client_options() -> dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.http_max_connections,
+            max_keepalive_connections=config.http_keepalive_connections,
+            keepalive_expiry=config.http_keepalive_expiry,
+        ),
+        # The SDKs pass their own per-request timeouts; this covers warm-up
+        "timeout": httpx.Timeout(60.0, connect=10.0),
+        "http2": config.http2 and http2_available(),
+        "follow_redirects": True,
+    }
+
+
+_client: httpx.Client | None = None
+_lock = threading.Lock()
+
+
+def http_client() -> httpx.Client:
+    """The shared HTTP client for synchronous SDK clients."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(event_hooks={"request": [_on_request]}, **_client_options())
+        return _client
+
+
+def async_http_client() -> httpx.AsyncClient:
+    """The shared HTTP client for asyncio SDK clients on the running event loop.
+
+    Outside a running loop there is no loop to share it with, so the caller
+    gets a new client of its own.
+    """
+    loop = _running_loop()
+    if loop is None:
+        return _new_async_client()
+    with _lock:
+        state = _loop_state(loop)
+        if state.client is None:
+            state.client = _new_async_client()
+        return state.client
+
+
+def _new_async_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(event_hooks={"request": [_aon_request]}, **_client_options())
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class ProviderPool:
+    """Provider instances by key, created on first use and then shared."""
+
+    def __init__(self) -> None:
+        self._providers: dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._providers)
+
+    def get(self, key: Hashable, create: Callable[[], P]) -> P:
+        with self._lock:
+            provider = self._providers.get(key)
+        if provider is None:
+            provider = create()
+            with self._lock:
+                # Another thread may have won the race; keep the first one
+                provider = self._providers.setdefault(key, provider)
+        return provider
+
+    def clear(self) -> None:
+        with self._lock:
+            self._providers.clear()
+
+
+providers = ProviderPool()
+
+
+@dataclass
+class _LoopState:
+    """What belongs to one event loop: its HTTP client and asyncio providers."""
+    providers: ProviderPool
+    client: httpx.AsyncClient | None = None
+
+
+_loops: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState] = weakref.WeakKeyDictionary()
+
+
+def _loop_state(loop: asyncio.AbstractEventLoop) -> _LoopState:
+    """The state of `loop`, created on first use (`_lock` held)."""
+    state = _loops.get(loop)
+    if state is None:
+        state = _loops[loop] = _LoopState(ProviderPool())
+    return state
+
+
+def async_providers() -> ProviderPool:
+    """The pool for asyncio providers on the running loop.
+
+    Outside a running loop this is a new, empty pool, so every provider
+    created there is a separate instance with a client of its own.
+    """
+    loop = _running_loop()
+    if loop is None:
+        return ProviderPool()
+    with _lock:
+        return _loop_state(loop).providers
+
+
+async def release_loop() -> None:
+    """Close the running loop's HTTP client and forget its providers.
+
+    Await this before a loop that used asyncio providers ends: once the
+    loop is closed its client can neither be used nor closed.
+    """
+    with _lock:
+        state = _loops.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        state.providers.clear()
+        if state.client is not None:
+            await state.client.aclose()
+
+
+def warm_up(provider: Any) -> threading.Thread | None:
+    """Open a connection to the provider's API in the background.
+
+    Sends one request without a body to the API's base URL, so the TCP
+    connection and TLS session are ready (and kept alive) before the first
+    real request. Returns the thread, or None if there is nothing to warm.
+    """
+    client = getattr(unwrap(provider), "client", None)
+    base_url = getattr(client, "base_url", None)
+    if base_url is None:
+        return None
+
+    def run() -> None:
+        try:
+            http_client().head(str(base_url))
+        except httpx.HTTPError:
+            pass  # the real request will report the problem
+
+    thread = threading.Thread(target=run, name="codeagent-warmup", daemon=True)
+    thread.start()
+    return thread
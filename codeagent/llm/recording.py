@@ -0,0 +1,426 @@
+"""Record LLM traffic to a cassette and replay it offline.
+
+A cassette is a JSONL file with one entry per request: a hash of the
+request, the model, the parsed response and, for streamed requests, every
+stream event with its offset from the start of the request. Wrap any
+provider in `RecordingProvider` to write one (`codeagent --record FILE`),
+then run with the "replay" provider (`codeagent --replay FILE`) to get the
+same responses back without a network or an API key, either instantly or
+at the recorded pace.
+
+Requests are matched by hash. When tool output differs from the recorded
+run (timestamps, changed files), the hash misses and the next recorded
+response in order is served instead, so a replay keeps going; `misses`
+counts how often that happened.
+"""
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from ..tracing import traced_llm
+from .base import AsyncBaseLLMProvider, BaseLLMProvider
+from .streaming import StreamAccumulator, events_from_response
+from .types import (
+    LLMResponse,
+    Message,
+    StopEvent,
+    StreamEvent,
+    TextDelta,
+    ToolCall,
+    ToolCallComplete,
+    ToolCallDelta,
+    ToolCallStart,
+    Usage,
+    UsageEvent,
+)
+
+_EVENT_TYPES = {
+    cls.__name__: cls
+    for cls in (TextDelta, ToolCallStart, ToolCallDelta, ToolCallComplete, UsageEvent, StopEvent)
+}
+
+
+class ReplayError(RuntimeError):
+    """The cassette has no response left for a request."""
+
+
+# ── Canonical request hashing ────────────────────────────────────────────────
+
+
+def _canonical_message(msg: Message) -> bytes:
+    return json.dumps(
+        [
+            msg.role,
+            msg.content,
+            [[tc.id, tc.name, tc.arguments] for tc in msg.tool_calls],
+            msg.tool_call_id,
+            msg.name,
+        ],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    ).encode("utf-8")
+
+
+def request_hash(
+    model: str,
+    messages: list[Message],
+    tools: list[dict[str, Any]] | None,
+    system: str,
+    **params: Any,
+) -> str:
+    """Stable hash of a request: model, system prompt, tools, messages and params.
+
+    Each message's canonical form is memoized on the Message, so hashing a
+    growing history costs a hash update per message, not a re-serialization.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(
+        {"model": model, "system": system, "tools": list(tools or []), "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    ).encode("utf-8"))
+    for msg in messages:
+        h.update(b"\n")
+        h.update(msg.wire("canonical", _canonical_message))
+    return h.hexdigest()
+
+
+# ── (De)serialization ────────────────────────────────────────────────────────
+
+
+def response_to_dict(response: LLMResponse) -> dict[str, Any]:
+    return asdict(response)
+
+
+def response_from_dict(data: dict[str, Any]) -> LLMResponse:
+    return LLMResponse(
+        content=data.get("content", ""),
+        tool_calls=[ToolCall(**tc) for tc in data.get("tool_calls", [])],
+        stop_reason=data.get("stop_reason"),
+        usage=Usage(**data["usage"]) if data.get("usage") else None,
+        latency=data.get("latency"),
+        first_token_latency=data.get("first_token_latency"),
+    )
+
+
+def event_to_dict(event: StreamEvent) -> dict[str, Any]:
+    return {"type": type(event).__name__, **asdict(event)}
+
+
+def event_from_dict(data: dict[str, Any]) -> StreamEvent:
+    fields = dict(data)
+    cls = _EVENT_TYPES[fields.pop("type")]
+    if cls is ToolCallComplete:
+        fields["tool_call"] = ToolCall(**fields["tool_call"])
+    elif cls is UsageEvent:
+        fields["usage"] = Usage(**fields["usage"])
+    return cls(**fields)
+
+
+# ── Cassettes ────────────────────────────────────────────────────────────────
+
+
+class CassetteWriter:
+    """Appends entries to a cassette; shared by every provider recording to it."""
+
+    _open: dict[Path, CassetteWriter] = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path: Path) -> CassetteWriter:
+        path = path.expanduser().resolve()
+        with cls._open_lock:
+            writer = cls._open.get(path)
+            if writer is None:
+                writer = cls._open[path] = cls(path)
+            return writer
+
+    def write(
+        self,
+        key: str,
+        model: str,
+        response: LLMResponse,
+        events: list[tuple[float, StreamEvent]] | None = None,
+    ) -> None:
+        entry: dict[str, Any] = {"hash": key, "model": model, "response": response_to_dict(response)}
+        if events is not None:
+            entry["events"] = [[round(t, 6), event_to_dict(e)] for t, e in events]
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+
+def load_cassette(path: Path) -> list[dict[str, Any]]:
+    """Entries of a cassette in recorded order; a torn last line is ignored."""
+    entries = []
+    with path.expanduser().open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict) and "response" in entry:
+                entries.append(entry)
+    return entries
+
+
+# ── Recording ────────────────────────────────────────────────────────────────
+
+
+class _Recorder:
+    def __init__(self, inner: BaseLLMProvider | AsyncBaseLLMProvider, path: Path) -> None:
+        self.inner = inner
+        self.model: str = getattr(inner, "model", "")
+        self.writer = CassetteWriter.for_path(path)
+
+    def key(self, messages: list[Message], tools: list[dict[str, Any]] | None, system: str) -> str:
+        # A cassette is replayed under whichever model recorded it, so the
+        # model is stored next to the hash rather than in it
+        return request_hash("", messages, tools, system)
+
+
+class RecordingProvider(BaseLLMProvider):
+    """Passes requests to `inner` and writes each response to a cassette."""
+
+    def __init__(self, inner: BaseLLMProvider, path: Path) -> None:
+        self._recorder = _Recorder(inner, path)
+        self.inner = inner
+        self.model = self._recorder.model
+
+    def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        key = self._recorder.key(messages, tools, system)
+        response = self.inner.chat(messages, tools, system)
+        self._recorder.writer.write(key, self.model, response)
+        return response
+
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        key = self._recorder.key(messages, tools, system)
+        accumulator = StreamAccumulator()
+        events: list[tuple[float, StreamEvent]] = []
+        start = time.perf_counter()
+        for event in self.inner.stream_chat(messages, tools, system):
+            events.append((time.perf_counter() - start, event))
+            accumulator.feed(event)
+            yield event
+        # Only complete streams are recorded
+        self._recorder.writer.write(key, self.model, accumulator.response(), events)
+
+    def get_model_name(self) -> str:
+        return self.inner.get_model_name()
+
+    def history_budget(self) -> int:
+        return self.inner.history_budget()
+
+
+class AsyncRecordingProvider(AsyncBaseLLMProvider):
+    """Asyncio counterpart of `RecordingProvider`."""
+
+    def __init__(self, inner: AsyncBaseLLMProvider, path: Path) -> None:
+        self._recorder = _Recorder(inner, path)
+        self.inner = inner
+        self.model = self._recorder.model
+
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        key = self._recorder.key(messages, tools, system)
+        response = await self.inner.chat(messages, tools, system)
+        self._recorder.writer.write(key, self.model, response)
+        return response
+
+    async def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> AsyncIterator[StreamEvent]:
+        key = self._recorder.key(messages, tools, system)
+        accumulator = StreamAccumulator()
+        events: list[tuple[float, StreamEvent]] = []
+        start = time.perf_counter()
+        async for event in self.inner.stream_chat(messages, tools, system):
+            events.append((time.perf_counter() - start, event))
+            accumulator.feed(event)
+            yield event
+        self._recorder.writer.write(key, self.model, accumulator.response(), events)
+
+    def get_model_name(self) -> str:
+        return self.inner.get_model_name()
+
+    def history_budget(self) -> int:
+        return self.inner.history_budget()
+
+
+# ── Replay ───────────────────────────────────────────────────────────────────
+
+
+class _Tape:
+    """Serves cassette entries: by request hash, else the next one in order."""
+
+    def __init__(self, path: Path, speed: float) -> None:
+        self.path = path
+        self.speed = speed  # 1.0 = recorded pace, 2.0 = twice as fast, 0 = instant
+        self.entries = load_cassette(path)
+        self.model: str = self.entries[0].get("model", "") if self.entries else ""
+        self.hits = 0
+        self.misses = 0
+        self._by_hash: defaultdict[str, deque[int]] = defaultdict(deque)
+        for index, entry in enumerate(self.entries):
+            self._by_hash[entry.get("hash", "")].append(index)
+        self._used: set[int] = set()
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def next(self, messages: list[Message], tools: list[dict[str, Any]] | None, system: str) -> dict[str, Any]:
+        key = request_hash("", messages, tools, system)
+        with self._lock:
+            queue = self._by_hash.get(key)
+            while queue and queue[0] in self._used:
+                queue.popleft()
+            if queue:
+                index = queue.popleft()
+                self.hits += 1
+            else:
+                while self._cursor < len(self.entries) and self._cursor in self._used:
+                    self._cursor += 1
+                if self._cursor >= len(self.entries):
+                    raise ReplayError(
+                        f"Cassette {self.path} has no recorded response left "
+                        f"({len(self.entries)} replayed)"
+                    )
+                index = self._cursor
+                self.misses += 1
+            self._used.add(index)
+            return self.entries[index]
+
+    def delay(self, seconds: float | None) -> float:
+        return (seconds or 0.0) / self.speed if self.speed > 0 else 0.0
+
+    @staticmethod
+    def events(entry: dict[str, Any]) -> list[tuple[float, StreamEvent]]:
+        if "events" in entry:
+            return [(t, event_from_dict(e)) for t, e in entry["events"]]
+        response = response_from_dict(entry["response"])
+        return [(response.latency or 0.0, e) for e in events_from_response(response)]
+
+
+class ReplayProvider(BaseLLMProvider):
+    """Answers requests from a cassette written by `RecordingProvider`."""
+
+    def __init__(self, path: Path, speed: float = 0.0) -> None:
+        self._tape = _Tape(path, speed)
+        self.model = self._tape.model
+
+    @property
+    def hits(self) -> int:
+        return self._tape.hits
+
+    @property
+    def misses(self) -> int:
+        return self._tape.misses
+
+    @traced_llm("llm.chat")
+    def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        entry = self._tape.next(messages, tools, system)
+        response = response_from_dict(entry["response"])
+        time.sleep(self._tape.delay(response.latency))
+        return response
+
+    @traced_llm("llm.stream")
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        entry = self._tape.next(messages, tools, system)
+        start = time.perf_counter()
+        for offset, event in self._tape.events(entry):
+            wait = self._tape.delay(offset) - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+            yield event
+
+    def get_model_name(self) -> str:
+        return f"Replay of {self._tape.path.name} ({self.model or 'unknown model'})"
+
+
+class AsyncReplayProvider(AsyncBaseLLMProvider):
+    """Asyncio counterpart of `ReplayProvider`."""
+
+    def __init__(self, path: Path, speed: float = 0.0) -> None:
+        self._tape = _Tape(path, speed)
+        self.model = self._tape.model
+
+    @property
+    def hits(self) -> int:
+        return self._tape.hits
+
+    @property
+    def misses(self) -> int:
+        return self._tape.misses
+
+    @traced_llm("llm.chat")
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        entry = self._tape.next(messages, tools, system)
+        response = response_from_dict(entry["response"])
+        await asyncio.sleep(self._tape.delay(response.latency))
+        return response
+
+    @traced_llm("llm.stream")
+    async def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> AsyncIterator[StreamEvent]:
+        entry = self._tape.next(messages, tools, system)
+        start = time.perf_counter()
+        for offset, event in self._tape.events(entry):
+            wait = self._tape.delay(offset) - (time.perf_counter() - start)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield event
+
+    def get_model_name(self) -> str:
+        return f"Replay of {self._tape.path.name} ({self.model or 'unknown model'})"
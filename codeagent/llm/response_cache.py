@@ -0,0 +1,397 @@
+"""On-disk cache of LLM responses, keyed by canonical request hash.
+
+Wrapping a provider in `CachingProvider` answers a request that was
+answered before (same provider, model, system prompt, tools and messages,
+tool call ids and arguments included) from a SQLite file instead of the
+API, which makes reruns of the same tasks on unchanged repos free. The
+store is bounded by size, evicting the least recently used responses, and
+entries expire after a TTL. Identical requests in flight at the same time
+in this process are collapsed into one call whose response they share.
+
+Responses served from the cache report zero tokens, since nothing was
+billed for them. Only complete responses are stored; a failed or abandoned
+request leaves nothing behind.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from ..constants import LLM_CACHE_BYTES, LLM_CACHE_TTL
+from .base import AsyncBaseLLMProvider, BaseLLMProvider
+from .recording import request_hash, response_from_dict, response_to_dict
+from .streaming import StreamAccumulator, events_from_response
+from .types import LLMResponse, Message, StreamEvent, Usage
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    response TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+_FORMAT = 1  # bump when the stored response format changes
+_EVICT_TO = 0.9  # evict down to this fraction of the size limit
+
+
+class _Abandoned(Exception):
+    """The request a caller was waiting on stopped without a response."""
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0  # answered from disk
+    shared: int = 0  # answered by an identical request already in flight
+    misses: int = 0  # sent to the provider
+    stores: int = 0
+    evictions: int = 0
+    expired: int = 0
+    errors: int = 0  # store failures, treated as misses
+
+    @property
+    def requests(self) -> int:
+        return self.hits + self.shared + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.hits + self.shared) / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+class ResponseStore:
+    """A SQLite file of responses, shared by every provider caching to it."""
+
+    _open: dict[Path, ResponseStore] = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, path: Path, max_bytes: int = LLM_CACHE_BYTES, ttl: float = LLM_CACHE_TTL) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl  # seconds; 0 = entries never expire
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._flights: dict[str, Future[LLMResponse]] = {}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Several processes (CI shards) may share the file
+        self._db = sqlite3.connect(str(path), timeout=30.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if ttl > 0:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - ttl,))
+        self._count()
+
+    @classmethod
+    def for_path(cls, path: Path, max_bytes: int = LLM_CACHE_BYTES, ttl: float = LLM_CACHE_TTL) -> ResponseStore:
+        path = path.expanduser().resolve()
+        with cls._open_lock:
+            store = cls._open.get(path)
+            if store is None:
+                store = cls._open[path] = cls(path, max_bytes, ttl)
+            return store
+
+    def __len__(self) -> int:
+        return self._entries
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _count(self) -> None:
+        entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._entries, self._bytes = entries, size
+
+    def get(self, key: str) -> LLMResponse | None:
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT created, response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and self.ttl > 0 and row[0] < now - self.ttl:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.stats.expired += 1
+                    row = None
+                if row is not None:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            except sqlite3.Error:
+                self.stats.errors += 1
+                return None
+        if row is None:
+            return None
+        return response_from_dict(json.loads(row[1]))
+
+    def put(self, key: str, model: str, response: LLMResponse) -> None:
+        data = json.dumps(response_to_dict(response), separators=(",", ":"), ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, now, now, size, data),
+                )
+                self.stats.stores += 1
+                self._entries += 1
+                self._bytes += size
+                if self._bytes > self.max_bytes:
+                    self._evict()
+            except sqlite3.Error:
+                self.stats.errors += 1
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until under the size limit (lock held)."""
+        self._count()  # other processes write to the same file
+        excess = self._bytes - int(self.max_bytes * _EVICT_TO)
+        if excess <= 0:
+            return
+        victims: list[tuple[str]] = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.stats.evictions += len(victims)
+        self._count()
+
+    # ── Collapsing concurrent identical requests ──
+
+    def join(self, key: str) -> tuple[Future[LLMResponse], bool]:
+        """The in-flight call for `key`, and whether the caller must make it."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.stats.shared += 1
+                return future, False
+            self.stats.misses += 1
+            future = self._flights[key] = Future()
+            return future, True
+
+    def finish(
+        self,
+        key: str,
+        future: Future[LLMResponse],
+        response: LLMResponse | None,
+        error: BaseException | None = None,
+    ) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+        if response is not None:
+            future.set_result(response)
+        else:
+            future.set_exception(error if isinstance(error, Exception) else _Abandoned())
+
+    def hit(self) -> None:
+        with self._lock:
+            self.stats.hits += 1
+
+
+def _served(response: LLMResponse, started: float) -> LLMResponse:
+    """A private copy of a stored or shared response, as the caller sees it."""
+    copy = response_from_dict(response_to_dict(response))
+    copy.usage = Usage() if copy.usage is not None else None
+    copy.latency = time.perf_counter() - started
+    copy.first_token_latency = None
+    return copy
+
+
+class _Cache:
+    def __init__(self, inner: BaseLLMProvider | AsyncBaseLLMProvider, store: ResponseStore) -> None:
+        self.inner = inner
+        self.store = store
+        self.model: str = getattr(inner, "model", "")
+        self._provider = type(inner).__name__
+
+    def key(self, messages: list[Message], tools: list[dict[str, Any]] | None, system: str) -> str:
+        return request_hash(self.model, messages, tools, system, provider=self._provider, format=_FORMAT)
+
+    def lookup(self, key: str, started: float) -> LLMResponse | None:
+        response = self.store.get(key)
+        if response is None:
+            return None
+        self.store.hit()
+        return _served(response, started)
+
+    def done(self, key: str, future: Future[LLMResponse], response: LLMResponse) -> None:
+        self.store.put(key, self.model, response)
+        self.store.finish(key, future, response)
+
+
+class CachingProvider(BaseLLMProvider):
+    """Answers repeated requests to `inner` from a `ResponseStore`."""
+
+    def __init__(self, inner: BaseLLMProvider, store: ResponseStore) -> None:
+        self._cache = _Cache(inner, store)
+        self.inner = inner
+        self.model = self._cache.model
+
+    @property
+    def store(self) -> ResponseStore:
+        return self._cache.store
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._cache.store.stats
+
+    def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        cache = self._cache
+        started = time.perf_counter()
+        key = cache.key(messages, tools, system)
+        while True:
+            response = cache.lookup(key, started)
+            if response is not None:
+                return response
+            future, leader = cache.store.join(key)
+            if not leader:
+                try:
+                    return _served(future.result(), started)
+                except _Abandoned:
+                    continue
+            try:
+                response = self.inner.chat(messages, tools, system)
+            except BaseException as exc:
+                cache.store.finish(key, future, None, exc)
+                raise
+            cache.done(key, future, response)
+            return response
+
+    def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> Iterator[StreamEvent]:
+        cache = self._cache
+        started = time.perf_counter()
+        key = cache.key(messages, tools, system)
+        while True:
+            response = cache.lookup(key, started)
+            if response is not None:
+                yield from events_from_response(response)
+                return
+            future, leader = cache.store.join(key)
+            if not leader:
+                try:
+                    response = _served(future.result(), started)
+                except _Abandoned:
+                    continue
+                yield from events_from_response(response)
+                return
+            accumulator = StreamAccumulator()
+            try:
+                for event in self.inner.stream_chat(messages, tools, system):
+                    accumulator.feed(event)
+                    yield event
+            except BaseException as exc:
+                cache.store.finish(key, future, None, exc)
+                raise
+            cache.done(key, future, accumulator.response())
+            return
+
+    def get_model_name(self) -> str:
+        return self.inner.get_model_name()
+
+    def history_budget(self) -> int:
+        return self.inner.history_budget()
+
+
+class AsyncCachingProvider(AsyncBaseLLMProvider):
+    """Asyncio counterpart of `CachingProvider`."""
+
+    def __init__(self, inner: AsyncBaseLLMProvider, store: ResponseStore) -> None:
+        self._cache = _Cache(inner, store)
+        self.inner = inner
+        self.model = self._cache.model
+
+    @property
+    def store(self) -> ResponseStore:
+        return self._cache.store
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._cache.store.stats
+
+    async def chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> LLMResponse:
+        cache = self._cache
+        started = time.perf_counter()
+        key = cache.key(messages, tools, system)
+        while True:
+            response = cache.lookup(key, started)
+            if response is not None:
+                return response
+            future, leader = cache.store.join(key)
+            if not leader:
+                try:
+                    return _served(await asyncio.wrap_future(future), started)
+                except _Abandoned:
+                    continue
+            try:
+                response = await self.inner.chat(messages, tools, system)
+            except BaseException as exc:
+                cache.store.finish(key, future, None, exc)
+                raise
+            cache.done(key, future, response)
+            return response
+
+    async def stream_chat(
+        self,
+        messages: list[Message],
+        tools: list[dict[str, Any]] | None = None,
+        system: str = "",
+    ) -> AsyncIterator[StreamEvent]:
+        cache = self._cache
+        started = time.perf_counter()
+        key = cache.key(messages, tools, system)
+        while True:
+            response = cache.lookup(key, started)
+            if response is None:
+                future, leader = cache.store.join(key)
+                if not leader:
+                    try:
+                        response = _served(await asyncio.wrap_future(future), started)
+                    except _Abandoned:
+                        continue
+            if response is not None:
+                for event in events_from_response(response):
+                    yield event
+                return
+            accumulator = StreamAccumulator()
+            try:
+                async for event in self.inner.stream_chat(messages, tools, system):
+                    accumulator.feed(event)
+                    yield event
+            except BaseException as exc:
+                cache.store.finish(key, future, None, exc)
+                raise
+            cache.done(key, future, accumulator.response())
+            return
+
+    def get_model_name(self) -> str:
+        return self.inner.get_model_name()
+
+    def history_budget(self) -> int:
+        return self.inner.history_budget()
@@ -0,0 +1,367 @@
+"""Rate-limit-aware scheduling of LLM requests.
+
+Every provider sends its requests through the `Scheduler` for its API
+(`get_scheduler("anthropic")` etc.), shared by all sessions and threads of
+the process. A scheduler:
+
+- keeps requests and estimated tokens per minute under the configured
+  limits with token buckets (reserving ahead, so waiters queue fairly);
+- retries throttling (429, 529), server errors and connection failures
+  with jittered exponential backoff, honoring `retry-after`; a throttle
+  also pauses every other request to that API until the retry time;
+- adapts how many requests may be in flight AIMD-style: the limit grows
+  by about one per limit's worth of successes and halves (at most once a
+  second) when the API throttles.
+
+Inside `fail_fast()` nothing is retried: a hedged provider uses it for a
+member that has another one to fail over to. Throttles still pause the
+API and shrink the limit.
+
+The SDKs' own retries are turned off so there is one retry policy.
+"""
+
+from __future__ import annotations
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Iterator, TypeVar
+
+from ..config import config
+from ..constants import LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+from ..tracing import span
+from .tokens import estimate_message_tokens, estimate_tokens
+from .types import Message
+
+T = TypeVar("T")
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLE_STATUSES = {429, 503, 529}
+_CONNECTION_ERRORS = {"APIConnectionError", "APITimeoutError", "TransportError", "TimeoutException"}
+_DECREASE_INTERVAL = 1.0  # seconds between multiplicative decreases
+
+_fail_fast: ContextVar[bool] = ContextVar("codeagent_fail_fast", default=False)
+
+
+@contextmanager
+def fail_fast(enabled: bool = True) -> Iterator[None]:
+    """Give up on the first retryable error of requests made in this context."""
+    token = _fail_fast.set(enabled)
+    try:
+        yield
+    finally:
+        _fail_fast.reset(token)
+
+
+def request_tokens(messages: list[Message], system: str = "") -> int:
+    """Estimated input tokens of a request (memoized per message)."""
+    return estimate_tokens(system) + sum(m.wire("tokens", estimate_message_tokens) for m in messages)
+
+
+def status_of(exc: BaseException) -> int | None:
+    """HTTP status of an SDK or httpx error, if it has one."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    return any(cls.__name__ in _CONNECTION_ERRORS for cls in type(exc).__mro__)
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Seconds the server asked us to wait, from `retry-after(-ms)` headers."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """Allows `per_minute` units per minute, with up to a minute's worth in a burst."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` now; return how long to wait before using it."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+
+@dataclass
+class SchedulerStats:
+    requests: int = 0  # attempts sent, retries included
+    retries: int = 0
+    throttled: int = 0  # 429/529/503 responses
+    failures: int = 0  # errors given up on
+    waited: float = 0.0  # seconds spent queued or backing off
+
+
+class Scheduler:
+    """Admission, pacing and retries for one API (see the module docstring)."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.stats = SchedulerStats()
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = []
+
+    # ── Public API ──
+
+    def call(self, fn: Callable[[], T], tokens: int = 0) -> T:
+        """Run `fn` (one API request) under the limits, retrying failures."""
+        self._enter()
+        try:
+            return self._attempts(fn, tokens)
+        finally:
+            self._exit()
+
+    def stream(self, open_stream: Callable[[], Iterable[T]], tokens: int = 0) -> Iterator[T]:
+        """Open a stream (retried like `call`) and yield from it, holding a slot throughout."""
+        self._enter()
+        try:
+            yield from self._attempts(open_stream, tokens)
+        finally:
+            self._exit()
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Asyncio counterpart of `call`."""
+        await self._aenter()
+        try:
+            return await self._aattempts(fn, tokens)
+        finally:
+            self._exit()
+
+    async def astream(self, open_stream: Callable[[], Awaitable[AsyncIterable[T]]], tokens: int = 0) -> AsyncIterator[T]:
+        """Asyncio counterpart of `stream`."""
+        await self._aenter()
+        try:
+            async for item in await self._aattempts(open_stream, tokens):
+                yield item
+        finally:
+            self._exit()
+
+    # ── Retries ──
+
+    def _attempts(self, fn: Callable[[], T], tokens: int) -> T:
+        delay = self._reserve(tokens)
+        attempt = 0
+        while True:
+            self._wait(delay)
+            try:
+                result = fn()
+            except Exception as exc:
+                delay = self._failed(exc, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                continue
+            self._succeeded()
+            return result
+
+    async def _aattempts(self, fn: Callable[[], Awaitable[T]], tokens: int) -> T:
+        delay = self._reserve(tokens)
+        attempt = 0
+        while True:
+            await self._await(delay)
+            try:
+                result = await fn()
+            except Exception as exc:
+                delay = self._failed(exc, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                continue
+            self._succeeded()
+            return result
+
+    def _reserve(self, tokens: int) -> float:
+        """Count one request against the buckets; seconds until it may be sent."""
+        with self._lock:
+            self.stats.requests += 1
+            delay = max(0.0, self._paused_until - time.monotonic())
+            if self._requests is not None:
+                delay = max(delay, self._requests.reserve(1))
+            if tokens and self._tokens is not None:
+                delay = max(delay, self._tokens.reserve(tokens))
+            return delay
+
+    def _failed(self, exc: Exception, attempt: int) -> float | None:
+        """Handle a failed attempt; the delay before retrying, or None to give up."""
+        status = status_of(exc)
+        retryable = status in RETRY_STATUSES or (status is None and is_connection_error(exc))
+        if status in THROTTLE_STATUSES:
+            self._throttled(exc)
+        if not retryable or attempt >= self.max_retries or _fail_fast.get():
+            with self._lock:
+                self.stats.failures += 1
+            return None
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        wait = self._retry_after(exc)
+        if wait is not None:
+            backoff = wait + random.uniform(0, self.base_delay)
+        with self._lock:
+            self.stats.retries += 1
+        return max(backoff, self._reserve(0))
+
+    def _retry_after(self, exc: Exception) -> float | None:
+        """The server's `retry-after`, bounded the same for the retry and the shared pause."""
+        wait = retry_after(exc)
+        return None if wait is None else min(wait, self.max_delay * 4)
+
+    def _throttled(self, exc: Exception) -> None:
+        now = time.monotonic()
+        wait = self._retry_after(exc)
+        with self._lock:
+            self.stats.throttled += 1
+            if wait is not None:
+                self._paused_until = max(self._paused_until, now + wait)
+            if now - self._last_decrease >= _DECREASE_INTERVAL:
+                self._last_decrease = now
+                self.limit = max(1.0, self.limit / 2)
+
+    def _succeeded(self) -> None:
+        with self._lock:
+            if self.limit < self.max_concurrency:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+                self._notify()
+
+    def _wait(self, delay: float) -> None:
+        if delay > 0:
+            with span("llm.wait", "llm", scheduler=self.name):
+                time.sleep(delay)
+            with self._lock:
+                self.stats.waited += delay
+
+    async def _await(self, delay: float) -> None:
+        if delay > 0:
+            with span("llm.wait", "llm", scheduler=self.name):
+                await asyncio.sleep(delay)
+            with self._lock:
+                self.stats.waited += delay
+
+    # ── Concurrency ──
+
+    def _try_enter(self) -> bool:
+        if self.in_flight < max(1, int(self.limit)):
+            self.in_flight += 1
+            return True
+        return False
+
+    def _enter(self) -> None:
+        with self._cond:
+            if self._try_enter():
+                return
+            start = time.monotonic()
+            with span("llm.queue", "llm", scheduler=self.name):
+                while not self._try_enter():
+                    self._cond.wait()
+            self.stats.waited += time.monotonic() - start
+
+    async def _aenter(self) -> None:
+        start: float | None = None
+        while True:
+            with self._lock:
+                if self._try_enter():
+                    if start is not None:
+                        self.stats.waited += time.monotonic() - start
+                    return
+                if start is None:
+                    start = time.monotonic()
+                loop = asyncio.get_running_loop()
+                waiter: asyncio.Future[None] = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            with span("llm.queue", "llm", scheduler=self.name):
+                await waiter
+
+    def _exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._notify()
+
+    def _notify(self) -> None:
+        """Wake everything waiting for a slot (callers hold the lock)."""
+        self._cond.notify_all()
+        for loop, waiter in self._async_waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+        self._async_waiters.clear()
+
+
+def _wake(waiter: asyncio.Future[None]) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_schedulers: dict[str, Scheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name: str) -> Scheduler:
+    """The process-wide scheduler for one API ("anthropic", "openai", "ollama")."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(name)
+        if scheduler is None:
+            scheduler = _schedulers[name] = Scheduler(
+                name,
+                requests_per_minute=config.requests_per_minute,
+                tokens_per_minute=config.tokens_per_minute,
+                max_concurrency=config.llm_concurrency,
+                max_retries=config.llm_retries,
+            )
+        return scheduler
+
+
+def schedulers() -> list[Scheduler]:
+    """Schedulers created so far."""
+    with _schedulers_lock:
+        return list(_schedulers.values())
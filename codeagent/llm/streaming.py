@@ -0,0 +1,193 @@
+"""Helpers shared by the providers' `stream_chat` implementations."""
+
+from __future__ import annotations
+import json
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from .types import (
+    LLMResponse,
+    StopEvent,
+    StreamEvent,
+    TextDelta,
+    ToolCall,
+    ToolCallComplete,
+    ToolCallDelta,
+    ToolCallStart,
+    Usage,
+    UsageEvent,
+)
+
+
+def parse_arguments(raw: str) -> dict[str, Any]:
+    """Decode a tool call's JSON arguments, tolerating junk from the model."""
+    if not raw:
+        return {}
+    try:
+        args = json.loads(raw)
+    except json.JSONDecodeError:
+        return {}
+    return args if isinstance(args, dict) else {}
+
+
+class ToolCallAssembler:
+    """Collect streamed tool-call fragments and emit the matching events."""
+
+    def __init__(self) -> None:
+        self._ids: dict[int, str] = {}
+        self._names: dict[int, str] = {}
+        self._args: dict[int, list[str]] = {}
+
+    def start(self, index: int, id: str, name: str) -> ToolCallStart:
+        self._ids[index] = id
+        self._names[index] = name
+        self._args[index] = []
+        return ToolCallStart(index=index, id=id, name=name)
+
+    def add(self, index: int, fragment: str) -> ToolCallDelta:
+        self._args[index].append(fragment)
+        return ToolCallDelta(index=index, arguments=fragment)
+
+    def has(self, index: int) -> bool:
+        return index in self._args
+
+    def finish(self, index: int) -> ToolCallComplete:
+        raw = "".join(self._args.pop(index))
+        call = ToolCall(
+            id=self._ids.pop(index),
+            name=self._names.pop(index),
+            arguments=parse_arguments(raw),
+        )
+        return ToolCallComplete(index=index, tool_call=call)
+
+    def finish_all(self) -> Iterator[ToolCallComplete]:
+        for index in sorted(self._args):
+            yield self.finish(index)
+
+
+def parse_openai_usage(usage: Any) -> Usage:
+    """Read an OpenAI-style usage block, counting cached prompt tokens separately."""
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    return Usage(
+        input_tokens=prompt - cached,
+        output_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        cache_read_tokens=cached,
+    )
+
+
+class OpenAIChunkTranslator:
+    """Translate OpenAI-style chat completion chunks into stream events.
+
+    Used for OpenAI and for Ollama's OpenAI-compatible endpoint. A tool call
+    is complete once a later one starts or the choice finishes.
+    """
+
+    def __init__(self) -> None:
+        self._tools = ToolCallAssembler()
+        self._current: int | None = None
+        self._stop_reason: str | None = None
+
+    def feed(self, chunk: Any) -> Iterator[StreamEvent]:
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            yield UsageEvent(parse_openai_usage(usage))
+        if not chunk.choices:
+            return
+        choice = chunk.choices[0]
+        delta = choice.delta
+        tools = self._tools
+        if delta is not None:
+            if delta.content:
+                yield TextDelta(delta.content)
+            for tc in delta.tool_calls or []:
+                if not tools.has(tc.index):
+                    if self._current is not None and tools.has(self._current):
+                        yield tools.finish(self._current)
+                    name = tc.function.name if tc.function else ""
+                    yield tools.start(tc.index, tc.id or f"call_{tc.index}", name or "")
+                    self._current = tc.index
+                if tc.function and tc.function.arguments:
+                    yield tools.add(tc.index, tc.function.arguments)
+        if choice.finish_reason:
+            self._stop_reason = choice.finish_reason
+            yield from tools.finish_all()
+
+    def finish(self) -> Iterator[StreamEvent]:
+        yield from self._tools.finish_all()
+        yield StopEvent(self._stop_reason)
+
+
+def iter_openai_events(chunks: Iterable[Any]) -> Iterator[StreamEvent]:
+    """Stream events from a synchronous OpenAI chunk stream."""
+    translator = OpenAIChunkTranslator()
+    for chunk in chunks:
+        yield from translator.feed(chunk)
+    yield from translator.finish()
+
+
+async def aiter_openai_events(chunks: AsyncIterable[Any]) -> AsyncIterator[StreamEvent]:
+    """Stream events from an asynchronous OpenAI chunk stream."""
+    translator = OpenAIChunkTranslator()
+    async for chunk in chunks:
+        for event in translator.feed(chunk):
+            yield event
+    for event in translator.finish():
+        yield event
+
+
+def events_from_response(response: LLMResponse) -> Iterator[StreamEvent]:
+    """Replay a complete response as stream events (for non-streaming providers)."""
+    if response.content:
+        yield TextDelta(response.content)
+    for index, call in enumerate(response.tool_calls):
+        yield ToolCallStart(index=index, id=call.id, name=call.name)
+        yield ToolCallComplete(index=index, tool_call=call)
+    if response.usage is not None:
+        yield UsageEvent(response.usage)
+    yield StopEvent(response.stop_reason)
+
+
+class StreamAccumulator:
+    """Fold stream events back into an `LLMResponse`.
+
+    Create it just before starting the request: latencies are measured from
+    construction.
+    """
+
+    def __init__(self) -> None:
+        self._text: list[str] = []
+        self.tool_calls: list[ToolCall] = []
+        self.usage: Usage | None = None
+        self.stop_reason: str | None = None
+        self._started = time.perf_counter()
+        self._first_event: float | None = None
+
+    def feed(self, event: StreamEvent) -> None:
+        if self._first_event is None:
+            self._first_event = time.perf_counter()
+        if isinstance(event, TextDelta):
+            self._text.append(event.text)
+        elif isinstance(event, ToolCallComplete):
+            self.tool_calls.append(event.tool_call)
+        elif isinstance(event, UsageEvent):
+            self.usage = event.usage
+        elif isinstance(event, StopEvent):
+            self.stop_reason = event.stop_reason
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text)
+
+    def response(self) -> LLMResponse:
+        return LLMResponse(
+            content=self.text,
+            tool_calls=list(self.tool_calls),
+            stop_reason=self.stop_reason,
+            usage=self.usage,
+            latency=time.perf_counter() - self._started,
+            first_token_latency=(
+                None if self._first_event is None else self._first_event - self._started
+            ),
+        )
@@ -0,0 +1,28 @@
+"""Fast offline token estimates.
+
+No tokenizer is bundled, so counts are approximated from character length.
+English prose runs about 4 characters per token and code or JSON closer to
+3, so 3.5 is used: it errs towards overestimating, which is the safe side
+when fitting a context window.
+"""
+
+from __future__ import annotations
+import json
+
+from .types import Message
+
+# Fixed cost of a message envelope (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of `text`."""
+    return (len(text) * 2 + 6) // 7
+
+
+def estimate_message_tokens(message: Message) -> int:
+    """Approximate the tokens a message costs when sent to the model."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.content)
+    for tc in message.tool_calls:
+        tokens += estimate_tokens(tc.name) + estimate_tokens(json.dumps(tc.arguments))
+    return tokens
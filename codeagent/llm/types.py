@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Any
+from typing import Any, Callable, Union
 
 
 @dataclass
@@ -13,6 +13,21 @@ class Message:
     tool_calls: list[ToolCall] = field(default_factory=list)
     tool_call_id: str | None = None
     name: str | None = None  # tool name for tool-result messages
+    # Provider wire-format conversions, memoized by `wire()`
+    _wire: dict[str, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def wire(self, fmt: str, convert: Callable[[Message], Any]) -> Any:
+        """Return this message converted to a provider format, converting once.
+
+        Messages are treated as immutable once created; code that rewrites one
+        (trimming, compaction) builds a new Message with `dataclasses.replace`,
+        which starts with an empty cache.
+        """
+        try:
+            return self._wire[fmt]
+        except KeyError:
+            converted = self._wire[fmt] = convert(self)
+            return converted
 
 
 @dataclass
@@ -32,13 +47,80 @@ class ToolResult:
     is_error: bool = False
 
 
+@dataclass
+class Usage:
+    """Token counts reported by the provider for one request."""
+    input_tokens: int = 0  # uncached input tokens
+    output_tokens: int = 0
+    cache_read_tokens: int = 0  # input tokens served from the prompt cache
+    cache_write_tokens: int = 0  # input tokens written to the prompt cache
+
+    def add(self, other: Usage) -> None:
+        """Accumulate another request's counts into this one."""
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_read_tokens += other.cache_read_tokens
+        self.cache_write_tokens += other.cache_write_tokens
+
+
 @dataclass
 class LLMResponse:
     """Parsed response from an LLM provider."""
     content: str = ""
     tool_calls: list[ToolCall] = field(default_factory=list)
     stop_reason: str | None = None
+    usage: Usage | None = None
+    latency: float | None = None  # seconds from sending the request to the full response
+    first_token_latency: float | None = None  # seconds to the first streamed event
 
     @property
     def has_tool_calls(self) -> bool:
         return len(self.tool_calls) > 0
+
+
+# ── Stream events ────────────────────────────────────────────────────────────
+# `stream_chat` yields these in order. Tool calls are numbered by `index` in
+# the order the model emitted them.
+
+
+@dataclass
+class TextDelta:
+    """A chunk of assistant text."""
+    text: str
+
+
+@dataclass
+class ToolCallStart:
+    """The model started a tool call; arguments follow as deltas."""
+    index: int
+    id: str
+    name: str
+
+
+@dataclass
+class ToolCallDelta:
+    """A fragment of a tool call's JSON arguments."""
+    index: int
+    arguments: str
+
+
+@dataclass
+class ToolCallComplete:
+    """A tool call's arguments are complete; it can be executed."""
+    index: int
+    tool_call: ToolCall
+
+
+@dataclass
+class UsageEvent:
+    """Token usage for the request (may arrive more than once; last wins)."""
+    usage: Usage
+
+
+@dataclass
+class StopEvent:
+    """The response is finished."""
+    stop_reason: str | None = None
+
+
+StreamEvent = Union[TextDelta, ToolCallStart, ToolCallDelta, ToolCallComplete, UsageEvent, StopEvent]
@@ -0,0 +1,142 @@
+"""Detection of a model repeating the same tool calls within a turn.
+
+Small local models in particular tend to issue an identical call round
+after round, each time paying for a full LLM request, until the round
+limit ends the turn. The guard fingerprints every call (tool name,
+canonical arguments, hash of the result) and, within one turn:
+
+- answers a read-only call that already ran with nothing written since
+  with a short note instead of running it again;
+- treats a round in which every call repeats an earlier one with the same
+  result as a repeat round, and ends the turn after `stop_rounds` of them
+  in a row, which also catches cycles such as A, B, A, B.
+
+Any call that writes counts as a state change for read-only calls: it
+stops them being answered from the moment it is submitted, so a read
+queued after a write in the same round always runs. A write that produces
+a new result also clears the fingerprints used to spot repeat rounds.
+Results compacted or trimmed out of the history must be passed to
+`forget`, since the model can no longer see what a note points it to.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+
+from .constants import MAX_TOOL_ROUNDS
+from .llm.types import ToolCall
+from .tools.registry import ToolRegistry
+
+
+def _call_key(call: ToolCall) -> str:
+    return call.name + "\0" + json.dumps(call.arguments, sort_keys=True, default=str)
+
+
+def _result_hash(result: str) -> str:
+    return hashlib.sha256(result.encode("utf-8", "replace")).hexdigest()
+
+
+class LoopGuard:
+    """Per-agent loop detection; call `start_turn` at every user message.
+
+    `stop_rounds` is the number of consecutive repeat rounds that ends a
+    turn (0 never ends one). `rounds_saved` adds up, for every stopped turn,
+    the rounds left before `MAX_TOOL_ROUNDS`: the LLM calls a model stuck in
+    a loop would otherwise have made.
+    """
+
+    def __init__(self, registry: ToolRegistry, stop_rounds: int) -> None:
+        self.registry = registry
+        self.stop_rounds = stop_rounds
+        self.calls_answered = 0
+        self.turns_stopped = 0
+        self.rounds_saved = 0
+        self.start_turn()
+
+    def start_turn(self) -> None:
+        self._seen: dict[str, tuple[int, str]] = {}  # call key -> (round, result hash)
+        self._reads: dict[str, int] = {}  # read-only call key -> round its result is current since
+        self._answered: set[str] = set()  # ids of calls answered from `_seen`
+        self._keys: dict[str, str] = {}  # call id -> call key, for `forget`
+        self._round = 1
+        self._calls = 0
+        self._repeats = 0
+        self._repeat_rounds = 0
+
+    def check(self, call: ToolCall) -> str | None:
+        """A reply standing in for `call` when it need not run, else None."""
+        if not self.registry.is_read_only(call.name, call.arguments):
+            # Calls after this one in the batch may see what it writes
+            self._reads.clear()
+            return None
+        previous = self._reads.get(_call_key(call))
+        if previous is None:
+            return None
+        self._answered.add(call.id)
+        self.calls_answered += 1
+        return (
+            f"Already done: this exact {call.name} call ran in round {previous} of this turn "
+            "and nothing has been written since, so its result is unchanged. "
+            "Use that result instead of repeating the call."
+        )
+
+    def record(self, call: ToolCall, result: str) -> None:
+        """Note the result of a call of the current round."""
+        self._calls += 1
+        if call.id in self._answered:
+            self._answered.discard(call.id)
+            self._repeats += 1
+            return
+        key = _call_key(call)
+        self._keys[call.id] = key
+        digest = _result_hash(result)
+        # Calls are recorded in submission order, so this leaves exactly the
+        # reads submitted after the round's last write
+        read_only = self.registry.is_read_only(call.name, call.arguments)
+        if read_only:
+            self._reads.setdefault(key, self._round)
+        else:
+            self._reads.clear()
+        previous = self._seen.get(key)
+        if previous is not None and previous[1] == digest:
+            self._repeats += 1
+            return
+        if not read_only:
+            self._seen.clear()  # the call may have changed what earlier calls saw
+        self._seen[key] = (self._round, digest)
+
+    def forget(self, call_ids: set[str] | None = None) -> None:
+        """Stop answering from the results of `call_ids` (None: of every call so far)."""
+        if call_ids is None:
+            self._reads.clear()
+            self._seen.clear()
+            self._keys.clear()
+            return
+        for call_id in call_ids:
+            key = self._keys.pop(call_id, None)
+            if key is not None:
+                self._reads.pop(key, None)
+                self._seen.pop(key, None)
+
+    def end_round(self) -> bool:
+        """Close the current round; True when the turn should stop."""
+        repeated = self._calls > 0 and self._repeats == self._calls
+        self._repeat_rounds = self._repeat_rounds + 1 if repeated else 0
+        self._round += 1
+        self._calls = self._repeats = 0
+        if self.stop_rounds <= 0 or self._repeat_rounds < self.stop_rounds:
+            return False
+        self.turns_stopped += 1
+        self.rounds_saved += max(0, MAX_TOOL_ROUNDS - self._round + 1)
+        return True
+
+    @property
+    def repeat_rounds(self) -> int:
+        return self._repeat_rounds
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "calls_answered": self.calls_answered,
+            "turns_stopped": self.turns_stopped,
+            "rounds_saved": self.rounds_saved,
+        }
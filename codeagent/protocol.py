@@ -0,0 +1,131 @@
+"""Framed JSON protocol between `codeagent serve` and `codeagent --attach`.
+
+Every frame is a 4-byte big-endian length followed by that many bytes of
+UTF-8 JSON (one object). The client sends a request frame and the server
+answers with a stream of event frames ending in a "done" or "error" event.
+
+Requests::
+
+    {"op": "send", "session": "id", "message": "...", "provider": "claude", "cwd": "/path",
+     "ephemeral": false}
+    {"op": "close", "session": "id"}
+
+An "ephemeral" session is not saved, and lives until it is closed or the
+connection that created it ends.
+    {"op": "sessions"}
+    {"op": "ping"}
+
+Events::
+
+    {"event": "text", "text": "..."}
+    {"event": "tool_call", "name": "...", "arguments": {...}}
+    {"event": "tool_result", "name": "...", "content": "...", "duration_ms": 1.2}
+    {"event": "done", "text": "..."}          # final frame on success
+    {"event": "error", "message": "..."}      # final frame on failure
+
+This module only uses the standard library so the client starts quickly.
+"""
+
+from __future__ import annotations
+import asyncio
+import json
+import os
+import socket
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    """The peer sent something that is not a valid frame."""
+
+
+def default_socket_path() -> Path:
+    """$CODEAGENT_SOCKET, or a per-user socket in the temp directory."""
+    env = os.getenv("CODEAGENT_SOCKET")
+    if env:
+        return Path(env).expanduser()
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return Path(tempfile.gettempdir()) / f"codeagent-{uid}.sock"
+
+
+def encode_frame(obj: dict[str, Any]) -> bytes:
+    payload = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(payload)) + payload
+
+
+def _decode(payload: bytes) -> dict[str, Any]:
+    try:
+        obj = json.loads(payload)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ProtocolError(f"Invalid frame: {e}") from e
+    if not isinstance(obj, dict):
+        raise ProtocolError("Frame must be a JSON object")
+    return obj
+
+
+def _check_length(length: int) -> None:
+    if length > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Frame too large ({length} bytes)")
+
+
+# ── Blocking sockets (client) ────────────────────────────────────────────────
+
+
+def send_frame(sock: socket.socket, obj: dict[str, Any]) -> None:
+    sock.sendall(encode_frame(obj))
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    chunks: list[bytes] = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            if chunks:
+                raise ProtocolError("Connection closed mid-frame")
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock: socket.socket) -> dict[str, Any] | None:
+    """Read one frame; None when the connection was closed cleanly."""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (length,) = _HEADER.unpack(header)
+    _check_length(length)
+    payload = _recv_exact(sock, length)
+    if payload is None:
+        raise ProtocolError("Connection closed mid-frame")
+    return _decode(payload)
+
+
+# ── asyncio streams (server) ─────────────────────────────────────────────────
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict[str, Any] | None:
+    """Read one frame; None when the connection was closed cleanly."""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ProtocolError("Connection closed mid-frame") from e
+        return None
+    (length,) = _HEADER.unpack(header)
+    _check_length(length)
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        raise ProtocolError("Connection closed mid-frame") from e
+    return _decode(payload)
+
+
+def write_frame(writer: asyncio.StreamWriter, obj: dict[str, Any]) -> None:
+    """Queue a frame; await `writer.drain()` to apply backpressure."""
+    writer.write(encode_frame(obj))
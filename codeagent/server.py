@@ -0,0 +1,250 @@
+"""`codeagent serve`: a long-lived daemon hosting agent sessions.
+
+Starting CodeAgent pays for interpreter startup, .env discovery, SDK
+imports and a fresh HTTPS connection. The daemon pays that once. It keeps
+providers (and their connection pools), the tool registry and caches warm,
+and serves many concurrent sessions over a Unix domain socket using the
+framed JSON protocol in `codeagent.protocol`. Named sessions are saved
+as ``daemon-<id>`` and picked up again after a daemon restart; ephemeral
+ones are not saved and are dropped when the connection that created them
+ends. Named sessions left idle for `config.daemon_idle` seconds, or beyond
+the `config.daemon_sessions` most recently used, are dropped from memory
+too (a saved one is reloaded by its next message).
+
+While a message is being answered the connection is still read, so a
+client that disconnects cancels its turn instead of leaving it running.
+"""
+
+from __future__ import annotations
+import asyncio
+import contextlib
+import os
+import signal
+import socket
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import click
+
+from .async_agent import AsyncAgent
+from .config import config
+from .llm import get_async_provider
+from .llm.base import AsyncBaseLLMProvider
+from .llm.pool import release_loop
+from .protocol import ProtocolError, default_socket_path, read_frame, write_frame
+from .sessions import SessionStore
+from .ui import console, print_error
+from .ui.panels import print_info
+
+
+class _Session:
+    def __init__(self, agent: AsyncAgent, ephemeral: bool) -> None:
+        self.agent = agent
+        self.ephemeral = ephemeral
+        self.lock = asyncio.Lock()  # one message at a time per session
+        self.last_used = time.monotonic()
+
+
+def _client_gone(next_frame: asyncio.Future[dict[str, Any] | None]) -> bool:
+    """True once reading the client's next request found the connection closed."""
+    if not next_frame.done():
+        return False
+    return next_frame.cancelled() or next_frame.exception() is not None or next_frame.result() is None
+
+
+class AgentServer:
+    """Hosts `AsyncAgent` sessions, identified by id, on a Unix socket."""
+
+    def __init__(self, socket_path: Path) -> None:
+        self.socket_path = socket_path
+        self.sessions: OrderedDict[str, _Session] = OrderedDict()  # least recently used first
+        self._providers: dict[str, AsyncBaseLLMProvider] = {}
+        self._store = SessionStore() if config.save_sessions else None
+        self._server: asyncio.AbstractServer | None = None
+
+    async def serve_forever(self) -> None:
+        _remove_stale_socket(self.socket_path)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle_client, path=str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self._server.close)
+        print_info(f"CodeAgent daemon listening on {self.socket_path}")
+        reaper = asyncio.ensure_future(self._reap_idle()) if config.daemon_idle else None
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass  # SIGTERM closed the server
+        finally:
+            if reaper is not None:
+                reaper.cancel()
+            with contextlib.suppress(FileNotFoundError):
+                self.socket_path.unlink()
+            self.sessions.clear()
+            self._providers.clear()
+            await release_loop()
+
+    def evict(self) -> None:
+        """Drop named sessions that are idle too long or beyond the cap, least recently used first.
+
+        Sessions answering a message are kept; ephemeral ones belong to
+        their connection.
+        """
+        named = [(sid, s) for sid, s in self.sessions.items() if not s.ephemeral and not s.lock.locked()]
+        excess = sum(not s.ephemeral for s in self.sessions.values()) - config.daemon_sessions
+        idle_before = time.monotonic() - config.daemon_idle
+        for session_id, session in named:
+            if excess > 0:
+                excess -= 1
+            elif not (config.daemon_idle and session.last_used < idle_before):
+                continue
+            del self.sessions[session_id]
+
+    async def _reap_idle(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, config.daemon_idle / 2))
+            self.evict()
+
+    def _provider(self, name: str) -> AsyncBaseLLMProvider:
+        if name not in self._providers:
+            self._providers[name] = get_async_provider(name)
+        return self._providers[name]
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        owned: set[str] = set()  # ephemeral sessions created on this connection
+        next_frame = asyncio.ensure_future(read_frame(reader))
+        try:
+            while True:
+                request = await next_frame
+                if request is None:
+                    break
+                # Read ahead while the request runs, to notice the client leaving
+                next_frame = asyncio.ensure_future(read_frame(reader))
+                await self._dispatch(request, writer, owned, next_frame)
+                await writer.drain()
+        except ProtocolError as e:
+            write_frame(writer, {"event": "error", "message": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            next_frame.cancel()
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _dispatch(
+        self,
+        request: dict[str, Any],
+        writer: asyncio.StreamWriter,
+        owned: set[str],
+        next_frame: asyncio.Future[dict[str, Any] | None],
+    ) -> None:
+        op = request.get("op")
+        if op == "send":
+            await self._send(request, writer, owned, next_frame)
+        elif op == "close":
+            session_id = str(request.get("session"))
+            self.sessions.pop(session_id, None)
+            owned.discard(session_id)
+            write_frame(writer, {"event": "done", "text": ""})
+        elif op == "sessions":
+            write_frame(writer, {"event": "done", "sessions": sorted(self.sessions)})
+        elif op == "ping":
+            write_frame(writer, {"event": "done", "text": "pong"})
+        else:
+            write_frame(writer, {"event": "error", "message": f"Unknown op: {op!r}"})
+
+    async def _send(
+        self,
+        request: dict[str, Any],
+        writer: asyncio.StreamWriter,
+        owned: set[str],
+        next_frame: asyncio.Future[dict[str, Any] | None],
+    ) -> None:
+        session_id = str(request.get("session") or "")
+        message = request.get("message")
+        if not session_id or not isinstance(message, str):
+            write_frame(writer, {"event": "error", "message": "send needs 'session' and 'message'"})
+            return
+
+        session = self.sessions.get(session_id)
+        if session is None:
+            provider_name = request.get("provider") or config.default_provider
+            error = config.validate_provider(provider_name)
+            if error:
+                write_frame(writer, {"event": "error", "message": error})
+                return
+            cwd = request.get("cwd")
+            if cwd and not Path(cwd).is_dir():
+                write_frame(writer, {"event": "error", "message": f"Working directory not found: {cwd}"})
+                return
+            log = None
+            ephemeral = bool(request.get("ephemeral"))
+            if ephemeral:
+                owned.add(session_id)
+            elif self._store is not None:
+                log = self._store.create(f"daemon-{session_id}")
+            session = _Session(AsyncAgent(self._provider(provider_name), workdir=cwd, session=log), ephemeral)
+            self.sessions[session_id] = session
+        self.sessions.move_to_end(session_id)
+
+        def on_event(event: dict[str, Any]) -> None:
+            frame = dict(event)
+            frame["event"] = frame.pop("type")
+            write_frame(writer, frame)
+
+        async with session.lock:
+            self.evict()  # not this session: it is locked
+            session.agent.on_event = on_event
+            turn = asyncio.ensure_future(session.agent.send(message))
+            try:
+                await asyncio.wait({turn, next_frame}, return_when=asyncio.FIRST_COMPLETED)
+                if not turn.done() and _client_gone(next_frame):
+                    turn.cancel()  # nobody is left to answer
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await turn
+                    return
+                # A pipelined request waits for this one to finish
+                text = await turn
+                write_frame(writer, {"event": "done", "text": text})
+            except Exception as e:
+                write_frame(writer, {"event": "error", "message": f"{type(e).__name__}: {e}"})
+            finally:
+                turn.cancel()  # only does anything when this task itself was cancelled
+                session.agent.on_event = None
+                session.last_used = time.monotonic()
+
+
+def _remove_stale_socket(path: Path) -> None:
+    """Delete a socket file left by a daemon that is no longer running."""
+    if not path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(path))
+    except OSError:
+        path.unlink()
+    else:
+        raise SystemExit(f"Another CodeAgent daemon is already listening on {path}")
+    finally:
+        probe.close()
+
+
+@click.command()
+@click.option("--socket", "socket_path", type=click.Path(path_type=Path), default=None,
+              help="Unix socket to listen on (default: $CODEAGENT_SOCKET or a per-user temp path).")
+def serve_command(socket_path: Path | None) -> None:
+    """Run the CodeAgent daemon for `codeagent --attach` clients."""
+    if not hasattr(socket, "AF_UNIX"):
+        print_error("The daemon needs Unix domain sockets, which this platform lacks.")
+        raise SystemExit(1)
+    server = AgentServer(socket_path or default_socket_path())
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        console.print("\n[info]Daemon stopped.[/info]")
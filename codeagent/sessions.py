@@ -0,0 +1,287 @@
+"""On-disk session store with fast resume.
+
+Layout under ``$CODEAGENT_HOME/sessions`` (default ``~/.codeagent``)::
+
+    <id>/log      append-only records: 4-byte big-endian length + JSON message
+    <id>/index    one fixed-size entry per record: offset, length, tokens, role
+    blobs/ab/cd…  large message contents, content-addressed (shared, deduplicated)
+
+Messages are written as they are added to the history. Resuming reads the
+index backwards only until the model's history budget is filled, then
+reads that tail of the log in one pass; older records and their blobs are
+never touched.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import struct
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .config import config
+from .llm.types import Message, ToolCall
+
+# Contents at least this long go to the blob area instead of the log
+BLOB_THRESHOLD_CHARS = 4096
+
+_LENGTH = struct.Struct(">I")
+_ENTRY = struct.Struct(">QIIB")  # log offset, record length, est. tokens, role
+_ROLES = ["user", "assistant", "tool", "system"]
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+_INDEX_CHUNK_ENTRIES = 4096
+_SAFE_ID = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def new_session_id() -> str:
+    """A sortable, unique id like ``20260118-142501-3fa2c1``."""
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+@dataclass
+class SessionInfo:
+    id: str
+    messages: int
+    size_bytes: int
+    modified: float
+    preview: str
+
+
+class SessionStore:
+    """Creates, lists and opens persisted sessions."""
+
+    def __init__(self, root: Path | None = None) -> None:
+        self.root = root or config.data_dir / "sessions"
+        self.blob_dir = self.root / "blobs"
+
+    def path(self, session_id: str) -> Path:
+        return self.root / _SAFE_ID.sub("_", session_id)
+
+    def exists(self, session_id: str) -> bool:
+        return (self.path(session_id) / "index").exists()
+
+    def create(self, session_id: str | None = None, overwrite: bool = False) -> SessionLog:
+        """Start a new session log (replacing an existing one if `overwrite`)."""
+        log = SessionLog(self, session_id or new_session_id())
+        if overwrite:
+            log.truncate()
+        return log
+
+    def open(self, session_id: str) -> SessionLog:
+        """Open an existing session for reading and further appends."""
+        if not self.exists(session_id):
+            raise FileNotFoundError(f"No saved session '{session_id}'")
+        return SessionLog(self, session_id)
+
+    def list(self) -> list[SessionInfo]:
+        """All sessions, most recently modified first."""
+        infos: list[SessionInfo] = []
+        if not self.root.is_dir():
+            return infos
+        for path in self.root.iterdir():
+            index = path / "index"
+            if path.name == "blobs":
+                continue
+            try:
+                log_stat = (path / "log").stat()
+                index_size = index.stat().st_size
+            except FileNotFoundError:
+                continue  # not a session, or one left half-written
+            log = SessionLog(self, path.name)
+            infos.append(SessionInfo(
+                id=path.name,
+                messages=index_size // _ENTRY.size,
+                size_bytes=log_stat.st_size,
+                modified=log_stat.st_mtime,
+                preview=log.first_user_message()[:60],
+            ))
+        infos.sort(key=lambda info: info.modified, reverse=True)
+        return infos
+
+    # ── Blobs ────────────────────────────────────────────────────────────────
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest[2:]
+
+    def put_blob(self, text: str) -> str:
+        data = text.encode("utf-8", "surrogatepass")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp{os.getpid()}")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        return digest
+
+    def find_blob(self, prefix: str) -> str | None:
+        """The blob whose digest starts with `prefix` (at least 8 hex digits), if any."""
+        prefix = prefix.lower()
+        if len(prefix) < 8 or not all(c in "0123456789abcdef" for c in prefix):
+            return None
+        for path in (self.blob_dir / prefix[:2]).glob(prefix[2:] + "*"):
+            if "." not in path.name:  # not a write in progress
+                return self.get_blob(prefix[:2] + path.name)
+        return None
+
+    def get_blob(self, digest: str) -> str:
+        try:
+            return self._blob_path(digest).read_bytes().decode("utf-8", "surrogatepass")
+        except FileNotFoundError:
+            return f"[missing stored content {digest[:12]}]"
+
+
+class SessionLog:
+    """One session's append-only message log and its index."""
+
+    def __init__(self, store: SessionStore, session_id: str) -> None:
+        self.store = store
+        self.id = session_id
+        self.dir = store.path(session_id)
+        self._log_path = self.dir / "log"
+        self._index_path = self.dir / "index"
+        self._repaired = False
+        self.error: str | None = None  # set if a write failed; saving then stops
+
+    def append(self, message: Message, tokens: int) -> None:
+        """Persist one message (called as it is added to the history)."""
+        if self.error is not None:
+            return
+        try:
+            self._write(message, tokens)
+        except OSError as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+    def truncate(self) -> None:
+        """Empty the session, keeping its id."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._log_path.write_bytes(b"")
+        self._index_path.write_bytes(b"")
+        self._repaired = True
+
+    def load_tail(self, budget: int) -> list[Message]:
+        """The newest whole turns whose estimated tokens fit in `budget`."""
+        entries = self._read_tail_entries(budget)
+        if not entries:
+            return []
+        start = entries[0][0]
+        with self._log_path.open("rb") as log:
+            log.seek(start)
+            data = log.read(entries[-1][0] + _LENGTH.size + entries[-1][1] - start)
+        messages = []
+        for offset, length, _, _ in entries:
+            begin = offset - start + _LENGTH.size
+            messages.append(self._decode(data[begin:begin + length]))
+        return messages
+
+    def first_user_message(self) -> str:
+        try:
+            with self._log_path.open("rb") as log:
+                for _ in range(8):
+                    header = log.read(_LENGTH.size)
+                    if len(header) < _LENGTH.size:
+                        break
+                    record = json.loads(log.read(_LENGTH.unpack(header)[0]))
+                    if record.get("role") == "user":
+                        content = self.store.get_blob(record["blob"]) if "blob" in record else record.get("content", "")
+                        return str(content).replace("\n", " ")
+        except (OSError, ValueError):
+            pass
+        return ""
+
+    # ── Internals ────────────────────────────────────────────────────────────
+
+    def _write(self, message: Message, tokens: int) -> None:
+        if not self._repaired:
+            self._repair()
+        record = self._encode(message)
+        with self._log_path.open("ab") as log:
+            offset = log.tell()
+            log.write(_LENGTH.pack(len(record)) + record)
+        entry = _ENTRY.pack(offset, len(record), min(tokens, 0xFFFFFFFF), _ROLE_CODES.get(message.role, 3))
+        # The index is written after the log, so an entry never points at a torn record
+        with self._index_path.open("ab") as index:
+            index.write(entry)
+
+    def _repair(self) -> None:
+        """Create the files, or cut off a torn write left by a crash."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._log_path.touch()
+        self._index_path.touch()
+        index_size = self._index_path.stat().st_size
+        whole = index_size - index_size % _ENTRY.size
+        log_end = 0
+        if whole:
+            with self._index_path.open("rb") as index:
+                index.seek(whole - _ENTRY.size)
+                offset, length, _, _ = _ENTRY.unpack(index.read(_ENTRY.size))
+                log_end = offset + _LENGTH.size + length
+        if whole != index_size:
+            os.truncate(self._index_path, whole)
+        if self._log_path.stat().st_size != log_end:
+            os.truncate(self._log_path, log_end)
+        self._repaired = True
+
+    def _read_tail_entries(self, budget: int) -> list[tuple[int, int, int, int]]:
+        """Read index entries backwards until `budget` tokens, ending on a turn start."""
+        try:
+            size = self._index_path.stat().st_size
+        except FileNotFoundError:
+            return []
+        count = size // _ENTRY.size
+        tail: list[tuple[int, int, int, int]] = []
+        turn_start = 0  # entries in `tail` up to the oldest user message that fits
+        total = 0
+        with self._index_path.open("rb") as index:
+            end = count
+            while end > 0:
+                begin = max(0, end - _INDEX_CHUNK_ENTRIES)
+                index.seek(begin * _ENTRY.size)
+                chunk = index.read((end - begin) * _ENTRY.size)
+                for i in range(end - begin - 1, -1, -1):
+                    entry = _ENTRY.unpack_from(chunk, i * _ENTRY.size)
+                    total += entry[2]
+                    if total > budget and turn_start:
+                        tail = tail[:turn_start]
+                        tail.reverse()
+                        return tail
+                    tail.append(entry)
+                    if _ROLES[entry[3]] == "user":
+                        turn_start = len(tail)
+                end = begin
+        tail = tail[:turn_start] if turn_start else tail
+        tail.reverse()
+        return tail
+
+    def _encode(self, message: Message) -> bytes:
+        record: dict[str, Any] = {"role": message.role}
+        if len(message.content) >= BLOB_THRESHOLD_CHARS:
+            record["blob"] = self.store.put_blob(message.content)
+        else:
+            record["content"] = message.content
+        if message.tool_calls:
+            record["tool_calls"] = [
+                {"id": tc.id, "name": tc.name, "arguments": tc.arguments}
+                for tc in message.tool_calls
+            ]
+        if message.tool_call_id is not None:
+            record["tool_call_id"] = message.tool_call_id
+        if message.name is not None:
+            record["name"] = message.name
+        return json.dumps(record, separators=(",", ":")).encode("utf-8")
+
+    def _decode(self, data: bytes) -> Message:
+        record = json.loads(data)
+        content = self.store.get_blob(record["blob"]) if "blob" in record else record.get("content", "")
+        return Message(
+            role=record["role"],
+            content=content,
+            tool_calls=[ToolCall(**tc) for tc in record.get("tool_calls", [])],
+            tool_call_id=record.get("tool_call_id"),
+            name=record.get("name"),
+        )
@@ -1,5 +1,6 @@
 """Agent tools for filesystem, search, terminal, and git."""
 
-from .registry import ToolRegistry, registry
+from .cache import ResultCache
+from .registry import SchemaSnapshot, ToolRegistry, registry
 
-__all__ = ["ToolRegistry", "registry"]
+__all__ = ["ResultCache", "SchemaSnapshot", "ToolRegistry", "registry"]
@@ -1,13 +1,19 @@
 """Abstract base class for tools."""
 
 from __future__ import annotations
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any
+from pathlib import Path
+from typing import Any, Hashable
 
 
 class BaseTool(ABC):
     """Every tool must define its name, description, schema, and execute method."""
 
+    # Read-only tools never change files or repo state, so the agent may run
+    # several of them concurrently within one round.
+    read_only: bool = False
+
     @property
     @abstractmethod
     def name(self) -> str:
@@ -29,6 +35,36 @@ class BaseTool(ABC):
         """Run the tool and return a string result."""
         ...
 
+    async def aexecute(self, **kwargs: Any) -> str:
+        """Run the tool from asyncio code.
+
+        Tools do blocking file and subprocess I/O, so by default `execute` is
+        offloaded to the event loop's thread pool. Natively async tools can
+        override this.
+        """
+        return await asyncio.to_thread(self.execute, **kwargs)
+
+    def is_read_only(self, arguments: dict[str, Any]) -> bool:
+        """Whether this particular call leaves the filesystem untouched."""
+        return self.read_only
+
+    def cache_key(self, arguments: dict[str, Any], generation: int) -> Hashable | None:
+        """Validity token for reusing the result of a read-only call.
+
+        A cached result is returned while the token is unchanged; return
+        None (the default) to always run the tool. `generation` changes after
+        every write made through the tools.
+        """
+        return None
+
+    def present(self, arguments: dict[str, Any], result: str) -> str:
+        """Adapt a result, fresh or cached, for the session that asked for it."""
+        return result
+
+    def written_paths(self, arguments: dict[str, Any]) -> list[Path] | None:
+        """Files a call that is not read-only may change (None: anything)."""
+        return None
+
     def to_schema(self) -> dict[str, Any]:
         """Return the tool definition for the LLM."""
         return {
@@ -0,0 +1,107 @@
+"""Result cache for read-only tool calls."""
+
+from __future__ import annotations
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Hashable, Iterable
+
+from ..constants import TOOL_CACHE_BYTES
+
+
+@dataclass(frozen=True)
+class FileToken:
+    """Identifies one version of a file's contents."""
+    path: Path
+    mtime_ns: int
+    size: int
+    inode: int
+
+
+def file_token(path: Path) -> FileToken | None:
+    """The current `FileToken` of `path`, or None if it cannot be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return FileToken(path, st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class ResultCache:
+    """LRU cache of tool output, bounded by size.
+
+    Entries are keyed on the tool name, its normalized arguments and a
+    validity token from `BaseTool.cache_key`, such as the `FileToken` of the
+    file read. Tools whose output depends on the whole tree put `generation`
+    in their token; it is bumped by every write, so those entries simply
+    stop matching and age out of the LRU.
+    """
+
+    def __init__(self, max_bytes: int = TOOL_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (result, file it depends on, size of the result in UTF-8 bytes)
+        self._items: OrderedDict[tuple[str, str, Hashable], tuple[str, Path | None, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    @staticmethod
+    def key(name: str, arguments: dict[str, Any], token: Hashable) -> tuple[str, str, Hashable]:
+        return (name, json.dumps(arguments, sort_keys=True, default=str), token)
+
+    def get(self, key: tuple[str, str, Hashable]) -> str | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: tuple[str, str, Hashable], result: str) -> None:
+        size = len(result.encode("utf-8", "surrogatepass"))
+        if size > self.max_bytes:
+            return
+        token = key[2]
+        path = token.path if isinstance(token, FileToken) else None
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._items[key] = (result, path, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def invalidate(self, paths: Iterable[Path] | None = None) -> None:
+        """Forget results a write may have changed.
+
+        Tree-wide entries go stale through the generation bump. Entries for
+        the given files are dropped too, so an edit within the filesystem's
+        mtime granularity is never missed; `paths=None` drops everything.
+        """
+        with self._lock:
+            self.generation += 1
+            if paths is None:
+                self._items.clear()
+                self._bytes = 0
+                return
+            changed = set(paths)
+            if not changed:
+                return
+            for key in [k for k, (_, path, _) in self._items.items() if path in changed]:
+                self._bytes -= self._items.pop(key)[2]
@@ -2,21 +2,36 @@
 
 from __future__ import annotations
 import fnmatch
+import os
 import re
 from pathlib import Path
-from typing import Any
+from typing import Any, Hashable, Iterator
 
 from .base import BaseTool
+from .context import resolve_path
 
-# Skip these directories when searching
+# Skip these directories when searching (names or globs)
 SKIP_DIRS = {
     ".git", "node_modules", "__pycache__", ".venv", "venv",
     ".next", "dist", "build", ".eggs", "*.egg-info",
 }
+_SKIP_NAMES = frozenset(name for name in SKIP_DIRS if not any(c in name for c in "*?["))
+_SKIP_GLOBS = re.compile("|".join(fnmatch.translate(name) for name in SKIP_DIRS - _SKIP_NAMES) or "(?!)")
+
+# Binary files, skipped by extension
+BINARY_SUFFIXES = frozenset({
+    ".png", ".jpg", ".gif", ".ico", ".woff", ".woff2", ".ttf", ".zip",
+    ".tar", ".gz", ".exe", ".dll", ".so", ".dylib",
+})
+
+
+def _skip_dir(name: str) -> bool:
+    return name in _SKIP_NAMES or _SKIP_GLOBS.match(name) is not None
 
 
 class CodeSearchTool(BaseTool):
     name = "code_search"
+    read_only = True
     description = (
         "Search for a text pattern (regex supported) across files in a directory. "
         "Returns matching lines with file paths and line numbers. "
@@ -45,6 +60,9 @@ class CodeSearchTool(BaseTool):
         "required": ["pattern"],
     }
 
+    def cache_key(self, arguments: dict[str, Any], generation: int) -> Hashable | None:
+        return (str(resolve_path(arguments.get("path", "."))), generation)
+
     def execute(
         self,
         pattern: str,
@@ -53,7 +71,7 @@ class CodeSearchTool(BaseTool):
         case_insensitive: bool = False,
         **_: Any,
     ) -> str:
-        search_path = Path(path).expanduser().resolve()
+        search_path = resolve_path(path)
         if not search_path.exists():
             return f"Error: Path not found: {search_path}"
 
@@ -66,19 +84,20 @@ class CodeSearchTool(BaseTool):
         matches: list[str] = []
         max_matches = 100
 
+        base = search_path if search_path.is_dir() else search_path.parent
         for file_path in self._walk_files(search_path, glob):
-            if len(matches) >= max_matches:
-                break
             try:
                 text = file_path.read_text(encoding="utf-8", errors="replace")
-                for i, line in enumerate(text.splitlines(), 1):
-                    if regex.search(line):
-                        rel = file_path.relative_to(search_path)
-                        matches.append(f"{rel}:{i}: {line.rstrip()}")
-                        if len(matches) >= max_matches:
-                            break
             except (PermissionError, OSError):
                 continue
+            for i, line in enumerate(text.splitlines(), 1):
+                if regex.search(line):
+                    rel = file_path.relative_to(base)
+                    matches.append(f"{rel}:{i}: {line.rstrip()}")
+                    if len(matches) >= max_matches:
+                        break
+            if len(matches) >= max_matches:
+                break  # stops the walk too
 
         if not matches:
             return f"No matches found for pattern '{pattern}' in {search_path}"
@@ -89,16 +108,40 @@ class CodeSearchTool(BaseTool):
         return header + "\n\n" + "\n".join(matches)
 
     @staticmethod
-    def _walk_files(root: Path, glob_pattern: str) -> list[Path]:
-        files: list[Path] = []
-        for item in root.rglob("*"):
-            if any(part in SKIP_DIRS for part in item.parts):
+    def _walk_files(root: Path, glob_pattern: str) -> Iterator[Path]:
+        """Yield searchable files under `root`, depth first in name order.
+
+        A generator, so searching starts on the first file and the walk ends
+        as soon as the caller stops. Skipped directories are pruned before
+        being entered, and `os.scandir` entries answer the file/directory
+        checks without another stat call. Symlinked directories are not
+        followed, which also keeps the walk out of symlink loops.
+        """
+        if root.is_file():
+            yield root
+            return
+        stack = [str(root)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError:
                 continue
-            if item.is_file():
-                if glob_pattern and not fnmatch.fnmatch(item.name, glob_pattern):
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not _skip_dir(entry.name):
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                name = entry.name
+                if glob_pattern and not fnmatch.fnmatch(name, glob_pattern):
                     continue
-                # Skip binary files by extension
-                if item.suffix in (".png", ".jpg", ".gif", ".ico", ".woff", ".woff2", ".ttf", ".zip", ".tar", ".gz", ".exe", ".dll", ".so", ".dylib"):
+                if os.path.splitext(name)[1] in BINARY_SUFFIXES:
                     continue
-                files.append(item)
-        return files
+                yield Path(entry.path)
+            stack.extend(reversed(subdirs))
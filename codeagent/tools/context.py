@@ -0,0 +1,94 @@
+"""Per-session state that tools run against."""
+
+from __future__ import annotations
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from ..sessions import SessionStore
+
+
+@dataclass
+class FileRead:
+    """What `file_read` last returned for one (path, offset, limit).
+
+    `chain` holds the numbers of the reads the model needs to reconstruct
+    `lines`: the last full read and every diff since.
+    """
+    number: int
+    chain: tuple[int, ...]
+    lines: list[str]
+
+
+@dataclass
+class ToolContext:
+    """State of one agent session as seen by its tools.
+
+    `workdir` is where relative paths resolve and commands run; None means
+    the process working directory. Several sessions with different working
+    directories can then run in one process (e.g. in batch mode).
+
+    `file_reads` remembers file contents already shown to the model, so a
+    re-read can be answered with a diff. Call `forget_reads` whenever those
+    earlier results leave the history (trimming, compaction).
+
+    `blobs` is the store of the session being saved, if any; compacted
+    results are kept there too, so they can be expanded after the
+    in-memory copy is gone.
+    """
+    workdir: Path | None = None
+    blobs: SessionStore | None = field(default=None, repr=False)
+    file_reads: dict[tuple[Path, int, int], FileRead] = field(default_factory=dict, repr=False)
+    reads: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def live_reads(self) -> set[int]:
+        """Numbers of the reads that later diffs are based on."""
+        with self.lock:
+            return {n for read in self.file_reads.values() for n in read.chain}
+
+    def forget_reads(self, numbers: set[int] | None = None) -> None:
+        """Forget reads depending on any of `numbers` (None: all of them)."""
+        with self.lock:
+            if numbers is None:
+                self.file_reads.clear()
+                return
+            for key in [k for k, read in self.file_reads.items() if numbers.intersection(read.chain)]:
+                del self.file_reads[key]
+
+
+_current: ContextVar[ToolContext | None] = ContextVar("codeagent_tool_context", default=None)
+
+
+def current_context() -> ToolContext | None:
+    """The context of the session whose tools are running, if any."""
+    return _current.get()
+
+
+@contextmanager
+def use_context(context: ToolContext) -> Iterator[ToolContext]:
+    """Make `context` current for tool calls made inside the block."""
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def workdir() -> Path | None:
+    """Working directory for the current session (None = process cwd)."""
+    context = _current.get()
+    return context.workdir if context is not None else None
+
+
+def resolve_path(path: str) -> Path:
+    """Resolve a tool's path argument against the session's working directory."""
+    resolved = Path(path).expanduser()
+    base = workdir()
+    if base is not None and not resolved.is_absolute():
+        resolved = base / resolved
+    return resolved.resolve()
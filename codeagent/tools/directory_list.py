@@ -2,13 +2,15 @@
 
 from __future__ import annotations
 from pathlib import Path
-from typing import Any
+from typing import Any, Hashable
 
 from .base import BaseTool
+from .context import resolve_path
 
 
 class DirectoryListTool(BaseTool):
     name = "directory_list"
+    read_only = True
     description = (
         "List files and directories at a given path. "
         "Shows file sizes and types. Use to explore project structure."
@@ -28,8 +30,11 @@ class DirectoryListTool(BaseTool):
         "required": [],
     }
 
+    def cache_key(self, arguments: dict[str, Any], generation: int) -> Hashable | None:
+        return (str(resolve_path(arguments.get("path", "."))), generation)
+
     def execute(self, path: str = ".", recursive: bool = False, **_: Any) -> str:
-        dir_path = Path(path).expanduser().resolve()
+        dir_path = resolve_path(path)
         if not dir_path.exists():
             return f"Error: Path not found: {dir_path}"
         if not dir_path.is_dir():
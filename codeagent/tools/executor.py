@@ -0,0 +1,158 @@
+"""Run one round of tool calls, overlapping the read-only ones."""
+
+from __future__ import annotations
+import asyncio
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from ..llm.types import ToolCall
+from .registry import ToolRegistry
+
+
+class ToolBatch:
+    """The tool calls of a single LLM round.
+
+    Read-only calls are started on the worker pool as soon as they are
+    submitted. Any other call acts as a barrier: it runs on the caller's
+    thread once every earlier call has finished, and read-only calls after it
+    are only started once it is done. Results must be collected in submission
+    order with ``result(0)``, ``result(1)``, ... so output and history stay in
+    the order the model asked for. A call submitted with an ``answer`` does
+    not run; the answer is its result.
+    """
+
+    def __init__(self, registry: ToolRegistry, pool: ThreadPoolExecutor | None = None) -> None:
+        self._registry = registry
+        self._pool = pool
+        self._calls: list[ToolCall] = []
+        self._futures: list[Future[str] | None] = []
+        self._blocked = False  # a write was submitted; hold later calls back
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def submit(self, call: ToolCall, answer: str | None = None) -> None:
+        """Queue a call, starting it right away when that is safe."""
+        self._calls.append(call)
+        if answer is not None:
+            done: Future[str] = Future()
+            done.set_result(answer)
+            self._futures.append(done)
+        elif self._pool is not None and not self._blocked and self._is_read_only(call):
+            self._futures.append(self._start(call))
+        else:
+            self._blocked = True
+            self._futures.append(None)
+
+    def result(self, index: int) -> str:
+        """Wait for (or run) call ``index`` and return its output."""
+        future = self._futures[index]
+        if future is None:
+            call = self._calls[index]
+            if self._pool is None or not self._is_read_only(call):
+                return self._registry.execute(call.name, call.arguments)
+            self._start_reads_from(index)
+            future = self._futures[index]
+            assert future is not None
+        return future.result()
+
+    def cancel(self) -> None:
+        """Drop calls not yet started and wait for the running ones (e.g. the turn failed).
+
+        Threads can't be interrupted, so this returns once no call of the
+        batch is running; their results still reach the registry's cache.
+        """
+        running = [f for f in self._futures if f is not None and not f.cancel()]
+        wait(running)
+
+    def _is_read_only(self, call: ToolCall) -> bool:
+        return self._registry.is_read_only(call.name, call.arguments)
+
+    def _start(self, call: ToolCall) -> Future[str]:
+        assert self._pool is not None
+        # Run in a copy of the caller's context so the session's ToolContext applies
+        context = contextvars.copy_context()
+        return self._pool.submit(context.run, self._registry.execute, call.name, call.arguments)
+
+    def _start_reads_from(self, index: int) -> None:
+        """Start the run of deferred read-only calls beginning at ``index``."""
+        for i in range(index, len(self._calls)):
+            call = self._calls[i]
+            if self._futures[i] is not None:
+                continue
+            if not self._is_read_only(call):
+                break
+            self._futures[i] = self._start(call)
+
+
+class AsyncToolBatch:
+    """Asyncio counterpart of `ToolBatch` with the same ordering rules.
+
+    Read-only calls become tasks as soon as they are submitted; other calls
+    run one at a time, after everything submitted before them.
+    """
+
+    def __init__(self, registry: ToolRegistry) -> None:
+        self._registry = registry
+        self._calls: list[ToolCall] = []
+        self._tasks: list[asyncio.Future[str] | None] = []
+        self._blocked = False
+        self.durations: dict[int, float] = {}  # call index -> seconds spent running
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def submit(self, call: ToolCall, answer: str | None = None) -> None:
+        """Queue a call, starting it right away when that is safe."""
+        self._calls.append(call)
+        if answer is not None:
+            done: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+            done.set_result(answer)
+            self._tasks.append(done)
+        elif not self._blocked and self._is_read_only(call):
+            self._tasks.append(self._start(len(self._calls) - 1))
+        else:
+            self._blocked = True
+            self._tasks.append(None)
+
+    async def result(self, index: int) -> str:
+        """Wait for (or run) call ``index`` and return its output."""
+        task = self._tasks[index]
+        if task is None:
+            call = self._calls[index]
+            if not self._is_read_only(call):
+                return await self._run(index)
+            self._start_reads_from(index)
+            task = self._tasks[index]
+            assert task is not None
+        return await task
+
+    def cancel(self) -> None:
+        """Cancel calls that are still running (e.g. the turn was abandoned)."""
+        for task in self._tasks:
+            if task is not None and not task.done():
+                task.cancel()
+
+    def _is_read_only(self, call: ToolCall) -> bool:
+        return self._registry.is_read_only(call.name, call.arguments)
+
+    def _start(self, index: int) -> asyncio.Task[str]:
+        return asyncio.ensure_future(self._run(index))
+
+    async def _run(self, index: int) -> str:
+        call = self._calls[index]
+        start = time.perf_counter()
+        try:
+            return await self._registry.aexecute(call.name, call.arguments)
+        finally:
+            self.durations[index] = time.perf_counter() - start
+
+    def _start_reads_from(self, index: int) -> None:
+        for i in range(index, len(self._calls)):
+            call = self._calls[i]
+            if self._tasks[i] is not None:
+                continue
+            if not self._is_read_only(call):
+                break
+            self._tasks[i] = self._start(i)
@@ -0,0 +1,37 @@
+"""Tool: Restore a tool result that was compacted out of the history."""
+
+from __future__ import annotations
+from typing import Any
+
+from ..compaction import result_store
+from .base import BaseTool
+from .context import current_context
+
+
+class ExpandResultTool(BaseTool):
+    name = "expand_result"
+    read_only = True
+    description = (
+        "Return the full output of an earlier tool call that was compacted in the "
+        "conversation. Pass the id shown in the '[compacted ...]' note."
+    )
+    parameters: dict[str, Any] = {
+        "type": "object",
+        "properties": {
+            "id": {
+                "type": "string",
+                "description": "The id from the compacted result note.",
+            },
+        },
+        "required": ["id"],
+    }
+
+    def execute(self, id: str, **_: Any) -> str:
+        key = id.strip()
+        text = result_store.get(key)
+        context = current_context()
+        if text is None and context is not None and context.blobs is not None:
+            text = context.blobs.find_blob(key)
+        if text is None:
+            return f"Error: No stored result with id '{id}'. Re-run the original tool call instead."
+        return text
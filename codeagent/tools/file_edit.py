@@ -5,6 +5,7 @@ from pathlib import Path
 from typing import Any
 
 from .base import BaseTool
+from .context import resolve_path
 
 
 class FileEditTool(BaseTool):
@@ -37,6 +38,9 @@ class FileEditTool(BaseTool):
         "required": ["path", "old_string", "new_string"],
     }
 
+    def written_paths(self, arguments: dict[str, Any]) -> list[Path] | None:
+        return [resolve_path(arguments["path"])]
+
     def execute(
         self,
         path: str,
@@ -45,7 +49,7 @@ class FileEditTool(BaseTool):
         replace_all: bool = False,
         **_: Any,
     ) -> str:
-        file_path = Path(path).expanduser().resolve()
+        file_path = resolve_path(path)
         if not file_path.exists():
             return f"Error: File not found: {file_path}"
 
@@ -1,17 +1,42 @@
 """Tool: Read file contents."""
 
 from __future__ import annotations
-from pathlib import Path
-from typing import Any
+import difflib
+import re
+from typing import Any, Hashable, Iterable
 
+from ..llm.types import Message
 from .base import BaseTool
+from .cache import file_token
+from .context import FileRead, current_context, resolve_path
+
+_HUNK = re.compile(r"^@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@")
+_READ_NUMBER = re.compile(r"^File: .* \[read #(\d+)\]$", re.MULTILINE)
+
+
+def read_number(content: str) -> int | None:
+    """The "[read #N]" number in a `file_read` result, if any."""
+    match = _READ_NUMBER.match(content)
+    return int(match.group(1)) if match else None
+
+
+def last_read_number(messages: Iterable[Message]) -> int:
+    """The highest "[read #N]" number among `messages` (0 if none).
+
+    Used to continue the numbering in a resumed session, so new reads never
+    reuse a number the model has already seen.
+    """
+    numbers = (read_number(m.content) for m in messages if m.role == "tool" and m.name == FileReadTool.name)
+    return max((n for n in numbers if n is not None), default=0)
 
 
 class FileReadTool(BaseTool):
     name = "file_read"
+    read_only = True
     description = (
         "Read the contents of a file. Returns the file text with line numbers. "
-        "Use this before editing a file to understand its contents."
+        "Use this before editing a file to understand its contents. "
+        "Re-reading the same range returns only what changed since the last read."
     )
     parameters: dict[str, Any] = {
         "type": "object",
@@ -32,8 +57,44 @@ class FileReadTool(BaseTool):
         "required": ["path"],
     }
 
+    def cache_key(self, arguments: dict[str, Any], generation: int) -> Hashable | None:
+        return file_token(resolve_path(arguments["path"]))
+
+    def present(self, arguments: dict[str, Any], result: str) -> str:
+        """Number each read and answer re-reads with a diff against the last one.
+
+        The diff is only used while it is smaller than the text it replaces.
+        """
+        context = current_context()
+        if context is None or result.startswith("Error"):
+            return result
+        offset = int(arguments.get("offset") or 1)
+        limit = int(arguments.get("limit") or 0)
+        header, _, body = result.partition("\n")
+        lines = [line.split("\t", 1)[-1] for line in body.split("\n")] if body else []
+        key = (resolve_path(arguments["path"]), offset, limit)
+        with context.lock:
+            context.reads += 1
+            number = context.reads
+            previous = context.file_reads.get(key)
+            full = FileRead(number, (number,), lines)
+            context.file_reads[key] = full
+
+            header = f"{header} [read #{number}]"
+            if previous is None:
+                return f"{header}\n{body}"
+            delta = FileRead(number, previous.chain + (number,), lines)
+            if previous.lines == lines:
+                context.file_reads[key] = delta
+                return f"{header}\nUnchanged since read #{previous.number}."
+            diff = _unified_diff(previous.lines, lines, max(1, offset))
+            if len(diff) >= len(body):
+                return f"{header}\n{body}"
+            context.file_reads[key] = delta
+            return f"{header}\nChanges since read #{previous.number} (unified diff):\n{diff}"
+
     def execute(self, path: str, offset: int = 1, limit: int = 0, **_: Any) -> str:
-        file_path = Path(path).expanduser().resolve()
+        file_path = resolve_path(path)
         if not file_path.exists():
             return f"Error: File not found: {file_path}"
         if not file_path.is_file():
@@ -52,3 +113,18 @@ class FileReadTool(BaseTool):
         numbered = [f"{start + i + 1:>5}\t{line}" for i, line in enumerate(selected)]
         header = f"File: {file_path} ({len(lines)} lines total)"
         return header + "\n" + "\n".join(numbered)
+
+
+def _unified_diff(old: list[str], new: list[str], first_line: int) -> str:
+    """Unified diff of two line lists, with hunk headers in file line numbers."""
+    shift = first_line - 1
+    out = []
+    diff = difflib.unified_diff(old, new, lineterm="", n=2)
+    next(diff, None), next(diff, None)  # the ---/+++ file headers
+    for line in diff:
+        match = _HUNK.match(line)
+        if match and shift:
+            a, b, c, d = match.groups()
+            line = f"@@ -{int(a) + shift}{b or ''} +{int(c) + shift}{d or ''} @@"
+        out.append(line)
+    return "\n".join(out)
@@ -5,6 +5,7 @@ from pathlib import Path
 from typing import Any
 
 from .base import BaseTool
+from .context import resolve_path
 
 
 class FileWriteTool(BaseTool):
@@ -28,8 +29,11 @@ class FileWriteTool(BaseTool):
         "required": ["path", "content"],
     }
 
+    def written_paths(self, arguments: dict[str, Any]) -> list[Path] | None:
+        return [resolve_path(arguments["path"])]
+
     def execute(self, path: str, content: str, **_: Any) -> str:
-        file_path = Path(path).expanduser().resolve()
+        file_path = resolve_path(path)
         try:
             file_path.parent.mkdir(parents=True, exist_ok=True)
             file_path.write_text(content, encoding="utf-8")
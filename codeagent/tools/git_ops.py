@@ -1,10 +1,14 @@
 """Tool: Git operations."""
 
 from __future__ import annotations
+import os
+import shlex
 import subprocess
-from typing import Any
+from pathlib import Path
+from typing import Any, Hashable
 
 from .base import BaseTool
+from .context import workdir
 
 
 class GitOpsTool(BaseTool):
@@ -32,23 +36,46 @@ class GitOpsTool(BaseTool):
     # Operations that are always safe (read-only)
     SAFE_OPS = {"status", "diff", "log", "branch", "show"}
 
+    # Operations that never touch the work tree or refs, unless given one of
+    # WRITE_FLAGS (`branch <name>` creates a branch, so it is not listed here)
+    READ_ONLY_OPS = {"status", "diff", "log", "show"}
+
+    # Flags with which a read-only operation writes files or runs programs
+    WRITE_FLAGS = ("--output", "--ext-diff")
+
+    def is_read_only(self, arguments: dict[str, Any]) -> bool:
+        if arguments.get("operation") not in self.READ_ONLY_OPS:
+            return False
+        try:
+            argv = shlex.split(arguments.get("args") or "")
+        except ValueError:
+            return False
+        return not any(arg.startswith(self.WRITE_FLAGS) for arg in argv)
+
+    def cache_key(self, arguments: dict[str, Any], generation: int) -> Hashable | None:
+        state = _repo_state(workdir() or Path.cwd())
+        return None if state is None else (state, generation)
+
     def execute(self, operation: str, args: str = "", **_: Any) -> str:
-        command = f"git {operation}"
-        if args:
-            command += f" {args}"
+        # Run git directly rather than through a shell, so args can't chain
+        # other commands or redirect output
+        try:
+            argv = ["git", operation, *shlex.split(args)]
+        except ValueError as e:
+            return f"Error: could not parse args: {e}"
+        command = shlex.join(argv)
 
         # Block force-push and other dangerous operations
-        if "--force" in args or "-f" in args:
-            if operation in ("push",):
-                return "Error: Force push blocked for safety. Use the terminal tool directly if you really need this."
+        if operation == "push" and any(arg in ("--force", "-f") or arg.startswith("--force-") for arg in argv):
+            return "Error: Force push blocked for safety. Use the terminal tool directly if you really need this."
 
         try:
             result = subprocess.run(
-                command,
-                shell=True,
+                argv,
                 capture_output=True,
                 text=True,
                 timeout=30,
+                cwd=workdir(),
             )
             output = ""
             if result.stdout:
@@ -70,3 +97,35 @@ class GitOpsTool(BaseTool):
             return f"Error: git command timed out"
         except Exception as e:
             return f"Error: {e}"
+
+
+def _stat_key(path: Path) -> tuple[int, int]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (0, 0)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _repo_state(cwd: Path) -> tuple[Hashable, ...] | None:
+    """HEAD and index state of the repo containing `cwd`, read without running git."""
+    for directory in [cwd, *cwd.parents]:
+        git_dir = directory / ".git"
+        if git_dir.is_dir():
+            break
+        if git_dir.exists():
+            return None  # worktree or submodule pointer file; don't cache
+    else:
+        return None
+    try:
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    ref = _stat_key(git_dir / head[5:]) if head.startswith("ref: ") else (0, 0)
+    return (
+        str(cwd),
+        head,
+        ref,
+        _stat_key(git_dir / "packed-refs"),
+        _stat_key(git_dir / "index"),
+    )
@@ -1,43 +1,164 @@
 """Tool registry — collects all tools and dispatches execution."""
 
 from __future__ import annotations
-from typing import Any
+import copy
+import itertools
+from typing import Any, Hashable
 
+from ..config import config
+from ..tracing import size_of, tracer
 from .base import BaseTool
+from .cache import ResultCache
+
+# Versions are unique across registries, so a version identifies one snapshot
+_versions = itertools.count(1)
+
+
+class SchemaSnapshot(tuple):
+    """The tool schemas of a registry at one point in time.
+
+    A tuple of deep-copied schema dicts, tagged with a `version` that changes
+    whenever a tool is registered or removed. Providers key their converted
+    tool payloads on the version, so conversion happens once per change
+    rather than once per request. Treat the contents as read-only.
+    """
+
+    version: int
+
+    def __new__(cls, schemas: list[dict[str, Any]], version: int) -> SchemaSnapshot:
+        snapshot = super().__new__(cls, schemas)
+        snapshot.version = version
+        return snapshot
 
 
 class ToolRegistry:
-    """Central registry of all available tools."""
+    """Central registry of all available tools.
+
+    With a `cache`, results of read-only calls are reused while the tool's
+    `cache_key` is unchanged, and every other call invalidates what it may
+    have written.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, cache: ResultCache | None = None) -> None:
         self._tools: dict[str, BaseTool] = {}
+        self._snapshot: SchemaSnapshot | None = None
+        self.cache = cache
 
     def register(self, tool: BaseTool) -> None:
         self._tools[tool.name] = tool
+        self._snapshot = None
+
+    def unregister(self, name: str) -> None:
+        if self._tools.pop(name, None) is not None:
+            self._snapshot = None
 
     def get(self, name: str) -> BaseTool | None:
         return self._tools.get(name)
 
-    def get_schemas(self) -> list[dict[str, Any]]:
-        """Return all tool schemas for the LLM."""
-        return [tool.to_schema() for tool in self._tools.values()]
+    def get_schemas(self) -> SchemaSnapshot:
+        """Return all tool schemas for the LLM (cached until tools change)."""
+        if self._snapshot is None:
+            schemas = [copy.deepcopy(tool.to_schema()) for tool in self._tools.values()]
+            self._snapshot = SchemaSnapshot(schemas, next(_versions))
+        return self._snapshot
+
+    def is_read_only(self, name: str, arguments: dict[str, Any]) -> bool:
+        """Whether a call can safely run alongside other read-only calls."""
+        tool = self._tools.get(name)
+        if tool is None:
+            return False
+        try:
+            return tool.is_read_only(arguments)
+        except Exception:
+            return False
 
     def execute(self, name: str, arguments: dict[str, Any]) -> str:
         """Execute a tool by name. Returns result string."""
         tool = self._tools.get(name)
         if tool is None:
             return f"Error: Unknown tool '{name}'"
+        with tracer.span(f"tool.{name}", "tool") as span:
+            key = self._cache_key(tool, arguments)
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                result = cached
+            else:
+                try:
+                    result = tool.execute(**arguments)
+                except Exception as e:
+                    result = f"Error executing {name}: {e}"
+                self._record(tool, arguments, key, result)
+            result = self._present(tool, arguments, result)
+        if tracer.enabled:
+            span.set(cached=cached is not None, bytes_in=size_of(arguments), bytes_out=size_of(result))
+        return result
+
+    async def aexecute(self, name: str, arguments: dict[str, Any]) -> str:
+        """Execute a tool by name from asyncio code. Returns result string."""
+        tool = self._tools.get(name)
+        if tool is None:
+            return f"Error: Unknown tool '{name}'"
+        with tracer.span(f"tool.{name}", "tool") as span:
+            key = self._cache_key(tool, arguments)
+            cached = self.cache.get(key) if key is not None else None
+            if cached is not None:
+                result = cached
+            else:
+                try:
+                    result = await tool.aexecute(**arguments)
+                except Exception as e:
+                    result = f"Error executing {name}: {e}"
+                self._record(tool, arguments, key, result)
+            result = self._present(tool, arguments, result)
+        if tracer.enabled:
+            span.set(cached=cached is not None, bytes_in=size_of(arguments), bytes_out=size_of(result))
+        return result
+
+    @staticmethod
+    def _present(tool: BaseTool, arguments: dict[str, Any], result: str) -> str:
+        try:
+            return tool.present(arguments, result)
+        except Exception:
+            return result
+
+    def _cache_key(self, tool: BaseTool, arguments: dict[str, Any]) -> tuple[str, str, Hashable] | None:
+        if self.cache is None:
+            return None
+        try:
+            if not tool.is_read_only(arguments):
+                return None
+            token = tool.cache_key(arguments, self.cache.generation)
+        except Exception:
+            return None
+        return None if token is None else ResultCache.key(tool.name, arguments, token)
+
+    def _record(
+        self,
+        tool: BaseTool,
+        arguments: dict[str, Any],
+        key: tuple[str, str, Hashable] | None,
+        result: str,
+    ) -> None:
+        if self.cache is None:
+            return
+        if key is not None:
+            if not result.startswith("Error"):
+                self.cache.put(key, result)
+            return
+        if self.is_read_only(tool.name, arguments):
+            return
         try:
-            return tool.execute(**arguments)
-        except Exception as e:
-            return f"Error executing {name}: {e}"
+            paths = tool.written_paths(arguments)
+        except Exception:
+            paths = None
+        self.cache.invalidate(paths)
 
     def list_names(self) -> list[str]:
         return list(self._tools.keys())
 
 
 # Global registry instance — tools register themselves on import
-registry = ToolRegistry()
+registry = ToolRegistry(cache=ResultCache() if config.tool_cache else None)
 
 
 def _register_all_tools() -> None:
@@ -49,6 +170,7 @@ def _register_all_tools() -> None:
     from .code_search import CodeSearchTool
     from .terminal import TerminalTool
     from .git_ops import GitOpsTool
+    from .expand_result import ExpandResultTool
 
     for tool_cls in [
         FileReadTool,
@@ -58,6 +180,7 @@ def _register_all_tools() -> None:
         CodeSearchTool,
         TerminalTool,
         GitOpsTool,
+        ExpandResultTool,
     ]:
         registry.register(tool_cls())
 
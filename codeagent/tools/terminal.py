@@ -5,6 +5,7 @@ import subprocess
 from typing import Any
 
 from .base import BaseTool
+from .context import workdir
 
 # Commands that are always blocked
 BLOCKED_COMMANDS = {"rm -rf /", "mkfs", "dd if=", ":(){:|:&};:"}
@@ -45,7 +46,7 @@ class TerminalTool(BaseTool):
                 capture_output=True,
                 text=True,
                 timeout=min(timeout, 300),  # Cap at 5 minutes
-                cwd=None,  # Use current working directory
+                cwd=workdir(),  # Session working directory (None = process cwd)
             )
             output_parts: list[str] = []
             if result.stdout:
@@ -0,0 +1,303 @@
+"""Span tracing of agent turns, LLM calls, tools and UI rendering.
+
+Disabled by default. When off, `span()` returns a shared no-op object and
+the `traced*` decorators cost one attribute check per call. Enable it with
+`codeagent --trace out.json`; the recorded spans are then written as a
+Chrome trace-event file (open in chrome://tracing or https://ui.perfetto.dev)
+and summarized by `/stats`.
+"""
+
+from __future__ import annotations
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from .constants import TRACE_MAX_EVENTS
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is off."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed operation; attach details (bytes, tokens) with `set`."""
+
+    __slots__ = ("tracer", "name", "cat", "args", "start", "lane")
+
+    def __init__(self, tracer: Tracer, name: str, cat: str, args: dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0
+        self.lane = 0
+
+    def __enter__(self) -> Span:
+        self.lane = self.tracer._lane()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *exc: object) -> None:
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record(self, end)
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects spans in memory, up to `TRACE_MAX_EVENTS`."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.events: list[dict[str, Any]] = []
+        self.dropped = 0
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._lanes: dict[int, int] = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def span(self, name: str, cat: str = "", **args: Any) -> Span | _NullSpan:
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, cat, args)
+
+    def _lane(self) -> int:
+        """Chrome "thread" to draw a span on: the asyncio task, else the OS thread."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = len(self._lanes) + 1
+            return lane
+
+    def _record(self, span: Span, end: int) -> None:
+        event = {
+            "name": span.name,
+            "cat": span.cat,
+            "ph": "X",
+            "ts": (span.start - self._origin) / 1000,
+            "dur": (end - span.start) / 1000,
+            "pid": os.getpid(),
+            "tid": span.lane,
+            "args": span.args,
+        }
+        with self._lock:
+            if len(self.events) < TRACE_MAX_EVENTS:
+                self.events.append(event)
+            else:
+                self.dropped += 1
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Per span name: count, total/mean/max milliseconds and summed sizes."""
+        rows: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            row = rows.setdefault(event["name"], {
+                "name": event["name"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "bytes_in": 0, "bytes_out": 0, "tokens": 0,
+            })
+            ms = event["dur"] / 1000
+            row["count"] += 1
+            row["total_ms"] += ms
+            row["max_ms"] = max(row["max_ms"], ms)
+            args = event["args"]
+            row["bytes_in"] += args.get("bytes_in", 0)
+            row["bytes_out"] += args.get("bytes_out", 0)
+            row["tokens"] += args.get("input_tokens", 0) + args.get("output_tokens", 0)
+        for row in rows.values():
+            row["mean_ms"] = row["total_ms"] / row["count"]
+        return sorted(rows.values(), key=lambda row: row["total_ms"], reverse=True)
+
+    def export_chrome(self, path: Path) -> int:
+        """Write the spans as Chrome trace-event JSON. Returns the span count."""
+        with self._lock:
+            events = list(self.events)
+        metadata = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "codeagent"}}]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, default=str)
+        return len(events)
+
+
+tracer = Tracer()
+
+
+def span(name: str, cat: str = "", **args: Any) -> Span | _NullSpan:
+    """A span on the global tracer (a no-op while tracing is disabled)."""
+    if not tracer.enabled:
+        return _NULL_SPAN
+    return Span(tracer, name, cat, args)
+
+
+def size_of(value: Any) -> int:
+    """Approximate size in bytes of a payload; only called while tracing."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8", "replace"))
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def traced(name: str, cat: str = "", measure_result: bool = False) -> Callable[[F], F]:
+    """Decorator: record each call of the function as a span.
+
+    With `measure_result`, the size of the return value is recorded as
+    `bytes_out`.
+    """
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            s = tracer.span(name, cat)
+            with s:
+                result = fn(*args, **kwargs)
+            if measure_result:
+                # Measured after the span ends so serializing doesn't count as its time
+                s.set(bytes_out=size_of(result))
+            return result
+        return wrapper  # type: ignore[return-value]
+    return decorate
+
+
+def traced_llm(name: str) -> Callable[[F], F]:
+    """Decorator for provider `chat` / `stream_chat` methods, sync or async.
+
+    Records the model, the number of messages sent, the time to the first
+    stream event, the size of the reply and its token usage.
+    """
+    def decorate(fn: F) -> F:
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            def agen_wrapper(self: Any, messages: Any, *args: Any, **kwargs: Any) -> Any:
+                if not tracer.enabled:
+                    return fn(self, messages, *args, **kwargs)
+                return _trace_async_stream(name, self, messages, fn(self, messages, *args, **kwargs))
+            return agen_wrapper  # type: ignore[return-value]
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(self: Any, messages: Any, *args: Any, **kwargs: Any) -> Any:
+                if not tracer.enabled:
+                    return await fn(self, messages, *args, **kwargs)
+                with tracer.span(name, "llm", **_llm_args(self, messages)) as s:
+                    response = await fn(self, messages, *args, **kwargs)
+                    _set_response(s, response)
+                    return response
+            return async_wrapper  # type: ignore[return-value]
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(self: Any, messages: Any, *args: Any, **kwargs: Any) -> Any:
+                if not tracer.enabled:
+                    return fn(self, messages, *args, **kwargs)
+                return _trace_stream(name, self, messages, fn(self, messages, *args, **kwargs))
+            return gen_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(fn)
+        def wrapper(self: Any, messages: Any, *args: Any, **kwargs: Any) -> Any:
+            if not tracer.enabled:
+                return fn(self, messages, *args, **kwargs)
+            with tracer.span(name, "llm", **_llm_args(self, messages)) as s:
+                response = fn(self, messages, *args, **kwargs)
+                _set_response(s, response)
+                return response
+        return wrapper  # type: ignore[return-value]
+    return decorate
+
+
+def _llm_args(provider: Any, messages: Any) -> dict[str, Any]:
+    return {"model": getattr(provider, "model", type(provider).__name__), "messages": len(messages)}
+
+
+def _set_response(s: Span | _NullSpan, response: Any) -> None:
+    size = len(response.content.encode("utf-8", "replace"))
+    size += sum(size_of(tc.arguments) for tc in response.tool_calls)
+    s.set(bytes_in=size)
+    if response.usage is not None:
+        _set_usage(s, response.usage)
+
+
+def _set_usage(s: Span | _NullSpan, usage: Any) -> None:
+    s.set(
+        input_tokens=usage.input_tokens,
+        output_tokens=usage.output_tokens,
+        cache_read_tokens=usage.cache_read_tokens,
+    )
+
+
+class _StreamStats:
+    """Collects span details from the events of one stream."""
+
+    def __init__(self, s: Span | _NullSpan, start: int) -> None:
+        self.span = s
+        self.start = start
+        self.first = True
+        self.size = 0
+
+    def feed(self, event: Any) -> None:
+        from .llm.types import TextDelta, ToolCallDelta, UsageEvent
+
+        if self.first:
+            self.first = False
+            self.span.set(first_event_ms=(time.perf_counter_ns() - self.start) / 1e6)
+        if isinstance(event, TextDelta):
+            self.size += len(event.text.encode("utf-8", "replace"))
+        elif isinstance(event, ToolCallDelta):
+            self.size += len(event.arguments)
+        elif isinstance(event, UsageEvent):
+            _set_usage(self.span, event.usage)
+
+    def finish(self) -> None:
+        self.span.set(bytes_in=self.size)
+
+
+def _trace_stream(name: str, provider: Any, messages: Any, events: Any) -> Any:
+    with tracer.span(name, "llm", **_llm_args(provider, messages)) as s:
+        stats = _StreamStats(s, time.perf_counter_ns())
+        for event in events:
+            stats.feed(event)
+            yield event
+        stats.finish()
+
+
+async def _trace_async_stream(name: str, provider: Any, messages: Any, events: Any) -> Any:
+    with tracer.span(name, "llm", **_llm_args(provider, messages)) as s:
+        stats = _StreamStats(s, time.perf_counter_ns())
+        async for event in events:
+            stats.feed(event)
+            yield event
+        stats.finish()
@@ -3,6 +3,7 @@
 from .console import console
 from .panels import print_tool_call, print_tool_result, print_error, print_welcome, print_assistant
 from .spinner import Spinner
+from .stream import StreamingMarkdown
 
 __all__ = [
     "console",
@@ -12,4 +13,5 @@ __all__ = [
     "print_welcome",
     "print_assistant",
     "Spinner",
+    "StreamingMarkdown",
 ]
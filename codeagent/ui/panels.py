@@ -7,9 +7,11 @@ from rich.panel import Panel
 from rich.syntax import Syntax
 from rich.text import Text
 
+from ..tracing import traced
 from .console import console
 
 
+@traced("ui.print_welcome", "ui")
 def print_welcome(model_name: str) -> None:
     """Print the welcome banner."""
     welcome = Text()
@@ -24,6 +26,7 @@ def print_welcome(model_name: str) -> None:
     console.print(Panel(welcome, border_style="cyan", padding=(0, 1)))
 
 
+@traced("ui.print_assistant", "ui")
 def print_assistant(text: str) -> None:
     """Print the assistant's text response as markdown."""
     if text.strip():
@@ -32,6 +35,7 @@ def print_assistant(text: str) -> None:
         console.print()
 
 
+@traced("ui.print_tool_call", "ui")
 def print_tool_call(name: str, arguments: dict) -> None:
     """Print a tool call notification."""
     args_summary = ", ".join(f"{k}={_truncate(str(v))}" for k, v in arguments.items())
@@ -46,6 +50,7 @@ def print_tool_call(name: str, arguments: dict) -> None:
     )
 
 
+@traced("ui.print_tool_result", "ui")
 def print_tool_result(name: str, result: str) -> None:
     """Print a tool result in a panel."""
     # Truncate very long results for display
@@ -60,11 +65,13 @@ def print_tool_result(name: str, result: str) -> None:
     )
 
 
+@traced("ui.print_error", "ui")
 def print_error(message: str) -> None:
     """Print an error message."""
     console.print(f"[error]Error:[/error] {message}")
 
 
+@traced("ui.print_info", "ui")
 def print_info(message: str) -> None:
     """Print an info message."""
     console.print(f"[info]{message}[/info]")
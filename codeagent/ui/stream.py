@@ -0,0 +1,87 @@
+"""Live rendering of streamed assistant text."""
+
+from __future__ import annotations
+import threading
+from collections import deque
+from types import TracebackType
+
+from rich.console import RenderableType
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.spinner import Spinner as RichSpinner
+from rich.text import Text
+
+from ..tracing import traced
+from .console import console
+from .panels import print_assistant
+
+
+class StreamingMarkdown:
+    """Show a spinner until the first delta, then the text as it streams in.
+
+    The live view is transient and only shows the tail that fits on screen;
+    on exit the full text is printed once as regular markdown.
+
+    `append` only adds the delta to a buffer of the last screenful of lines,
+    so it costs the size of the delta. The tail is rendered as markdown when
+    the live view refreshes, at most `refresh_per_second` times and only if
+    text arrived since, however many deltas that was.
+    """
+
+    def __init__(self, message: str = "Thinking...") -> None:
+        self._parts: list[str] = []
+        self._tail_lines = max(console.height - 4, 1)
+        self._lines: deque[str] = deque(maxlen=self._tail_lines)  # complete lines of the tail
+        self._line: list[str] = []  # pieces of the line still being written
+        self._version = 0  # bumped by every delta
+        self._view: tuple[int, RenderableType] = (0, RichSpinner("dots", text=Text(f" {message}", style="info")))
+        self._lock = threading.Lock()  # the live view renders from its own thread
+        self._live = Live(
+            console=console,
+            get_renderable=self._render,
+            refresh_per_second=12,
+            transient=True,
+        )
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    @traced("ui.stream_update", "ui")
+    def append(self, delta: str) -> None:
+        self._parts.append(delta)
+        with self._lock:
+            first, *rest = delta.split("\n")
+            self._line.append(first)
+            if rest:
+                self._lines.append("".join(self._line))
+                self._lines.extend(rest[:-1])
+                self._line = [rest[-1]]
+            self._version += 1
+
+    def _render(self) -> RenderableType:
+        """The live view's current contents (called on every refresh)."""
+        with self._lock:
+            version, view = self._view
+            if version == self._version:
+                return view
+            version = self._version
+            lines = [*self._lines, "".join(self._line)]
+        tail = "\n".join(lines[-self._tail_lines:])
+        if tail.strip():
+            view = Markdown(tail)
+        self._view = (version, view)
+        return view
+
+    def __enter__(self) -> StreamingMarkdown:
+        self._live.__enter__()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self._live.__exit__(exc_type, exc, tb)
+        print_assistant(self.text)
@@ -0,0 +1,79 @@
+"""Running token, latency and cost totals for an agent session."""
+
+from __future__ import annotations
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from .history import History
+from .llm.models import cost
+from .llm.types import LLMResponse, Usage
+
+
+@dataclass
+class UsageTotals:
+    """Provider-reported usage summed over a number of requests."""
+    requests: int = 0
+    usage: Usage = field(default_factory=Usage)
+    cost: float = 0.0  # USD, for priced models only
+    unpriced_requests: int = 0  # no usage reported, or the model has no price
+    latency: float = 0.0  # seconds spent waiting for responses
+
+    def add(self, model: str, response: LLMResponse) -> None:
+        self.requests += 1
+        self.latency += response.latency or 0.0
+        if response.usage is None:
+            self.unpriced_requests += 1
+            return
+        self.usage.add(response.usage)
+        price = cost(model, response.usage)
+        if price is None:
+            self.unpriced_requests += 1
+        else:
+            self.cost += price
+
+
+class UsageTracker:
+    """Accounts for every LLM request of a session.
+
+    Besides the provider's token counts, each request's prompt is broken
+    down (by local estimate) into tokens per message role and per tool whose
+    output is in the history, summed over all requests. That shows what the
+    context is actually spent on, e.g. how much is re-sent file_read output.
+    """
+
+    def __init__(self) -> None:
+        self.session = UsageTotals()
+        self.turn = UsageTotals()
+        self.turns = 0
+        self.context_by_role: defaultdict[str, int] = defaultdict(int)
+        self.context_by_tool: defaultdict[str, int] = defaultdict(int)
+
+    def start_turn(self) -> None:
+        self.turn = UsageTotals()
+        self.turns += 1
+
+    def record(self, model: str, response: LLMResponse, history: History) -> None:
+        """Add one response; `history` must still be what the request sent."""
+        self.session.add(model, response)
+        self.turn.add(model, response)
+        # The history keeps these totals as it changes, so this does not
+        # depend on its length
+        for role, tokens in history.tokens_by_role.items():
+            if tokens:
+                self.context_by_role[role] += tokens
+        for tool, tokens in history.tokens_by_tool.items():
+            if tokens:
+                self.context_by_tool[tool] += tokens
+
+    def as_dict(self) -> dict[str, Any]:
+        """Session totals as plain data (for batch results)."""
+        totals = self.session
+        return {
+            **asdict(totals.usage),
+            "requests": totals.requests,
+            "cost_usd": round(totals.cost, 6) if totals.unpriced_requests < totals.requests else None,
+            "latency_s": round(totals.latency, 3),
+            "context_tokens_by_role": dict(self.context_by_role),
+            "context_tokens_by_tool": dict(self.context_by_tool),
+        }
@@ -0,0 +1,284 @@
+"""Fixtures shared by the tests: fake providers and APIs, schedulers, endpoint pools."""
+
+from __future__ import annotations
+import asyncio
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Callable, Iterator
+
+import pytest
+
+from codeagent.llm.base import AsyncBaseLLMProvider, BaseLLMProvider
+from codeagent.llm.endpoints import EndpointPool
+from codeagent.llm.scheduler import Scheduler
+from codeagent.llm.streaming import events_from_response
+from codeagent.llm.types import LLMResponse, Message, StreamEvent, ToolCall, Usage
+
+
+class FakeProvider(BaseLLMProvider):
+    """Answers "<name> answer <n>" for its n-th request, with a tool call.
+
+    Each request waits `latency` seconds and for `gate` (if set), then raises
+    the next of `errors`, if any are left. With a `scheduler`, requests go
+    through it, so its retries apply. Stream events come `pause` seconds apart.
+    """
+
+    model = "fake-model"
+
+    def __init__(
+        self,
+        name: str = "fake",
+        latency: float = 0.0,
+        errors: list[Exception] | None = None,
+        gate: threading.Event | None = None,
+        scheduler: Scheduler | None = None,
+        pause: float = 0.01,
+    ) -> None:
+        self.name = name
+        self.latency = latency
+        self.errors = list(errors or [])
+        self.gate = gate
+        self.scheduler = scheduler
+        self.pause = pause
+        self.calls = 0  # requests, retries included
+        self.finished = 0  # streams read to the end
+        self.cancelled = False  # a stream closed before its end
+        self._lock = threading.Lock()
+
+    def _answer(self) -> LLMResponse:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.latency)
+        if self.gate is not None:
+            self.gate.wait(5.0)
+        with self._lock:
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        return LLMResponse(
+            content=f"{self.name} answer {call}",
+            tool_calls=[ToolCall(id="call_1", name="directory_list", arguments={"path": ".", "depth": 2})],
+            stop_reason="tool_use",
+            usage=Usage(input_tokens=100, output_tokens=20),
+        )
+
+    def chat(self, messages: list[Message], tools: list[dict[str, Any]] | None = None, system: str = "") -> LLMResponse:
+        return self.scheduler.call(self._answer) if self.scheduler is not None else self._answer()
+
+    def stream_chat(
+        self, messages: list[Message], tools: list[dict[str, Any]] | None = None, system: str = ""
+    ) -> Iterator[StreamEvent]:
+        def open_stream() -> list[StreamEvent]:
+            return list(events_from_response(self._answer()))
+
+        events = self.scheduler.stream(open_stream) if self.scheduler is not None else iter(open_stream())
+        try:
+            for event in events:
+                yield event
+                time.sleep(self.pause)
+            self.finished += 1
+        except GeneratorExit:
+            self.cancelled = True
+            raise
+        finally:
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()
+
+    def get_model_name(self) -> str:
+        return self.name
+
+
+class AsyncFakeProvider(AsyncBaseLLMProvider):
+    """Asyncio counterpart of `FakeProvider`; `cancelled` is set when a request is."""
+
+    model = "fake-model"
+
+    def __init__(
+        self,
+        name: str = "fake",
+        latency: float = 0.0,
+        errors: list[Exception] | None = None,
+        gate: asyncio.Event | None = None,
+        scheduler: Scheduler | None = None,
+    ) -> None:
+        self.name = name
+        self.latency = latency
+        self.errors = list(errors or [])
+        self.gate = gate
+        self.scheduler = scheduler
+        self.calls = 0
+        self.cancelled = False
+
+    async def _answer(self) -> LLMResponse:
+        self.calls += 1
+        call = self.calls
+        try:
+            await asyncio.sleep(self.latency)
+            if self.gate is not None:
+                await self.gate.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.errors:
+            raise self.errors.pop(0)
+        return LLMResponse(content=f"{self.name} answer {call}", usage=Usage(input_tokens=10, output_tokens=5))
+
+    async def chat(
+        self, messages: list[Message], tools: list[dict[str, Any]] | None = None, system: str = ""
+    ) -> LLMResponse:
+        return await self.scheduler.acall(self._answer) if self.scheduler is not None else await self._answer()
+
+    async def stream_chat(
+        self, messages: list[Message], tools: list[dict[str, Any]] | None = None, system: str = ""
+    ) -> AsyncIterator[StreamEvent]:
+        for event in events_from_response(await self.chat(messages, tools, system)):
+            yield event
+
+    def get_model_name(self) -> str:
+        return self.name
+
+
+@pytest.fixture
+def fake_provider() -> type[FakeProvider]:
+    return FakeProvider
+
+
+@pytest.fixture
+def async_fake_provider() -> type[AsyncFakeProvider]:
+    return AsyncFakeProvider
+
+
+@pytest.fixture
+def wait_for() -> Callable[..., bool]:
+    """Poll `condition` until it holds; False if it still doesn't after `timeout` seconds."""
+
+    def wait(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    return wait
+
+
+@pytest.fixture
+def make_scheduler() -> Callable[..., Scheduler]:
+    """A private scheduler with short backoffs; keyword arguments override the defaults."""
+
+    def make(name: str = "test", **kwargs: Any) -> Scheduler:
+        options: dict[str, Any] = {"max_retries": 3, "base_delay": 0.01, "max_delay": 0.1}
+        options.update(kwargs)
+        return Scheduler(name, **options)
+
+    return make
+
+
+@pytest.fixture
+def make_pool() -> Callable[..., EndpointPool]:
+    """An endpoint pool with fast ejection; keyword arguments override the defaults."""
+
+    def make(urls: list[str], **kwargs: Any) -> EndpointPool:
+        options: dict[str, Any] = {
+            "health_path": "/api/version",
+            "affinity_slack": 2,
+            "eject_after": 2,
+            "eject_seconds": 0.02,
+            "max_eject_seconds": 0.08,
+        }
+        options.update(kwargs)
+        return EndpointPool(urls, **options)
+
+    return make
+
+
+@dataclass
+class Reply:
+    """One scripted HTTP response of `FakeAPI`."""
+
+    status: int = 200
+    headers: dict[str, str] = field(default_factory=dict)
+    delay: float = 0.0
+
+
+def completion(text: str = "hi") -> dict[str, Any]:
+    """A minimal OpenAI chat completion."""
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-test",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+class FakeAPI:
+    """A local HTTP server answering requests with the replies added by `reply`, in order.
+
+    The last reply repeats; without any, requests get a completion. `sent`
+    has the arrival time of each request, `peak` the most handled at once.
+    """
+
+    def __init__(self) -> None:
+        self.replies: list[Reply] = []
+        self.sent: list[float] = []
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("content-length") or 0))
+                with api._lock:
+                    reply = api.replies[min(len(api.sent), len(api.replies) - 1)] if api.replies else Reply()
+                    api.sent.append(time.monotonic())
+                    api.active += 1
+                    api.peak = max(api.peak, api.active)
+                try:
+                    time.sleep(reply.delay)
+                    body = completion() if reply.status < 400 else {"error": {"message": f"HTTP {reply.status}"}}
+                    data = json.dumps(body).encode()
+                    self.send_response(reply.status)
+                    self.send_header("content-type", "application/json")
+                    self.send_header("content-length", str(len(data)))
+                    for name, value in reply.headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with api._lock:
+                        api.active -= 1
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.01,), daemon=True)
+        self._thread.start()
+
+    def reply(self, status: int = 200, headers: dict[str, str] | None = None, delay: float = 0.0) -> None:
+        """Add a reply: a completion, or an OpenAI-style error for an error status."""
+        self.replies.append(Reply(status, headers or {}, delay))
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def fake_api() -> Iterator[FakeAPI]:
+    api = FakeAPI()
+    yield api
+    api.close()
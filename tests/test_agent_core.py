@@ -0,0 +1,29 @@
+"""The turn logic both agents share, driven through AsyncAgent and the demo provider."""
+
+from __future__ import annotations
+import asyncio
+from pathlib import Path
+
+from codeagent.agent_core import INTERRUPTED_RESULT
+from codeagent.async_agent import AsyncAgent
+from codeagent.llm.types import ToolCall
+
+
+def test_a_turn_records_the_calls_and_their_results(tmp_path: Path) -> None:
+    agent = AsyncAgent("demo", workdir=tmp_path)
+    text = asyncio.run(agent.send("list the files"))
+    assert text == "Here's the directory listing above."
+    assert [m.role for m in agent.history.messages] == ["user", "assistant", "tool", "assistant"]
+    call = agent.history.messages[1].tool_calls[0]
+    assert agent.history.messages[2].tool_call_id == call.id
+    assert agent.usage.session.requests == 2
+
+
+def test_interrupted_calls_still_get_a_result() -> None:
+    agent = AsyncAgent("demo")
+    calls = [ToolCall(id=f"call_{i}", name="file_read", arguments={"path": "x"}) for i in range(2)]
+    agent._record_interrupted(calls)
+    assert [(m.tool_call_id, m.content) for m in agent.history.messages] == [
+        ("call_0", INTERRUPTED_RESULT),
+        ("call_1", INTERRUPTED_RESULT),
+    ]
@@ -0,0 +1,70 @@
+"""Anthropic prompt-cache breakpoints in the request payload (no network)."""
+
+from __future__ import annotations
+import copy
+from typing import Any
+
+from codeagent.llm.anthropic_provider import CACHE_BREAKPOINT, _build_request, _tools_to_anthropic_cached
+from codeagent.llm.types import Message, ToolCall
+
+TOOLS = [
+    {"name": name, "description": f"The {name} tool.", "parameters": {"type": "object"}}
+    for name in ("file_read", "file_write", "directory_list")
+]
+CALL = ToolCall(id="toolu_1", name="file_read", arguments={"path": "app.py"})
+
+
+def conversation() -> list[Message]:
+    return [
+        Message(role="user", content="what does app.py do?"),
+        Message(role="assistant", content="Let me look.", tool_calls=[CALL]),
+        Message(role="tool", content="File: app.py\n1\timport sys", tool_call_id=CALL.id, name=CALL.name),
+    ]
+
+
+def build(messages: list[Message]) -> dict[str, Any]:
+    return _build_request("claude-test", messages, _tools_to_anthropic_cached(TOOLS), "You are helpful.", True)
+
+
+def breakpoints(value: Any) -> int:
+    if isinstance(value, dict):
+        return ("cache_control" in value) + sum(breakpoints(v) for v in value.values())
+    if isinstance(value, list):
+        return sum(breakpoints(v) for v in value)
+    return 0
+
+
+def test_breakpoints_follow_the_system_prompt_the_tools_and_the_last_message() -> None:
+    kwargs = build(conversation())
+    assert kwargs["system"] == [{"type": "text", "text": "You are helpful.", "cache_control": CACHE_BREAKPOINT}]
+    assert [("cache_control" in tool) for tool in kwargs["tools"]] == [False, False, True]
+    *earlier, last = kwargs["messages"]
+    assert last["content"][-1]["type"] == "tool_result"
+    assert last["content"][-1]["cache_control"] == CACHE_BREAKPOINT
+    assert breakpoints(earlier) == 0
+
+
+def test_a_plain_text_last_message_becomes_a_marked_block() -> None:
+    kwargs = build([Message(role="user", content="hello")])
+    assert kwargs["messages"] == [
+        {"role": "user", "content": [{"type": "text", "text": "hello", "cache_control": CACHE_BREAKPOINT}]}
+    ]
+
+
+def test_memoized_wire_messages_are_not_modified() -> None:
+    messages = conversation()
+    build(messages)
+    memoized = [copy.deepcopy(m._wire["anthropic"]) for m in messages]
+    assert breakpoints(memoized) == 0
+    build(messages)
+    assert [m._wire["anthropic"] for m in messages] == memoized
+
+
+def test_never_more_than_four_breakpoints_as_the_conversation_grows() -> None:
+    messages = conversation()
+    for round_number in range(6):
+        assert breakpoints(build(messages)) <= 4
+        messages.append(Message(role="assistant", content=f"round {round_number}", tool_calls=[CALL]))
+        messages.append(Message(role="tool", content="ok", tool_call_id=CALL.id, name=CALL.name))
+    # The previous round's last message lost its breakpoint in this round's request
+    assert breakpoints(build(messages)["messages"][:-1]) == 0
@@ -0,0 +1,73 @@
+"""Batch mode end to end with the demo provider: results, resuming, timeouts."""
+
+from __future__ import annotations
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+from click.testing import CliRunner
+
+from codeagent.batch import BatchRunner, _read_tasks, batch_command
+from codeagent.config import config
+from codeagent.llm.mock_provider import AsyncMockProvider
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(config, "data_dir", tmp_path / "home")
+    monkeypatch.setattr(config, "llm_cache", False)
+    return tmp_path / "home"
+
+
+def write_tasks(path: Path, tasks: list[dict[str, Any]]) -> Path:
+    path.write_text("".join(json.dumps(task) + "\n" for task in tasks), encoding="utf-8")
+    return path
+
+
+def read_records(path: Path) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def run_cli(tasks: Path, out: Path) -> None:
+    result = CliRunner().invoke(batch_command, [str(tasks), "--out", str(out), "--provider", "demo"])
+    assert result.exit_code == 0, result.output
+
+
+def test_results_are_written_and_a_rerun_skips_finished_tasks(tmp_path: Path) -> None:
+    (tmp_path / "repo").mkdir()
+    (tmp_path / "repo" / "notes.txt").write_text("hi\n")
+    tasks = write_tasks(tmp_path / "tasks.jsonl", [
+        {"id": "chat", "prompt": "hello there"},
+        {"id": "tools", "prompt": "list the files", "cwd": str(tmp_path / "repo")},
+        {"id": "broken"},
+    ])
+    out = tmp_path / "out" / "results.jsonl"
+    run_cli(tasks, out)
+
+    *records, summary = read_records(out)
+    by_id = {record["id"]: record for record in records}
+    assert set(by_id) == {"chat", "tools", "broken"}
+    assert by_id["chat"]["status"] == "ok" and by_id["chat"]["final_text"]
+    assert [call["name"] for call in by_id["tools"]["tool_trace"]] == ["directory_list"]
+    assert by_id["broken"] == {"id": "broken", "status": "error", "error": "Task has no prompt"}
+    assert summary == {"summary": {"ok": 2, "error": 1, "timeout": 0, "skipped": 0}}
+
+    # Only the failed task runs again
+    run_cli(tasks, out)
+    *_, rerun, summary = read_records(out)
+    assert rerun["id"] == "broken"
+    assert summary == {"summary": {"ok": 0, "error": 1, "timeout": 0, "skipped": 2}}
+
+
+def test_slow_tasks_time_out(tmp_path: Path) -> None:
+    tasks = write_tasks(tmp_path / "tasks.jsonl", [{"id": "slow", "prompt": "hello"}])
+    out = tmp_path / "results.jsonl"
+    runner = BatchRunner(out, timeout=0.05, default_provider="demo")
+    runner._providers["demo"] = AsyncMockProvider(latency=5.0)
+    counts = asyncio.run(runner.run(_read_tasks(tasks)))
+    assert counts["timeout"] == 1
+    [record, _] = read_records(out)
+    assert record["status"] == "timeout"
+    assert record["error"] == "Timed out after 0.05s"
@@ -0,0 +1,57 @@
+"""Compaction: originals of saved sessions persist; the loop guard forgets them."""
+
+from __future__ import annotations
+from pathlib import Path
+
+from codeagent.compaction import Compactor, ResultStore
+from codeagent.history import History
+from codeagent.llm.types import Message, ToolCall
+from codeagent.loop_guard import LoopGuard
+from codeagent.sessions import SessionStore
+from codeagent.tools import registry
+from codeagent.tools.context import ToolContext, use_context
+from codeagent.tools.expand_result import ExpandResultTool
+
+CALL = ToolCall(id="call_1", name="file_read", arguments={"path": "big.py"})
+RESULT = "File: big.py (400 lines)\n" + "\n".join(f"{n}\tline {n}" for n in range(1, 401))
+
+
+def stale_history() -> History:
+    history = History(budget=100_000)
+    history.append(Message(role="user", content="read big.py"))
+    history.append(Message(role="assistant", content="", tool_calls=[CALL]))
+    history.append(Message(role="tool", content=RESULT, tool_call_id=CALL.id, name=CALL.name))
+    history.append(Message(role="assistant", content="it is long"))
+    return history
+
+
+def compact(history: History, blobs: SessionStore | None) -> str:
+    compactor = Compactor(ResultStore(), max_age_rounds=1, min_savings=1, blobs=blobs)
+    assert compactor.compact(history) > 0
+    assert compactor.compacted[0].content == RESULT
+    stub = history.messages[2].content
+    return stub.split(", id ")[1].split(",")[0]
+
+
+def test_a_saved_sessions_compacted_results_outlive_the_memory_store(tmp_path: Path) -> None:
+    blobs = SessionStore(tmp_path / "sessions")
+    key = compact(stale_history(), blobs)
+    # The process-wide store never saw it; the session's blob area has it
+    with use_context(ToolContext(blobs=blobs)):
+        assert ExpandResultTool().execute(key) == RESULT
+
+
+def test_without_a_session_nothing_is_written(tmp_path: Path) -> None:
+    key = compact(stale_history(), None)
+    with use_context(ToolContext()):
+        assert ExpandResultTool().execute(key).startswith("Error: No stored result")
+
+
+def test_forgotten_calls_are_not_answered_from_the_guard() -> None:
+    guard = LoopGuard(registry, stop_rounds=3)
+    guard.record(CALL, RESULT)
+    guard.end_round()
+    repeat = ToolCall(id="call_2", name=CALL.name, arguments=CALL.arguments)
+    assert guard.check(repeat) is not None
+    guard.forget({CALL.id})
+    assert guard.check(ToolCall(id="call_3", name=CALL.name, arguments=CALL.arguments)) is None
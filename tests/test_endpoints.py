@@ -0,0 +1,166 @@
+"""EndpointPool routing, affinity, ejection and reinstatement."""
+
+from __future__ import annotations
+import threading
+import time
+from typing import Callable
+
+import httpx
+import pytest
+
+from codeagent.llm import endpoints as endpoints_module
+from codeagent.llm.endpoints import EndpointPool, get_endpoint_pool
+
+URLS = ["http://a:11434", "http://b:11434", "http://c:11434"]
+
+
+class FakeServers:
+    """Health checks answered per host; hosts in `down` refuse connections."""
+
+    def __init__(self) -> None:
+        self.down: set[str] = set()
+        self.probes: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.probes.append((request.url.host, time.monotonic()))
+            down = request.url.host in self.down
+        if down:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"version": "0.0.0"})
+
+
+@pytest.fixture
+def servers(monkeypatch: pytest.MonkeyPatch) -> FakeServers:
+    fake = FakeServers()
+    client = httpx.Client(transport=httpx.MockTransport(fake.handler))
+    monkeypatch.setattr(endpoints_module, "http_client", lambda: client)
+    return fake
+
+
+def test_requests_go_to_the_least_outstanding_endpoint(make_pool: Callable[..., EndpointPool]) -> None:
+    pool = make_pool(URLS)
+    first = [pool.acquire() for _ in range(3)]
+    assert {e.url for e in first} == set(URLS)
+    pool.release(first[1])
+    assert pool.acquire() is first[1]
+    assert [e.outstanding for e in pool.endpoints] == [1, 1, 1]
+
+
+def test_idle_endpoints_share_requests_evenly(make_pool: Callable[..., EndpointPool]) -> None:
+    pool = make_pool(URLS)
+    for _ in range(9):
+        pool.release(pool.acquire())
+    assert [e.requests for e in pool.endpoints] == [3, 3, 3]
+
+
+def test_a_conversation_stays_on_its_endpoint(make_pool: Callable[..., EndpointPool]) -> None:
+    pool = make_pool(URLS)
+    home = pool.acquire("conversation")
+    pool.release(home)
+    others = [e for e in pool.endpoints if e is not home]
+    busy = [pool.acquire(exclude=others) for _ in range(2)]  # within the slack of 2
+    assert pool.acquire("conversation") is home
+    assert pool.affinity_hits == 1
+    for endpoint in busy:
+        pool.release(endpoint)
+
+
+def test_affinity_gives_way_to_a_much_less_loaded_endpoint(make_pool: Callable[..., EndpointPool]) -> None:
+    pool = make_pool(URLS, affinity_slack=1)
+    home = pool.acquire("conversation")
+    pool.release(home)
+    load = [pool.acquire(exclude=[e for e in pool.endpoints if e is not home]) for _ in range(3)]
+    assert home.outstanding == 3
+    moved = pool.acquire("conversation")
+    assert moved is not home
+    # The conversation now lives on its new endpoint
+    pool.release(moved)
+    assert pool.acquire("conversation") is moved
+    for endpoint in load:
+        pool.release(endpoint)
+
+
+def test_excluded_endpoints_are_avoided(make_pool: Callable[..., EndpointPool]) -> None:
+    pool = make_pool(URLS)
+    tried = pool.acquire()
+    pool.release(tried, failed=True)
+    assert pool.acquire(exclude=[tried]) is not tried
+
+
+def test_excluded_endpoints_are_used_when_nothing_else_is_left(make_pool: Callable[..., EndpointPool]) -> None:
+    pool = make_pool(URLS)
+    assert pool.acquire(exclude=pool.endpoints) in pool.endpoints
+
+
+def test_failures_in_a_row_eject_an_endpoint(servers: FakeServers, make_pool: Callable[..., EndpointPool]) -> None:
+    servers.down.add("a")
+    pool = make_pool(URLS)
+    bad = pool.endpoints[0]
+    pool.release(pool.acquire(exclude=pool.endpoints[1:]), failed=True)
+    assert not bad.ejected
+    pool.release(pool.acquire(exclude=pool.endpoints[1:]), failed=True)
+    assert bad.ejected
+    assert bad.ejections == 1
+    assert bad not in pool.healthy()
+    assert all(pool.acquire() is not bad for _ in range(6))
+
+
+def test_a_success_resets_the_failure_count(make_pool: Callable[..., EndpointPool]) -> None:
+    pool = make_pool(URLS)
+    only_a = pool.endpoints[1:]
+    pool.release(pool.acquire(exclude=only_a), failed=True)
+    pool.release(pool.acquire(exclude=only_a))
+    pool.release(pool.acquire(exclude=only_a), failed=True)
+    assert not pool.endpoints[0].ejected
+
+
+def test_ejected_endpoint_is_readmitted_once_it_recovers(
+    servers: FakeServers, make_pool: Callable[..., EndpointPool], wait_for: Callable[..., bool]
+) -> None:
+    servers.down.add("b")
+    pool = make_pool(URLS)
+    bad = pool.endpoints[1]
+    others = [e for e in pool.endpoints if e is not bad]
+    for _ in range(2):
+        pool.release(pool.acquire(exclude=others), failed=True)
+    assert bad.ejected
+
+    # Failed probes back off, doubling up to the maximum
+    assert wait_for(lambda: sum(host == "b" for host, _ in servers.probes) >= 4)
+    assert bad.ejected
+    assert bad.eject_seconds == pytest.approx(0.08)
+    probe_times = [at for host, at in servers.probes if host == "b"]
+    assert probe_times[2] - probe_times[1] >= 0.035
+
+    servers.down.discard("b")
+    assert wait_for(lambda: not bad.ejected)
+    assert bad.failures == 0
+    assert bad in pool.healthy()
+    assert bad in [pool.acquire() for _ in range(3)]
+
+
+def test_when_all_are_ejected_the_soonest_back_is_used(
+    servers: FakeServers, make_pool: Callable[..., EndpointPool]
+) -> None:
+    servers.down.update({"a", "b", "c"})
+    pool = make_pool(URLS, eject_seconds=5.0, max_eject_seconds=5.0)
+    for endpoint in pool.endpoints:
+        others = [e for e in pool.endpoints if e is not endpoint]
+        for _ in range(2):
+            pool.release(pool.acquire(exclude=others), failed=True)
+    assert pool.healthy() == []
+    soonest = min(pool.endpoints, key=lambda e: e.ejected_until)
+    assert pool.acquire() is soonest
+
+
+def test_pools_are_shared_per_url_list() -> None:
+    first = get_endpoint_pool(["http://x:1/", "http://y:2"], "/api/version")
+    assert get_endpoint_pool(["http://x:1", "http://y:2/"]) is first
+    assert get_endpoint_pool(["http://y:2", "http://x:1"]) is not first
+
+
+def test_needs_an_endpoint() -> None:
+    with pytest.raises(ValueError):
+        EndpointPool([])
@@ -0,0 +1,40 @@
+"""ToolBatch: cancelling a round whose response never completed."""
+
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from codeagent.llm.types import ToolCall
+from codeagent.tools.executor import ToolBatch
+
+
+class SlowRegistry:
+    """Read-only calls that take `seconds`; records which ones finished."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.finished: list[str] = []
+        self._lock = threading.Lock()
+
+    def is_read_only(self, name: str, arguments: dict[str, Any]) -> bool:
+        return True
+
+    def execute(self, name: str, arguments: dict[str, Any]) -> str:
+        time.sleep(self.seconds)
+        with self._lock:
+            self.finished.append(arguments["id"])
+        return "done"
+
+
+def test_cancel_drops_queued_calls_and_waits_for_running_ones() -> None:
+    registry = SlowRegistry(0.05)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        batch = ToolBatch(registry, pool)  # type: ignore[arg-type]
+        for i in range(3):
+            batch.submit(ToolCall(id=f"call_{i}", name="file_read", arguments={"id": str(i)}))
+        time.sleep(0.01)  # the first call is running, the others wait for the worker
+        batch.cancel()
+        assert registry.finished == ["0"]
+    assert registry.finished == ["0"]
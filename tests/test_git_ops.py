@@ -0,0 +1,33 @@
+"""git_ops: read-only classification and running git without a shell."""
+
+from __future__ import annotations
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from codeagent.tools.context import ToolContext, use_context
+from codeagent.tools.git_ops import GitOpsTool
+
+
+@pytest.mark.parametrize("operation, args, read_only", [
+    ("status", "", True),
+    ("diff", "HEAD~1 -- src/app.py", True),
+    ("log", "--oneline -5", True),
+    ("diff", "--output=notes.txt", False),
+    ("show", "HEAD --output notes.txt", False),
+    ("diff", "--ext-diff", False),
+    ("log", "'unbalanced", False),
+    ("branch", "", False),
+    ("commit", "-m 'x'", False),
+])
+def test_read_only_depends_on_the_args(operation: str, args: str, read_only: bool) -> None:
+    assert GitOpsTool().is_read_only({"operation": operation, "args": args}) is read_only
+
+
+def test_args_are_not_run_through_a_shell(tmp_path: Path) -> None:
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    with use_context(ToolContext(workdir=tmp_path)):
+        output = GitOpsTool().execute("status", "; touch pwned")
+    assert not (tmp_path / "pwned").exists()
+    assert output.startswith("$ git status ';' touch pwned")
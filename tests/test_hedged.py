@@ -0,0 +1,203 @@
+"""Hedged providers: hedge timing, cancelling the loser, failover."""
+
+from __future__ import annotations
+import asyncio
+import time
+from typing import TYPE_CHECKING, Callable, Iterator
+
+import pytest
+
+from codeagent.llm.base import BaseLLMProvider
+from codeagent.llm.hedged import AsyncHedgedProvider, HedgedProvider, LatencyWindow
+from codeagent.llm.scheduler import Scheduler
+from codeagent.llm.types import Message, StreamEvent, TextDelta
+
+if TYPE_CHECKING:
+    from conftest import AsyncFakeProvider, FakeProvider
+
+MESSAGES = [Message(role="user", content="hi")]
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    """Named like the SDKs' connection errors, which is how they are recognized."""
+
+
+def hedged(*members: BaseLLMProvider, delay: float = 0.05) -> HedgedProvider:
+    return HedgedProvider(list(members), delay=delay, min_samples=3)
+
+
+def streamed_text(events: Iterator[StreamEvent]) -> str:
+    return "".join(event.text for event in events if isinstance(event, TextDelta))
+
+
+def test_fast_primary_is_not_hedged(fake_provider: type[FakeProvider]) -> None:
+    primary, secondary = fake_provider("primary"), fake_provider("secondary")
+    provider = hedged(primary, secondary)
+    assert provider.chat(MESSAGES).content == "primary answer 1"
+    assert secondary.calls == 0
+    assert provider.stats.as_dict() == {"requests": 1, "hedges": 0, "failovers": 0, "secondary_wins": 0}
+
+
+def test_slow_primary_is_hedged_and_the_first_answer_used(fake_provider: type[FakeProvider]) -> None:
+    primary, secondary = fake_provider("primary", latency=0.5), fake_provider("secondary")
+    provider = hedged(primary, secondary)
+    started = time.monotonic()
+    response = provider.chat(MESSAGES)
+    assert time.monotonic() - started < 0.4
+    assert response.content == "secondary answer 1"
+    assert (primary.calls, secondary.calls) == (1, 1)
+    assert provider.stats.hedges == 1
+    assert provider.stats.secondary_wins == 1
+
+
+def test_hedged_stream_uses_one_member_and_cancels_the_other(
+    fake_provider: type[FakeProvider], wait_for: Callable[..., bool]
+) -> None:
+    primary, secondary = fake_provider("primary", latency=0.3), fake_provider("secondary")
+    provider = hedged(primary, secondary)
+    assert streamed_text(provider.stream_chat(MESSAGES)) == "secondary answer 1"
+    assert secondary.finished == 1
+    # The loser stops at its first event instead of streaming to the end
+    assert wait_for(lambda: primary.cancelled)
+    assert primary.finished == 0
+
+
+def test_chat_loser_stops_at_its_first_event(fake_provider: type[FakeProvider], wait_for: Callable[..., bool]) -> None:
+    primary, secondary = fake_provider("primary", latency=0.3), fake_provider("secondary")
+    provider = hedged(primary, secondary)
+    assert provider.chat(MESSAGES).content == "secondary answer 1"
+    assert wait_for(lambda: primary.cancelled)
+    assert primary.finished == 0
+
+
+def test_losers_latency_is_remembered_as_a_lower_bound(fake_provider: type[FakeProvider]) -> None:
+    primary, secondary = fake_provider("primary", latency=0.3), fake_provider("secondary")
+    provider = hedged(primary, secondary)
+    provider.chat(MESSAGES)
+    primary_window, secondary_window = provider.latencies
+    assert len(primary_window) == 1 and len(secondary_window) == 1
+    assert 0.05 <= primary_window.percentile(50) < 0.3
+
+
+def test_deadline_follows_the_latency_percentile(fake_provider: type[FakeProvider]) -> None:
+    primary, secondary = fake_provider("primary"), fake_provider("secondary")
+    provider = HedgedProvider([primary, secondary], percentile=90, delay=1.5, min_samples=3)
+    window = provider.latencies[0]
+    window.add(0.1)
+    window.add(0.2)
+    assert provider.deadline(0) == 1.5  # too few samples: the fixed delay
+    window.add(0.4)
+    assert provider.deadline(0) == 0.4
+
+
+def test_latency_window_percentiles() -> None:
+    window = LatencyWindow(size=4)
+    assert window.percentile(50) is None
+    for seconds in (0.5, 0.1, 0.4, 0.2, 0.3):  # the first one falls out of the window
+        window.add(seconds)
+    assert len(window) == 4
+    assert window.percentile(50) == 0.2
+    assert window.percentile(100) == 0.4
+    assert window.percentile(0) == 0.1
+
+
+@pytest.mark.parametrize("error", [StatusError(503), StatusError(429), APIConnectionError("refused")])
+def test_failing_primary_fails_over_at_once(fake_provider: type[FakeProvider], error: Exception) -> None:
+    primary, secondary = fake_provider("primary", errors=[error]), fake_provider("secondary")
+    provider = hedged(primary, secondary, delay=10.0)
+    started = time.monotonic()
+    assert provider.chat(MESSAGES).content == "secondary answer 1"
+    assert time.monotonic() - started < 1.0
+    assert provider.stats.failovers == 1
+    assert provider.stats.hedges == 0
+
+
+def test_failing_primary_stream_fails_over(fake_provider: type[FakeProvider]) -> None:
+    primary, secondary = fake_provider("primary", errors=[StatusError(529)]), fake_provider("secondary")
+    provider = hedged(primary, secondary, delay=10.0)
+    assert streamed_text(provider.stream_chat(MESSAGES)) == "secondary answer 1"
+
+
+def test_client_errors_do_not_fail_over(fake_provider: type[FakeProvider]) -> None:
+    primary, secondary = fake_provider("primary", errors=[StatusError(400)]), fake_provider("secondary")
+    provider = hedged(primary, secondary, delay=10.0)
+    with pytest.raises(StatusError) as excinfo:
+        provider.chat(MESSAGES)
+    assert excinfo.value.status_code == 400
+    assert secondary.calls == 0
+
+
+def test_when_every_member_fails_the_first_error_is_raised(fake_provider: type[FakeProvider]) -> None:
+    first, second = StatusError(503), StatusError(502)
+    provider = hedged(fake_provider("primary", errors=[first]), fake_provider("secondary", errors=[second]))
+    with pytest.raises(StatusError) as excinfo:
+        provider.chat(MESSAGES)
+    assert excinfo.value is first
+
+
+def test_members_fail_over_without_retrying_first(
+    fake_provider: type[FakeProvider], make_scheduler: Callable[..., Scheduler]
+) -> None:
+    primary_scheduler = make_scheduler("primary", base_delay=1.0)
+    secondary_scheduler = make_scheduler("secondary")
+    primary = fake_provider("primary", errors=[APIConnectionError("refused")] * 4, scheduler=primary_scheduler)
+    # The last member has nothing to fail over to, so it still retries
+    secondary = fake_provider("secondary", errors=[StatusError(503)], scheduler=secondary_scheduler)
+    provider = hedged(primary, secondary, delay=10.0)
+    started = time.monotonic()
+    assert provider.chat(MESSAGES).content == "secondary answer 2"
+    assert time.monotonic() - started < 0.5
+    assert primary.calls == 1 and primary_scheduler.stats.retries == 0
+    assert secondary.calls == 2 and secondary_scheduler.stats.retries == 1
+    assert provider.stats.failovers == 1
+
+
+def test_needs_two_members(fake_provider: type[FakeProvider]) -> None:
+    with pytest.raises(ValueError):
+        HedgedProvider([fake_provider("only")])
+
+
+def test_async_slow_primary_is_cancelled(async_fake_provider: type[AsyncFakeProvider]) -> None:
+    primary, secondary = async_fake_provider("primary", latency=5.0), async_fake_provider("secondary")
+    provider = AsyncHedgedProvider([primary, secondary], delay=0.05, min_samples=3)
+
+    async def run() -> str:
+        response = await provider.chat(MESSAGES)
+        await asyncio.sleep(0)  # let the cancellation reach the loser
+        return response.content
+
+    started = time.monotonic()
+    assert asyncio.run(run()) == "secondary answer 1"
+    assert time.monotonic() - started < 1.0
+    assert primary.cancelled
+    assert provider.stats.hedges == 1
+
+
+def test_async_stream_fails_over(async_fake_provider: type[AsyncFakeProvider]) -> None:
+    primary = async_fake_provider("primary", errors=[APIConnectionError("refused")])
+    secondary = async_fake_provider("secondary", latency=0.01)
+    provider = AsyncHedgedProvider([primary, secondary], delay=10.0, min_samples=3)
+
+    async def run() -> str:
+        return "".join([event.text async for event in provider.stream_chat(MESSAGES) if isinstance(event, TextDelta)])
+
+    assert asyncio.run(run()) == "secondary answer 1"
+    assert provider.stats.failovers == 1
+
+
+def test_async_members_fail_over_without_retrying_first(
+    async_fake_provider: type[AsyncFakeProvider], make_scheduler: Callable[..., Scheduler]
+) -> None:
+    scheduler = make_scheduler("primary", base_delay=1.0)
+    primary = async_fake_provider("primary", errors=[APIConnectionError("refused")] * 4, scheduler=scheduler)
+    provider = AsyncHedgedProvider([primary, async_fake_provider("secondary")], delay=10.0, min_samples=3)
+    started = time.monotonic()
+    assert asyncio.run(provider.chat(MESSAGES)).content == "secondary answer 1"
+    assert time.monotonic() - started < 0.5
+    assert primary.calls == 1 and scheduler.stats.retries == 0
@@ -0,0 +1,41 @@
+"""History's running per-role and per-tool token totals."""
+
+from __future__ import annotations
+from collections import Counter
+
+from codeagent.history import History
+from codeagent.llm.types import Message
+
+
+def walked(history: History) -> tuple[Counter[str], Counter[str]]:
+    by_role: Counter[str] = Counter()
+    by_tool: Counter[str] = Counter()
+    for index, message in enumerate(history.messages):
+        by_role[message.role] += history.tokens_at(index)
+        if message.role == "tool":
+            by_tool[message.name or "unknown"] += history.tokens_at(index)
+    return by_role, by_tool
+
+
+def totals(history: History) -> tuple[Counter[str], Counter[str]]:
+    return +Counter(history.tokens_by_role), +Counter(history.tokens_by_tool)
+
+
+def test_totals_follow_appends_and_trims() -> None:
+    history = History(budget=400)
+    for turn in range(30):
+        history.append(Message(role="user", content=f"question {turn} " * 10))
+        history.append(Message(role="assistant", content="let me look"))
+        history.append(Message(role="tool", content="x" * 300, name="file_read", tool_call_id=f"call_{turn}"))
+        assert totals(history) == walked(history)
+    assert history.trims > 0
+    assert sum(history.tokens_by_role.values()) == history.total_tokens
+
+
+def test_totals_follow_replace_and_clear() -> None:
+    history = History(budget=10_000)
+    history.append(Message(role="tool", content="y" * 400, name="grep", tool_call_id="call_1"))
+    history.replace(0, Message(role="tool", content="[stub]", name="grep", tool_call_id="call_1"))
+    assert totals(history) == walked(history)
+    history.clear()
+    assert totals(history) == (Counter(), Counter())
@@ -0,0 +1,43 @@
+"""Ollama request options: num_ctx sizing and num_predict."""
+
+from __future__ import annotations
+
+import pytest
+
+from codeagent.config import config
+from codeagent.constants import OLLAMA_MIN_CTX, OLLAMA_OUTPUT_RESERVE, PROMPT_RESERVE_TOKENS
+from codeagent.llm.ollama_provider import _ContextSize
+
+
+@pytest.fixture
+def context(monkeypatch: pytest.MonkeyPatch) -> _ContextSize:
+    monkeypatch.setattr(config, "ollama_num_ctx", 131072)
+    monkeypatch.setattr(config, "ollama_num_predict", 0)
+    monkeypatch.setattr(config, "history_tokens", 0)
+    return _ContextSize("qwen2.5:0.5b")
+
+
+def test_num_predict_is_only_sent_when_configured(context: _ContextSize, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert context.options(8192) == {"num_ctx": 8192}
+    # Only a modest response reserve comes out of the history budget
+    assert context.reserve <= OLLAMA_OUTPUT_RESERVE
+    assert context.history_budget() == 131072 - context.reserve - PROMPT_RESERVE_TOKENS
+    monkeypatch.setattr(config, "ollama_num_predict", 512)
+    assert _ContextSize("qwen2.5:0.5b").options(8192) == {"num_ctx": 8192, "num_predict": 512}
+
+
+def test_num_ctx_grows_in_powers_of_two(context: _ContextSize) -> None:
+    assert context.fit(1000) == OLLAMA_MIN_CTX
+    assert context.fit(OLLAMA_MIN_CTX) == 2 * OLLAMA_MIN_CTX
+    assert context.fit(50_000) == 8 * OLLAMA_MIN_CTX
+    assert context.fit(10**6) == 131072
+
+
+def test_num_ctx_shrinks_only_when_the_prompt_falls_well_below_it(context: _ContextSize) -> None:
+    assert context.fit(60_000) == 65536
+    # Small drops keep the size, so the model is not reloaded
+    assert context.fit(30_000) == 65536
+    assert context.fit(16384 - OLLAMA_OUTPUT_RESERVE + 1) == 65536
+    # After compaction the prompt needs a quarter or less: shrink, leaving room to double
+    assert context.fit(10_000) == 32768
+    assert context.fit(1000) == OLLAMA_MIN_CTX
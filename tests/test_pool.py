@@ -0,0 +1,48 @@
+"""Per-event-loop asyncio clients and providers."""
+
+from __future__ import annotations
+import asyncio
+import gc
+
+from codeagent.llm import pool
+
+
+def test_a_loop_shares_one_client_and_pool() -> None:
+    async def run() -> bool:
+        return pool.async_http_client() is pool.async_http_client() and pool.async_providers() is pool.async_providers()
+
+    assert asyncio.run(run())
+
+
+def test_loops_never_share_a_client() -> None:
+    async def client() -> object:
+        return pool.async_http_client()
+
+    first = asyncio.run(client())
+    second = asyncio.run(client())
+    assert first is not second
+
+
+def test_release_loop_closes_the_client() -> None:
+    async def run() -> tuple[bool, bool]:
+        client = pool.async_http_client()
+        pool.async_providers().get("key", object)
+        await pool.release_loop()
+        return client.is_closed, pool.async_providers().get("key", lambda: None) is None
+
+    assert asyncio.run(run()) == (True, True)
+
+
+def test_finished_loops_are_forgotten() -> None:
+    async def use() -> None:
+        pool.async_http_client()
+
+    for _ in range(3):
+        asyncio.run(use())
+    gc.collect()
+    assert len(pool._loops) == 0
+
+
+def test_outside_a_loop_nothing_is_shared() -> None:
+    assert pool.async_http_client() is not pool.async_http_client()
+    assert pool.async_providers() is not pool.async_providers()
@@ -0,0 +1,185 @@
+"""The LLM response cache: hits, single-flight collapsing, errors."""
+
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+import pytest
+
+from codeagent.llm.response_cache import AsyncCachingProvider, CachingProvider, ResponseStore
+from codeagent.llm.types import LLMResponse, Message, TextDelta, Usage
+
+if TYPE_CHECKING:
+    from conftest import AsyncFakeProvider, FakeProvider
+
+MESSAGES = [Message(role="user", content="list the files")]
+TOOLS = [{"name": "directory_list", "description": "List a directory.", "parameters": {"type": "object"}}]
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> ResponseStore:
+    return ResponseStore(tmp_path / "llm-cache.sqlite3")
+
+
+def run_in_threads(
+    count: int, fn: Callable[[], Any]
+) -> tuple[list[Any], list[BaseException], list[threading.Thread]]:
+    """Start `count` threads running `fn`; their results and errors fill in as they finish."""
+    results: list[Any] = []
+    errors: list[BaseException] = []
+    lock = threading.Lock()
+
+    def run() -> None:
+        try:
+            result = fn()
+        except BaseException as exc:  # noqa: BLE001 - collected for the test
+            with lock:
+                errors.append(exc)
+        else:
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return results, errors, threads
+
+
+def test_repeated_request_is_served_from_disk(store: ResponseStore, fake_provider: type[FakeProvider]) -> None:
+    inner = fake_provider()
+    provider = CachingProvider(inner, store)
+    first = provider.chat(MESSAGES, TOOLS, "system")
+    second = provider.chat(MESSAGES, TOOLS, "system")
+    assert inner.calls == 1
+    assert second.content == first.content
+    assert second.tool_calls[0].arguments == {"path": ".", "depth": 2}
+    assert second.usage == Usage()  # nothing was billed
+    assert (store.stats.hits, store.stats.misses, store.stats.stores) == (1, 1, 1)
+
+
+def test_different_requests_are_not_confused(store: ResponseStore, fake_provider: type[FakeProvider]) -> None:
+    inner = fake_provider()
+    provider = CachingProvider(inner, store)
+    provider.chat(MESSAGES, TOOLS, "system")
+    provider.chat(MESSAGES, TOOLS, "another system prompt")
+    provider.chat(MESSAGES + [Message(role="user", content="and then?")], TOOLS, "system")
+    assert inner.calls == 3
+
+
+def test_concurrent_identical_requests_call_the_provider_once(
+    store: ResponseStore, fake_provider: type[FakeProvider], wait_for: Callable[..., bool]
+) -> None:
+    gate = threading.Event()
+    inner = fake_provider(gate=gate)
+    provider = CachingProvider(inner, store)
+    results, errors, threads = run_in_threads(8, lambda: provider.chat(MESSAGES, TOOLS, "system"))
+    assert wait_for(lambda: store.stats.shared == 7)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert inner.calls == 1
+    assert {response.content for response in results} == {"fake answer 1"}
+    assert (store.stats.misses, store.stats.shared) == (1, 7)
+    assert len(store) == 1
+
+
+def test_concurrent_identical_streams_call_the_provider_once(
+    store: ResponseStore, fake_provider: type[FakeProvider], wait_for: Callable[..., bool]
+) -> None:
+    gate = threading.Event()
+    inner = fake_provider(gate=gate)
+    provider = CachingProvider(inner, store)
+
+    def stream() -> str:
+        return "".join(e.text for e in provider.stream_chat(MESSAGES, TOOLS, "system") if isinstance(e, TextDelta))
+
+    results, errors, threads = run_in_threads(4, stream)
+    assert wait_for(lambda: store.stats.shared == 3)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert inner.calls == 1
+    assert results == ["fake answer 1"] * 4
+
+
+def test_an_error_is_shared_but_not_cached(
+    store: ResponseStore, fake_provider: type[FakeProvider], wait_for: Callable[..., bool]
+) -> None:
+    gate = threading.Event()
+    inner = fake_provider(gate=gate, errors=[RuntimeError("overloaded")])
+    provider = CachingProvider(inner, store)
+    results, errors, threads = run_in_threads(3, lambda: provider.chat(MESSAGES, TOOLS, "system"))
+    assert wait_for(lambda: store.stats.shared == 2)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert results == []
+    assert [str(error) for error in errors] == ["overloaded"] * 3
+    assert inner.calls == 1
+    assert len(store) == 0
+
+    # The next request goes to the provider again
+    assert provider.chat(MESSAGES, TOOLS, "system").content == "fake answer 2"
+    assert inner.calls == 2
+    assert len(store) == 1
+
+
+def test_an_abandoned_stream_is_not_cached(store: ResponseStore, fake_provider: type[FakeProvider]) -> None:
+    inner = fake_provider()
+    provider = CachingProvider(inner, store)
+    stream = provider.stream_chat(MESSAGES, TOOLS, "system")
+    next(stream)
+    stream.close()
+    assert len(store) == 0
+    provider.chat(MESSAGES, TOOLS, "system")
+    assert inner.calls == 2
+
+
+def test_async_concurrent_identical_requests_call_the_provider_once(
+    store: ResponseStore, async_fake_provider: type[AsyncFakeProvider]
+) -> None:
+    async def run() -> tuple[AsyncFakeProvider, list[LLMResponse]]:
+        gate = asyncio.Event()
+        inner = async_fake_provider(gate=gate)
+        provider = AsyncCachingProvider(inner, store)
+        calls = [asyncio.ensure_future(provider.chat(MESSAGES, TOOLS, "system")) for _ in range(5)]
+        while store.stats.shared < 4:
+            await asyncio.sleep(0.001)
+        gate.set()
+        return inner, await asyncio.gather(*calls)
+
+    inner, responses = asyncio.run(run())
+    assert inner.calls == 1
+    assert [response.content for response in responses] == ["fake answer 1"] * 5
+    assert len(store) == 1
+
+
+def test_async_error_is_not_cached(store: ResponseStore, async_fake_provider: type[AsyncFakeProvider]) -> None:
+    async def run() -> AsyncFakeProvider:
+        gate = asyncio.Event()
+        gate.set()
+        inner = async_fake_provider(gate=gate, errors=[RuntimeError("overloaded")])
+        provider = AsyncCachingProvider(inner, store)
+        with pytest.raises(RuntimeError):
+            await provider.chat(MESSAGES, TOOLS, "system")
+        assert len(store) == 0
+        assert (await provider.chat(MESSAGES, TOOLS, "system")).content == "fake answer 2"
+        return inner
+
+    assert asyncio.run(run()).calls == 2
+
+
+def test_entries_expire_after_the_ttl(tmp_path: Path, fake_provider: type[FakeProvider]) -> None:
+    store = ResponseStore(tmp_path / "ttl.sqlite3", ttl=0.05)
+    inner = fake_provider()
+    provider = CachingProvider(inner, store)
+    provider.chat(MESSAGES)
+    time.sleep(0.1)
+    provider.chat(MESSAGES)
+    assert inner.calls == 2
+    assert store.stats.expired == 1
@@ -0,0 +1,228 @@
+"""Scheduler retries, backoff and AIMD concurrency, through the OpenAI SDK against a local fake API."""
+
+from __future__ import annotations
+import asyncio
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+import httpx
+import openai
+import pytest
+
+from codeagent.llm import scheduler as scheduler_module
+from codeagent.llm.scheduler import Scheduler, TokenBucket
+
+if TYPE_CHECKING:
+    from conftest import FakeAPI
+
+MakeScheduler = Callable[..., Scheduler]
+MESSAGES: list[Any] = [{"role": "user", "content": "hi"}]
+
+
+@pytest.fixture
+def client(fake_api: FakeAPI) -> Iterator[openai.OpenAI]:
+    # The SDK's own retries are off, as in the providers
+    with openai.OpenAI(base_url=fake_api.url, api_key="test", max_retries=0, http_client=httpx.Client()) as client:
+        yield client
+
+
+def create(client: openai.OpenAI) -> Callable[[], Any]:
+    def send() -> Any:
+        return client.chat.completions.create(model="gpt-test", messages=MESSAGES)
+    return send
+
+
+def unused_url() -> str:
+    """A URL nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}/v1"
+
+
+def test_retry_honors_retry_after(fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler) -> None:
+    fake_api.reply(429, {"retry-after": "0.3"})
+    fake_api.reply()
+    sched = make_scheduler()
+    response = sched.call(create(client))
+    assert response.choices[0].message.content == "hi"
+    assert len(fake_api.sent) == 2
+    assert fake_api.sent[1] - fake_api.sent[0] >= 0.3
+    assert (sched.stats.retries, sched.stats.throttled, sched.stats.failures) == (1, 1, 0)
+    assert sched.stats.waited == pytest.approx(0.3, abs=0.02)
+
+
+def test_retry_after_ms_takes_precedence(
+    fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler
+) -> None:
+    fake_api.reply(529, {"retry-after-ms": "150", "retry-after": "30"})
+    fake_api.reply()
+    make_scheduler().call(create(client))
+    assert 0.15 <= fake_api.sent[1] - fake_api.sent[0] < 1.0
+
+
+def test_throttle_pauses_other_requests(
+    fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler
+) -> None:
+    fake_api.reply(429, {"retry-after": "0.3"})
+    fake_api.reply()
+    sched = make_scheduler(max_retries=0)
+    with pytest.raises(openai.RateLimitError):
+        sched.call(create(client))
+    sched.call(create(client))
+    assert fake_api.sent[1] - fake_api.sent[0] >= 0.3
+
+
+def test_long_retry_after_is_bounded_alike_for_retry_and_pause(
+    fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler
+) -> None:
+    fake_api.reply(429, {"retry-after": "30"})
+    fake_api.reply()
+    sched = make_scheduler(max_delay=0.05)  # waits at most 0.2 s
+    sched.call(create(client))
+    # The retry waited out the whole (bounded) pause, so nothing is left of it
+    assert sched._reserve(0) == 0.0
+    sched.call(create(client))
+    sent = fake_api.sent
+    assert 0.2 <= sent[1] - sent[0] < 0.5
+    assert sent[2] - sent[1] < 0.1
+
+
+def test_server_errors_are_retried_until_the_limit(
+    fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler
+) -> None:
+    fake_api.reply(500)
+    sched = make_scheduler(max_retries=2)
+    with pytest.raises(openai.InternalServerError) as excinfo:
+        sched.call(create(client))
+    assert excinfo.value.status_code == 500
+    assert len(fake_api.sent) == 3
+    assert (sched.stats.retries, sched.stats.failures) == (2, 1)
+
+
+def test_connection_errors_are_retried(fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler) -> None:
+    with openai.OpenAI(base_url=unused_url(), api_key="test", max_retries=0) as unreachable:
+        clients = iter([unreachable, client])
+        sched = make_scheduler()
+        response = sched.call(lambda: create(next(clients))())
+    assert response.choices[0].message.content == "hi"
+    assert len(fake_api.sent) == 1
+    assert sched.stats.retries == 1
+
+
+def test_client_errors_are_not_retried(fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler) -> None:
+    fake_api.reply(400)
+    sched = make_scheduler()
+    with pytest.raises(openai.BadRequestError):
+        sched.call(create(client))
+    assert len(fake_api.sent) == 1
+    assert sched.stats.retries == 0
+
+
+def run_in_threads(count: int, fn: Callable[[], Any]) -> None:
+    threads = [threading.Thread(target=fn) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrency_never_exceeds_the_limit(
+    fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler
+) -> None:
+    fake_api.reply(delay=0.02)
+    sched = make_scheduler(max_concurrency=3)
+    run_in_threads(12, lambda: sched.call(create(client)))
+    assert fake_api.peak == 3
+    assert sched.in_flight == 0
+
+
+def test_throttling_halves_the_limit_and_successes_grow_it(
+    fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fake_api.reply(429)
+    fake_api.reply(429)
+    fake_api.reply()
+    sched = make_scheduler(max_concurrency=8, max_retries=0)
+    with pytest.raises(openai.RateLimitError):
+        sched.call(create(client))
+    assert sched.limit == 4
+    # A second throttle within the decrease interval is the same congestion event
+    with pytest.raises(openai.RateLimitError):
+        sched.call(create(client))
+    assert sched.limit == 4
+
+    monkeypatch.setattr(scheduler_module, "_DECREASE_INTERVAL", 0.0)
+    sched._throttled(Exception())
+    sched._throttled(Exception())
+    assert sched.limit == 1
+
+    # Additive increase: about one more slot per limit's worth of successes
+    for _ in range(3):
+        sched.call(create(client))
+    assert 2.0 < sched.limit < 3.0
+    for _ in range(50):
+        sched.call(create(client))
+    assert sched.limit == 8
+
+
+def test_shrunk_limit_is_enforced(fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler) -> None:
+    fake_api.reply(delay=0.02)
+    sched = make_scheduler(max_concurrency=8)
+    sched.limit = 2.0
+    sched._last_decrease = time.monotonic()
+    run_in_threads(4, lambda: sched.call(create(client)))
+    # Four successes grow the limit from 2 to below 4, so at most 3 ran at once
+    assert 2 <= fake_api.peak <= 3
+
+
+def test_token_bucket_paces_after_a_burst() -> None:
+    bucket = TokenBucket(60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve(1) == pytest.approx(2.0, abs=0.05)
+
+
+def test_requests_per_minute_limit_delays_requests(
+    fake_api: FakeAPI, client: openai.OpenAI, make_scheduler: MakeScheduler
+) -> None:
+    sched = make_scheduler(requests_per_minute=600)  # a burst of 600, then one per 0.1 s
+    sched._requests.level = 1.0  # type: ignore[union-attr]
+    for _ in range(3):
+        sched.call(create(client))
+    assert fake_api.sent[2] - fake_api.sent[0] >= 0.18
+
+
+def test_async_retry_honors_retry_after(fake_api: FakeAPI, make_scheduler: MakeScheduler) -> None:
+    fake_api.reply(503, {"retry-after": "0.2"})
+    fake_api.reply()
+
+    async def run() -> str | None:
+        sched = make_scheduler()
+        async with openai.AsyncOpenAI(
+            base_url=fake_api.url, api_key="test", max_retries=0, http_client=httpx.AsyncClient()
+        ) as client:
+            response = await sched.acall(lambda: client.chat.completions.create(model="gpt-test", messages=MESSAGES))
+        assert sched.stats.retries == 1
+        return response.choices[0].message.content
+
+    assert asyncio.run(run()) == "hi"
+    assert fake_api.sent[1] - fake_api.sent[0] >= 0.2
+
+
+def test_async_concurrency_never_exceeds_the_limit(fake_api: FakeAPI, make_scheduler: MakeScheduler) -> None:
+    fake_api.reply(delay=0.01)
+
+    async def run() -> None:
+        sched = make_scheduler(max_concurrency=2)
+        async with openai.AsyncOpenAI(
+            base_url=fake_api.url, api_key="test", max_retries=0, http_client=httpx.AsyncClient()
+        ) as client:
+            await asyncio.gather(*(
+                sched.acall(lambda: client.chat.completions.create(model="gpt-test", messages=MESSAGES))
+                for _ in range(10)
+            ))
+
+    asyncio.run(run())
+    assert fake_api.peak == 2
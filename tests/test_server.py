@@ -0,0 +1,108 @@
+"""The daemon: dropping idle and excess sessions, cancelling turns of departed clients."""
+
+from __future__ import annotations
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import pytest
+
+from codeagent.async_agent import AsyncAgent
+from codeagent.config import config
+from codeagent.llm.base import AsyncBaseLLMProvider
+from codeagent.llm.types import LLMResponse, Message, StreamEvent
+from codeagent.protocol import encode_frame
+from codeagent.server import AgentServer, _Session
+
+
+class StuckProvider(AsyncBaseLLMProvider):
+    """Never answers; notes when its request is cancelled."""
+
+    model = "stuck"
+
+    def __init__(self) -> None:
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def chat(
+        self, messages: list[Message], tools: list[dict[str, Any]] | None = None, system: str = ""
+    ) -> LLMResponse:
+        raise NotImplementedError
+
+    async def stream_chat(
+        self, messages: list[Message], tools: list[dict[str, Any]] | None = None, system: str = ""
+    ) -> AsyncIterator[StreamEvent]:
+        self.started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        yield  # pragma: no cover - makes this an async generator
+
+    def get_model_name(self) -> str:
+        return "Stuck"
+
+
+@pytest.fixture
+def server(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> AgentServer:
+    monkeypatch.setattr(config, "save_sessions", False)
+    monkeypatch.setattr(config, "daemon_sessions", 2)
+    monkeypatch.setattr(config, "daemon_idle", 60.0)
+    return AgentServer(tmp_path / "daemon.sock")
+
+
+def add_session(server: AgentServer, session_id: str, idle: float = 0.0, ephemeral: bool = False) -> _Session:
+    session = _Session(AsyncAgent("demo"), ephemeral)
+    session.last_used = time.monotonic() - idle
+    server.sessions[session_id] = session
+    return session
+
+
+def test_least_recently_used_named_sessions_beyond_the_cap_are_dropped(server: AgentServer) -> None:
+    for session_id in ("a", "b", "c"):
+        add_session(server, session_id)
+    add_session(server, "mine", ephemeral=True)
+    server.evict()
+    assert list(server.sessions) == ["b", "c", "mine"]
+
+
+def test_idle_named_sessions_are_dropped(server: AgentServer) -> None:
+    add_session(server, "old", idle=120.0)
+    add_session(server, "mine", idle=120.0, ephemeral=True)
+    add_session(server, "recent", idle=10.0)
+    server.evict()
+    assert list(server.sessions) == ["mine", "recent"]
+
+
+def test_busy_sessions_are_kept(server: AgentServer) -> None:
+    busy = add_session(server, "busy", idle=120.0)
+
+    async def run() -> list[str]:
+        async with busy.lock:
+            server.evict()
+        return list(server.sessions)
+
+    assert asyncio.run(run()) == ["busy"]
+
+
+def test_a_departed_clients_turn_is_cancelled(server: AgentServer) -> None:
+    provider = StuckProvider()
+    server._providers["demo"] = provider
+
+    async def run() -> None:
+        listener = await asyncio.start_unix_server(server._handle_client, path=str(server.socket_path))
+        async with listener:
+            reader, writer = await asyncio.open_unix_connection(str(server.socket_path))
+            writer.write(encode_frame(
+                {"op": "send", "session": "s1", "message": "hi", "provider": "demo", "ephemeral": True}
+            ))
+            await asyncio.wait_for(provider.started.wait(), 5)
+            writer.close()
+            deadline = time.monotonic() + 5
+            while not provider.cancelled or server.sessions:
+                assert time.monotonic() < deadline, "turn kept running"
+                await asyncio.sleep(0.01)
+
+    asyncio.run(run())
@@ -0,0 +1,43 @@
+"""The session store: listing, previews, and resuming the read numbering."""
+
+from __future__ import annotations
+from pathlib import Path
+
+import pytest
+
+from codeagent.llm.types import Message
+from codeagent.sessions import BLOB_THRESHOLD_CHARS, SessionStore
+from codeagent.tools.file_read import last_read_number
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> SessionStore:
+    return SessionStore(tmp_path / "sessions")
+
+
+def test_preview_of_a_long_first_message_comes_from_its_blob(store: SessionStore) -> None:
+    log = store.create("long")
+    log.append(Message(role="user", content="refactor the parser\n" + "x" * BLOB_THRESHOLD_CHARS), 1000)
+    [info] = store.list()
+    assert info.preview.startswith("refactor the parser x")
+
+
+def test_sessions_without_a_log_are_skipped(store: SessionStore) -> None:
+    store.create("good").append(Message(role="user", content="hi"), 1)
+    store.create("broken").append(Message(role="user", content="hi"), 1)
+    (store.path("broken") / "log").unlink()
+    assert [info.id for info in store.list()] == ["good"]
+
+
+def test_resumed_reads_continue_the_numbering(store: SessionStore) -> None:
+    log = store.create("reads")
+    for message in [
+        Message(role="user", content="look at main.py"),
+        Message(role="tool", content="File: main.py (3 lines) [read #4]\n1\tx", name="file_read", tool_call_id="a"),
+        Message(role="tool", content="File: main.py (3 lines) [read #7]\n1\ty", name="file_read", tool_call_id="b"),
+        Message(role="tool", content="File: notes [read #99]", name="shell", tool_call_id="c"),
+    ]:
+        log.append(message, 10)
+    messages = store.open("reads").load_tail(10_000)
+    assert last_read_number(messages) == 7
+    assert last_read_number([]) == 0